@@ -1,16 +1,23 @@
 from app import models
 import os
 from flask import Flask
-import joblib
-import pandas as pd
-import tensorflow as tf
 
+from app import extensions
+from app.batching import MicroBatcher
+from app.catalog import invalidate_disease_catalog
+from app.database import apply_sqlite_pragmas, engine_options_from_env, sqlite_pragmas_from_env
+from app.cache import LRUCache
+from app.jobs import DiseaseJobQueue
+from app.cli import register_commands
+from app.model_loader import start_model_loading
 from app.extensions import db, api
+from app.routes.health import health_ns
 from app.routes.user import user_ns
 from app.routes.plant import plant_ns
 from app.routes.growth_log import growth_ns
-from app.routes.disease_check import disease_ns
+from app.routes.disease_check import disease_ns, run_disease_job, run_disease_model
 from app.routes.plant_care import care_ns
+from app.routes.export import export_ns
 
 def create_app(config_name='dev'):
     app = Flask(__name__)
@@ -18,10 +25,63 @@ def create_app(config_name='dev'):
     app.config['SECRET_KEY'] = 'super-secret-key'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['UPLOAD_FOLDER'] = 'uploads'
+    app.config['GROWTH_MODEL_PATH'] = os.path.join('tabular_data', 'plant_growth.pkl')
+    app.config['GROWTH_SCHEMA_PATH'] = os.path.join('tabular_data', 'plant_growth.schema.json')
+    # flat node arrays of the growth model (flask write-growth-forest), memory-mapped instead of unpickled when present
+    app.config['GROWTH_FOREST_PATH'] = os.path.join('tabular_data', 'plant_growth.forest')
+    # sklearn: the unpickled model's predict, compact: the pickled forest flattened into node arrays and walked
+    # vectorized (same predictions, no per-call validation/joblib overhead). the memory-mapped layout is always compact
+    app.config['GROWTH_EVALUATOR'] = os.environ.get('GROWTH_EVALUATOR', 'sklearn')
+    app.config['GROWTH_DATA_PATH'] = os.path.join('tabular_data', 'plant_growth_data.csv')
+    # most records one /predict-growth/batch request may encode and insert, larger ones get 413
+    app.config['GROWTH_BATCH_MAX_RECORDS'] = int(os.environ.get('GROWTH_BATCH_MAX_RECORDS', 1000))
+    # largest what-if grid scored by one /predict-growth/sweep request
+    app.config['GROWTH_SWEEP_MAX_CONFIGS'] = int(os.environ.get('GROWTH_SWEEP_MAX_CONFIGS', 50000))
+    # grid rows encoded and scored per predict_proba call
+    app.config['GROWTH_SWEEP_CHUNK_ROWS'] = int(os.environ.get('GROWTH_SWEEP_CHUNK_ROWS', 2048))
+    app.config['DISEASE_MODEL_PATH'] = 'plant_disease.h5'
+    # background: load models on threads, eager: load before create_app returns, off: do not load
+    app.config['MODEL_LOADING'] = os.environ.get('MODEL_LOADING', 'background')
+    # unix socket of a running model server (python -m app.model_server), unset: models are loaded in this process
+    app.config['MODEL_SERVER_SOCKET'] = os.environ.get('MODEL_SERVER_SOCKET')
+    app.config['MODEL_SERVER_TIMEOUT'] = float(os.environ.get('MODEL_SERVER_TIMEOUT', 30))
+    app.config['MODEL_SERVER_CONNECT_TIMEOUT'] = float(os.environ.get('MODEL_SERVER_CONNECT_TIMEOUT', 60))
+    # disease inference batching: max images per forward pass, max wait for a batch to fill
+    app.config['DISEASE_BATCH_MAX_SIZE'] = int(os.environ.get('DISEASE_BATCH_MAX_SIZE', 16))
+    app.config['DISEASE_BATCH_MAX_WAIT_MS'] = float(os.environ.get('DISEASE_BATCH_MAX_WAIT_MS', 5))
+    # most images one /check-disease/batch request may upload, larger ones get 413
+    app.config['DISEASE_BATCH_MAX_FILES'] = int(os.environ.get('DISEASE_BATCH_MAX_FILES', 64))
+    # compiled: traced tf.function warmed up for the common batch sizes, keras: plain model.predict,
+    # tflite: converted (and quantized) model cached next to the .h5
+    app.config['DISEASE_BACKEND'] = os.environ.get('DISEASE_BACKEND', 'compiled')
+    # none (float32), dynamic (int8 weights) or int8 (weights and activations, needs DISEASE_CALIBRATION_DIR)
+    app.config['DISEASE_TFLITE_QUANTIZATION'] = os.environ.get('DISEASE_TFLITE_QUANTIZATION', 'none')
+    app.config['DISEASE_TFLITE_THREADS'] = int(os.environ['DISEASE_TFLITE_THREADS']) if 'DISEASE_TFLITE_THREADS' in os.environ else None
+    # sample images (folder/<class>/*.jpg) used to calibrate int8 quantization
+    app.config['DISEASE_CALIBRATION_DIR'] = os.environ.get('DISEASE_CALIBRATION_DIR')
+    app.config['DISEASE_WARMUP_BATCH_SIZES'] = (1, app.config['DISEASE_BATCH_MAX_SIZE'])
+    # predictions kept for repeated uploads of the same photo, 0 disables the cache
+    app.config['DISEASE_PREDICTION_CACHE_SIZE'] = int(os.environ.get('DISEASE_PREDICTION_CACHE_SIZE', 1024))
+    # growth predictions kept for repeated sensor readings, 0 disables the cache
+    app.config['GROWTH_PREDICTION_CACHE_SIZE'] = int(os.environ.get('GROWTH_PREDICTION_CACHE_SIZE', 4096))
+    # async disease checks: worker threads, idle poll interval, seconds before a stuck 'running' job
+    # is claimed again, tries per job, queued jobs before new ones are refused with 503
+    app.config['DISEASE_JOB_WORKERS'] = int(os.environ.get('DISEASE_JOB_WORKERS', 2))
+    app.config['DISEASE_JOB_POLL_SECONDS'] = float(os.environ.get('DISEASE_JOB_POLL_SECONDS', 1))
+    app.config['DISEASE_JOB_LEASE_SECONDS'] = float(os.environ.get('DISEASE_JOB_LEASE_SECONDS', 60))
+    app.config['DISEASE_JOB_MAX_ATTEMPTS'] = int(os.environ.get('DISEASE_JOB_MAX_ATTEMPTS', 3))
+    app.config['DISEASE_JOB_MAX_QUEUED'] = int(os.environ.get('DISEASE_JOB_MAX_QUEUED', 1000))
+    
+    app.config['SQLITE_PRAGMAS'] = {}
     
     if config_name == 'test':
         app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
         app.config['TESTING'] = True
+    elif config_name == 'prod':
+        # DATABASE_URL may point to a server database (postgresql://...), sqlite files get the tuned pragmas
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///plant_care.db')
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options_from_env(app.config['SQLALCHEMY_DATABASE_URI'])
+        app.config['SQLITE_PRAGMAS'] = sqlite_pragmas_from_env()
     else:
         app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///plant_care.db'
 
@@ -30,33 +90,41 @@ def create_app(config_name='dev'):
     db.init_app(app)
     api.init_app(app)
 
-    try:
-        if os.path.exists("tabular_data/plant_growth.pkl"):
-            growth_model = joblib.load("tabular_data/plant_growth.pkl")
-            print("Plant growth model loaded.")
-            
-            csv_path = os.path.join("tabular_data", "plant_growth_data.csv")
-            if os.path.exists(csv_path):
-                df_ref = pd.read_csv(csv_path)
-                if 'Growth_Milestone' in df_ref.columns:
-                    df_ref = df_ref.drop(columns=['Growth_Milestone'])
-                df_encoded_ref = pd.get_dummies(df_ref, columns=['Soil_Type', 'Water_Frequency', 'Fertilizer_Type'], drop_first=True)
-                model_columns = df_encoded_ref.columns.tolist()
-            else:
-                print("Growth Data CSV not found. Prediction might fail.")
-        
-        if os.path.exists("plant_disease.h5"):
-            disease_model = tf.keras.models.load_model("plant_disease.h5")
-            print("Plant disease model loaded.")
-
-    except Exception as e:
-        print(f"Model loading error: {e}")
+    with app.app_context():
+        apply_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+
+    if extensions.disease_batcher is not None:
+        extensions.disease_batcher.close()
+    extensions.disease_batcher = MicroBatcher(
+        run_disease_model,
+        max_batch_size=app.config['DISEASE_BATCH_MAX_SIZE'],
+        max_wait_ms=app.config['DISEASE_BATCH_MAX_WAIT_MS'])
+    if extensions.disease_jobs is not None:
+        extensions.disease_jobs.close()
+    # workers start with the first async request, or explicitly (run.py) to resume jobs left in the table
+    extensions.disease_jobs = DiseaseJobQueue(
+        app, run_disease_job,
+        workers=app.config['DISEASE_JOB_WORKERS'],
+        poll_seconds=app.config['DISEASE_JOB_POLL_SECONDS'],
+        lease_seconds=app.config['DISEASE_JOB_LEASE_SECONDS'],
+        max_attempts=app.config['DISEASE_JOB_MAX_ATTEMPTS'],
+        ready=lambda: extensions.disease_model is not None)
+    extensions.disease_prediction_cache = LRUCache(app.config['DISEASE_PREDICTION_CACHE_SIZE'])
+    extensions.growth_prediction_cache = LRUCache(app.config['GROWTH_PREDICTION_CACHE_SIZE'])
+    # the disease type catalog is reloaded from this app's database on first use
+    invalidate_disease_catalog()
 
     api.add_namespace(user_ns, path='/')
     api.add_namespace(plant_ns, path='/')
     api.add_namespace(growth_ns, path='/')
     api.add_namespace(disease_ns, path='/')
     api.add_namespace(care_ns, path='/')
+    api.add_namespace(health_ns, path='/')
+    api.add_namespace(export_ns, path='/')
+
+    start_model_loading(app)
+
+    register_commands(app)
 
     return app
 
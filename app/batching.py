@@ -0,0 +1,113 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+"""
+in-process micro batching: concurrent requests submit one input each, a
+single worker thread stacks whatever is pending and runs one predict call
+"""
+class MicroBatcher:
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._pending = []
+        # one reusable input buffer per (shape, dtype), only touched by the worker thread
+        self._buffers = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+        # counters for monitoring how well requests are being merged
+        self.batches_run = 0
+        self.items_run = 0
+
+    def submit(self, item):
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("batcher is closed")
+            self._pending.append((np.asarray(item), future))
+            self._ensure_worker()
+            self._cond.notify()
+        return future
+
+    # blocks until the row belonging to this item is ready
+    def predict(self, item, timeout=None):
+        return self.submit(item).result(timeout)
+
+    def predict_many(self, items, timeout=None):
+        futures = [self.submit(item) for item in items]
+        return [f.result(timeout) for f in futures]
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="disease-batcher", daemon=True)
+            self._thread.start()
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._pending:
+                return None
+
+            # the first request waits at most max_wait for others to join it
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._run_batch(batch)
+
+    def _stack(self, items):
+        first = items[0]
+        key = (first.shape, first.dtype)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = np.empty((self.max_batch_size,) + first.shape, dtype=first.dtype)
+            self._buffers[key] = buffer
+        for i, item in enumerate(items):
+            buffer[i] = item
+        return buffer[:len(items)]
+
+    def _run_batch(self, batch):
+        # inputs with different shapes or dtypes cannot be stacked together
+        groups = {}
+        for item, future in batch:
+            groups.setdefault((item.shape, item.dtype), []).append((item, future))
+
+        for entries in groups.values():
+            futures = [f for _, f in entries]
+            try:
+                outputs = self.predict_fn(self._stack([item for item, _ in entries]))
+                for i, future in enumerate(futures):
+                    future.set_result(outputs[i])
+            except Exception as e:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+
+            self.batches_run += 1
+            self.items_run += len(entries)
@@ -0,0 +1,50 @@
+import threading
+
+from app.extensions import db
+from app.models import DiseaseType
+
+UNKNOWN_DISEASE = "Unknown Disease"
+
+"""
+read-only snapshot of the disease_type table. the model's class index i maps
+to disease type id i + 1 (rows are seeded in class order), the species set is
+precomputed from the "<Species>___<disease>" names
+"""
+class DiseaseCatalog:
+    def __init__(self, rows):
+        self.names = {type_id: name for type_id, name in rows}
+        self.species = frozenset(name.split('___')[0] for name in self.names.values())
+        self.unknown_id = next((type_id for type_id, name in self.names.items() if name == UNKNOWN_DISEASE), None)
+
+    def type_id_for_class(self, class_index):
+        type_id = int(class_index) + 1
+        return type_id if type_id in self.names else None
+
+    def supports(self, species):
+        return not species or species.capitalize() in self.species
+
+    def rows(self):
+        return [{'id': type_id, 'name': name} for type_id, name in sorted(self.names.items())]
+
+_catalog = None
+_lock = threading.Lock()
+
+"""
+loaded on first use and kept for the life of the process. every code path that
+writes disease_type (seed, unknown creation) calls invalidate_disease_catalog;
+a table changed from another process is picked up after a restart
+"""
+def get_disease_catalog():
+    global _catalog
+    catalog = _catalog
+    if catalog is None:
+        with _lock:
+            if _catalog is None:
+                _catalog = DiseaseCatalog(db.session.query(DiseaseType.id, DiseaseType.name).all())
+            catalog = _catalog
+    return catalog
+
+def invalidate_disease_catalog():
+    global _catalog
+    with _lock:
+        _catalog = None
@@ -0,0 +1,114 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.features import columns_from_training_csv, save_feature_schema, vocabulary_from_training_csv
+
+# flask --app run write-feature-schema
+@click.command('write-feature-schema')
+@click.option('--csv', 'csv_path', default=None, help='Training CSV, defaults to GROWTH_DATA_PATH.')
+@with_appcontext
+def write_feature_schema_command(csv_path):
+    """Save the growth model's feature schema next to the model file."""
+    model_path = current_app.config['GROWTH_MODEL_PATH']
+    schema_path = current_app.config['GROWTH_SCHEMA_PATH']
+    csv_path = csv_path or current_app.config['GROWTH_DATA_PATH']
+
+    columns = columns_from_training_csv(csv_path)
+    schema = save_feature_schema(schema_path, columns, model_path, vocabulary_from_training_csv(csv_path))
+    click.echo(f"Feature schema with {len(schema['columns'])} columns written to {schema_path}.")
+
+# flask --app run write-growth-forest
+@click.command('write-growth-forest')
+@with_appcontext
+def write_growth_forest_command():
+    """Save the growth model as memory-mappable node arrays."""
+    import joblib
+    from app.forest import save_compact_forest
+
+    model_path = current_app.config['GROWTH_MODEL_PATH']
+    forest_path = current_app.config['GROWTH_FOREST_PATH']
+    meta = save_compact_forest(joblib.load(model_path), forest_path, model_path)
+    click.echo(f"{meta['n_estimators']} trees ({meta['n_nodes']} nodes) written to {forest_path}.")
+
+# flask --app run disease-backend-parity --folder test_dataset --backend tflite
+@click.command('disease-backend-parity')
+@click.option('--folder', required=True, type=click.Path(exists=True, file_okay=False), help='Held-out images as <folder>/<disease type>/*.jpg.')
+@click.option('--backend', default=None, help='Candidate backend, defaults to DISEASE_BACKEND.')
+@click.option('--reference', default='keras', show_default=True, help='Reference backend.')
+@click.option('--batch-size', default=32, show_default=True)
+@with_appcontext
+def disease_backend_parity_command(folder, backend, reference, batch_size):
+    """Compare predictions of two disease model backends on held-out images."""
+    import tensorflow as tf
+    from app.inference import build_disease_backend, compare_backends
+    from app.models import DiseaseType
+
+    config = current_app.config
+    backend = backend or config['DISEASE_BACKEND']
+    model = tf.keras.models.load_model(config['DISEASE_MODEL_PATH'])
+    class_names = [d.name for d in DiseaseType.query.order_by(DiseaseType.id)]
+
+    report = compare_backends(
+        build_disease_backend(model, config, backend=reference),
+        build_disease_backend(model, config, backend=backend),
+        folder, class_names, batch_size=batch_size)
+
+    click.echo(f"{reference} vs {backend} on {report['images']} images")
+    click.echo(f"  top-1 agreement:   {report['agreement']:.4f}")
+    if report['reference_accuracy'] is not None:
+        click.echo(f"  accuracy:          {report['reference_accuracy']:.4f} ({reference}) / {report['candidate_accuracy']:.4f} ({backend})")
+    click.echo(f"  max |prob diff|:   {report['max_abs_diff']:.5f}")
+    click.echo(f"  ms per image:      {report['reference_ms_per_image']:.2f} ({reference}) / {report['candidate_ms_per_image']:.2f} ({backend})")
+
+# flask --app run import-growth-logs history.csv --predict
+@click.command('import-growth-logs')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--predict', is_flag=True, help='Predict milestones for rows without one (loads the growth model).')
+@click.option('--chunk-size', default=None, type=int, help='Rows per bulk insert and transaction.')
+@with_appcontext
+def import_growth_logs_command(csv_path, predict, chunk_size):
+    """Bulk import historical growth logs from a CSV file."""
+    from app import extensions
+    from app.ingest import IngestError, ingest_growth_csv
+    from app.model_loader import load_growth_model
+    from app.routes.growth_log import predict_milestones
+
+    predict_fn = None
+    if predict:
+        if extensions.growth_model is None:
+            load_growth_model(current_app.config)
+        if extensions.growth_model is None or not extensions.model_columns:
+            raise click.ClickException("Growth model could not be loaded, run without --predict or fix the model files.")
+        predict_fn = predict_milestones
+
+    with open(csv_path, encoding='utf-8-sig', newline='') as f:
+        try:
+            report = ingest_growth_csv(f, predict_fn, extensions.growth_vocabulary, chunk_size)
+        except IngestError as e:
+            raise click.ClickException(str(e))
+
+    click.echo(f"{report['inserted']} of {report['rows']} rows imported, {report['predicted']} predicted, {report['rejected']} rejected.")
+    for error in report['errors']:
+        click.echo(f"  line {error['line']}: {error['message']}")
+
+# flask --app run ensure-indexes
+@click.command('ensure-indexes')
+@with_appcontext
+def ensure_indexes_command():
+    """Create the model indexes missing from an existing database."""
+    from app.extensions import db
+    from app.migrations import ensure_indexes
+
+    created = ensure_indexes(db.engine)
+    if created:
+        click.echo(f"Created indexes: {', '.join(created)}")
+    else:
+        click.echo("All indexes already exist.")
+
+def register_commands(app):
+    app.cli.add_command(write_feature_schema_command)
+    app.cli.add_command(write_growth_forest_command)
+    app.cli.add_command(disease_backend_parity_command)
+    app.cli.add_command(ensure_indexes_command)
+    app.cli.add_command(import_growth_logs_command)
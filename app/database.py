@@ -0,0 +1,52 @@
+import os
+
+from sqlalchemy import event
+
+"""
+per connection sqlite settings for the prod profile. WAL lets readers run
+while one writer commits, busy_timeout makes a writer wait for the lock
+instead of failing with "database is locked"
+"""
+def sqlite_pragmas_from_env():
+    return {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        # bytes of the database file read through mmap
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        # negative: size in KiB instead of pages
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64000)),
+        'temp_store': 'MEMORY',
+    }
+
+def is_sqlite_memory(uri):
+    return uri.startswith('sqlite') and (':memory:' in uri or uri.rstrip('/') == 'sqlite:')
+
+# pool options only apply to real connection pools (server databases and sqlite files)
+def engine_options_from_env(uri):
+    if is_sqlite_memory(uri):
+        return {}
+    options = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_pre_ping': True,
+    }
+    if not uri.startswith('sqlite'):
+        # server side idle timeouts close long lived connections
+        options['pool_recycle'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    return options
+
+def apply_sqlite_pragmas(engine, pragmas):
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    # connections opened before the listener was added do not have the settings
+    engine.dispose()
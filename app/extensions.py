@@ -11,4 +11,22 @@ api = Api(version='1.0',
 # model load
 growth_model = None
 disease_model = None
-model_columns = []
\ No newline at end of file
+model_columns = []
+
+# full category list per categorical feature (training values), None when unknown
+growth_vocabulary = None
+
+# sha256 prefix of the loaded growth model file, part of the growth cache keys
+growth_model_version = None
+
+# micro batching scheduler for the disease model
+disease_batcher = None
+
+# durable queue and worker pool for async disease checks
+disease_jobs = None
+
+# (image sha256, model version) -> prediction row
+disease_prediction_cache = None
+
+# (model version, canonical input tuple) -> predicted milestone
+growth_prediction_cache = None
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+CATEGORICAL_FEATURES = ['Soil_Type', 'Water_Frequency', 'Fertilizer_Type']
+
+# bump when the layout of the schema file changes
+FEATURE_SCHEMA_VERSION = 1
+
+class FeatureSchemaError(Exception):
+    pass
+
+"""
+one-hot encoder compiled once from the growth model's column order. it fills
+numpy rows directly and gives the same values as pd.get_dummies followed by
+reindex(columns=model_columns, fill_value=0)
+"""
+class FeatureEncoder:
+    def __init__(self, model_columns):
+        self.columns = model_columns
+        self.n_features = len(model_columns)
+
+        # (feature, category) -> column index, numeric column -> column index
+        self.onehot_index = {}
+        self.numeric_index = {}
+        for idx, column in enumerate(model_columns):
+            for feature in CATEGORICAL_FEATURES:
+                prefix = feature + '_'
+                if column.startswith(prefix):
+                    self.onehot_index[(feature, column[len(prefix):])] = idx
+                    break
+            else:
+                self.numeric_index[column] = idx
+
+    # category vocabulary per feature, taken from the column names
+    @property
+    def categories(self):
+        vocab = {feature: [] for feature in CATEGORICAL_FEATURES}
+        for feature, category in self.onehot_index:
+            vocab[feature].append(category)
+        return vocab
+
+    def encode(self, input_data, out=None):
+        if out is None:
+            out = np.zeros(self.n_features, dtype=np.float64)
+        else:
+            out.fill(0)
+
+        for key, value in input_data.items():
+            if key in CATEGORICAL_FEATURES:
+                # unseen categories and the dropped first category stay all zero
+                if value is not None and not isinstance(value, str):
+                    value = str(value)
+                idx = self.onehot_index.get((key, value))
+                if idx is not None:
+                    out[idx] = 1.0
+            else:
+                idx = self.numeric_index.get(key)
+                if idx is not None:
+                    out[idx] = value
+        return out
+
+    def encode_many(self, records, out=None):
+        records = list(records)
+        if out is None:
+            out = np.zeros((len(records), self.n_features), dtype=np.float64)
+        for i, input_data in enumerate(records):
+            self.encode(input_data, out=out[i])
+        return out
+
+    """
+    the cartesian product of a list of values per feature, encoded straight into
+    one matrix without building the records. rows come in itertools.product order
+    (the last feature changes fastest), the same matrix encode_many would return.
+    start/stop select a slice of the product so a large grid can be encoded in parts
+    """
+    def encode_grid(self, axes, start=0, stop=None):
+        shape = tuple(len(values) for _, values in axes)
+        n_total = int(np.prod(shape, dtype=np.int64))
+        stop = n_total if stop is None else min(stop, n_total)
+        out = np.zeros((max(0, stop - start), self.n_features), dtype=np.float64)
+        rows = np.arange(len(out))
+        positions = np.unravel_index(np.arange(start, start + len(out)), shape)
+
+        for (key, values), position in zip(axes, positions):
+            if key in CATEGORICAL_FEATURES:
+                columns = np.array([self.onehot_index.get((key, str(value)), -1) for value in values], dtype=np.intp)[position]
+                hit = columns >= 0
+                out[rows[hit], columns[hit]] = 1.0
+            else:
+                idx = self.numeric_index.get(key)
+                if idx is not None:
+                    out[:, idx] = np.asarray(values, dtype=np.float64)[position]
+        return out
+
+_encoder = None
+
+# the encoder is rebuilt only when the column list object changes (model reload)
+def get_feature_encoder(model_columns):
+    global _encoder
+    encoder = _encoder
+    if encoder is None or encoder.columns is not model_columns:
+        encoder = FeatureEncoder(model_columns)
+        _encoder = encoder
+    return encoder
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# a file modified this recently may change again within the same mtime tick
+FINGERPRINT_MIN_AGE = 2.0
+
+"""
+size, mtime and inode of a model file, recorded next to its sha256 so later
+startups skip hashing it while the file is unchanged. None for a file modified
+too recently to be told apart from a rewrite by its stat alone
+"""
+def file_fingerprint(path):
+    st = os.stat(path)
+    if time.time() - st.st_mtime < FINGERPRINT_MIN_AGE:
+        return None
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'inode': st.st_ino}
+
+# sha256 of the model file, taken from the artifact while the recorded fingerprint still matches
+def model_file_sha256(model_path, artifact):
+    recorded = artifact.get('model_stat')
+    if recorded is not None and recorded == file_fingerprint(model_path):
+        return artifact.get('model_sha256')
+    return file_sha256(model_path)
+
+# after a full hash matched, the artifact gets the current fingerprint (best effort, it may be read-only)
+def refresh_fingerprint(artifact_path, artifact, model_path):
+    fingerprint = file_fingerprint(model_path)
+    if fingerprint is None or artifact.get('model_stat') == fingerprint:
+        return
+    artifact['model_stat'] = fingerprint
+    try:
+        tmp_path = f"{artifact_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(artifact, f, indent=2)
+        os.replace(tmp_path, artifact_path)
+    except OSError:
+        pass
+
+def default_schema_path(model_path):
+    return os.path.splitext(model_path)[0] + '.schema.json'
+
+# model columns as produced at training time (get_dummies with drop_first=True)
+def columns_from_training_csv(csv_path, target='Growth_Milestone'):
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    if target in df.columns:
+        df = df.drop(columns=[target])
+    return pd.get_dummies(df, columns=CATEGORICAL_FEATURES, drop_first=True).columns.tolist()
+
+# every category seen in training, including the one drop_first removed from the columns
+def vocabulary_from_training_csv(csv_path):
+    import pandas as pd
+
+    df = pd.read_csv(csv_path, usecols=CATEGORICAL_FEATURES, dtype=str)
+    return {feature: sorted(df[feature].dropna().unique().tolist()) for feature in CATEGORICAL_FEATURES}
+
+def build_feature_schema(model_columns, model_path, vocabulary=None):
+    schema = {
+        'version': FEATURE_SCHEMA_VERSION,
+        'columns': list(model_columns),
+        'categories': FeatureEncoder(model_columns).categories,
+        'model_sha256': file_sha256(model_path),
+        'model_stat': file_fingerprint(model_path),
+    }
+    # optional, schemas written without it are still valid
+    if vocabulary is not None:
+        schema['vocabulary'] = vocabulary
+    return schema
+
+def save_feature_schema(schema_path, model_columns, model_path, vocabulary=None):
+    schema = build_feature_schema(model_columns, model_path, vocabulary)
+    with open(schema_path, 'w', encoding='utf-8') as f:
+        json.dump(schema, f, indent=2)
+    return schema
+
+"""
+reads the small schema artifact saved next to the growth model and checks that
+it was written for exactly this model file
+"""
+def load_feature_schema(schema_path, model_path, model=None):
+    try:
+        with open(schema_path, encoding='utf-8') as f:
+            schema = json.load(f)
+    except (OSError, ValueError) as e:
+        raise FeatureSchemaError(f"Feature schema '{schema_path}' could not be read: {e}")
+
+    if schema.get('version') != FEATURE_SCHEMA_VERSION:
+        raise FeatureSchemaError(
+            f"Feature schema '{schema_path}' has version {schema.get('version')}, expected {FEATURE_SCHEMA_VERSION}.")
+
+    # the model file is hashed only when its size, mtime or inode changed since the schema was written
+    model_hash = model_file_sha256(model_path, schema)
+    if schema.get('model_sha256') != model_hash:
+        raise FeatureSchemaError(
+            f"Feature schema '{schema_path}' does not match '{model_path}' "
+            f"(schema sha256 {schema.get('model_sha256')}, model sha256 {model_hash}). Regenerate it with 'flask write-feature-schema'.")
+    refresh_fingerprint(schema_path, schema, model_path)
+
+    n_features = getattr(model, 'n_features_in_', None)
+    if n_features is not None and n_features != len(schema['columns']):
+        raise FeatureSchemaError(
+            f"Growth model expects {n_features} features but the schema has {len(schema['columns'])} columns.")
+
+    return schema
@@ -0,0 +1,186 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+from app.features import file_fingerprint, file_sha256, model_file_sha256, refresh_fingerprint
+
+FOREST_FORMAT_VERSION = 2
+
+# node arrays, one .npy file each so np.load can memory-map them
+FOREST_ARRAYS = ('children', 'feature', 'threshold', 'leaf', 'missing_left', 'value', 'roots', 'classes')
+
+class ForestFormatError(Exception):
+    pass
+
+"""
+the nodes of every tree of a fitted sklearn forest (or a single decision tree)
+concatenated into flat arrays. children holds (left, right) pairs with global
+indices, a leaf points to itself so rows that reached it can keep stepping.
+leaf values are stored the way DecisionTreeClassifier.predict_proba returns
+them, so predictions are bit-identical to sklearn's
+"""
+def flatten_forest(model):
+    estimators = getattr(model, 'estimators_', None) or [model]
+    n_classes = int(np.atleast_1d(model.n_classes_)[0])
+
+    offsets = np.cumsum([0] + [e.tree_.node_count for e in estimators])
+    arrays = {name: [] for name in ('children', 'feature', 'threshold', 'leaf', 'missing_left', 'value')}
+    for offset, estimator in zip(offsets, estimators):
+        tree = estimator.tree_
+        leaf = tree.children_left < 0
+        own = np.arange(tree.node_count) + offset
+        arrays['children'].append(np.stack([np.where(leaf, own, tree.children_left + offset),
+                                            np.where(leaf, own, tree.children_right + offset)], axis=1).ravel())
+        arrays['feature'].append(np.where(leaf, 0, tree.feature))
+        arrays['threshold'].append(tree.threshold)
+        arrays['leaf'].append(leaf)
+        missing = getattr(tree, 'missing_go_to_left', None)
+        arrays['missing_left'].append(np.zeros(tree.node_count, dtype=np.uint8) if missing is None else missing)
+
+        value = tree.value[:, 0, :n_classes].copy()
+        normalizer = value.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        value /= normalizer
+        arrays['value'].append(value)
+
+    flat = {
+        'children': np.concatenate(arrays['children']).astype(np.intp),
+        'feature': np.concatenate(arrays['feature']).astype(np.intp),
+        'threshold': np.concatenate(arrays['threshold']).astype(np.float64),
+        'leaf': np.concatenate(arrays['leaf']).astype(bool),
+        'missing_left': np.concatenate(arrays['missing_left']).astype(bool),
+        'value': np.concatenate(arrays['value']).astype(np.float64),
+        'roots': offsets[:-1].astype(np.intp),
+        'classes': np.asarray(model.classes_),
+    }
+    return flat, int(model.n_features_in_)
+
+"""
+predict / predict_proba over flat node arrays, in memory (from_model) or
+memory-mapped from the layout written by save_compact_forest. all trees are
+walked at once for all rows, a few vectorized steps at a time, (row, tree)
+pairs that reached a leaf are dropped between the steps. inputs are cast to
+float32 and tree probabilities are summed in tree order, exactly like sklearn.
+
+the fixed cost per call is a few numpy operations per tree level, far below
+sklearn's validation and joblib dispatch for small batches; sklearn's compiled
+traversal wins on large ones, so a forest built from_model hands batches of
+FALLBACK_MIN_ROWS or more back to the sklearn model. a memory-mapped forest has
+no sklearn model, it walks large batches CHUNK_ROWS rows at a time so the
+(row, tree) index arrays stay bounded
+"""
+class CompactForest:
+    FALLBACK_MIN_ROWS = 512
+    CHUNK_ROWS = 512
+    # steps between two leaf checks
+    STEPS_PER_CHECK = 4
+
+    def __init__(self, arrays, n_features, fallback=None):
+        for name in FOREST_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.n_features_in_ = n_features
+        self.classes_ = self.classes
+        self.n_classes_ = len(self.classes)
+        self.n_estimators = len(self.roots)
+        self.fallback = fallback
+
+    @classmethod
+    def from_model(cls, model):
+        arrays, n_features = flatten_forest(model)
+        return cls(arrays, n_features, fallback=model)
+
+    # mmap_mode='r': the node arrays stay in the page cache, shared by every process that maps them
+    @classmethod
+    def load(cls, path, model_path=None, mmap_mode='r'):
+        try:
+            with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ForestFormatError(f"Compact forest '{path}' could not be read: {e}")
+
+        if meta.get('version') != FOREST_FORMAT_VERSION:
+            raise ForestFormatError(f"Compact forest '{path}' has version {meta.get('version')}, expected {FOREST_FORMAT_VERSION}.")
+        if model_path is not None:
+            if meta.get('model_sha256') != model_file_sha256(model_path, meta):
+                raise ForestFormatError(f"Compact forest '{path}' was not written for '{model_path}', regenerate it with 'flask write-growth-forest'.")
+            refresh_fingerprint(os.path.join(path, 'meta.json'), meta, model_path)
+
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+                  for name in FOREST_ARRAYS}
+        return cls(arrays, meta['n_features'])
+
+    def _validate(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has shape {X.shape}, the forest expects {self.n_features_in_} features.")
+        return X
+
+    # (rows, trees) global index of the leaf every row ends in
+    def apply(self, X):
+        X = self._validate(X)
+        n_rows, n_trees = X.shape[0], self.n_estimators
+        flat_x = X.ravel()
+        has_missing = bool(np.isnan(flat_x).any())
+
+        leaves = np.empty(n_rows * n_trees, dtype=np.intp)
+        # per pending (row, tree) pair: output position, current node, row offset into flat_x
+        position = np.arange(leaves.size)
+        node = np.tile(np.asarray(self.roots, dtype=np.intp), n_rows)
+        offset = np.repeat(np.arange(n_rows, dtype=np.intp) * X.shape[1], n_trees)
+
+        while node.size:
+            for _ in range(self.STEPS_PER_CHECK):
+                x = flat_x[offset + self.feature[node]]
+                go_right = x > self.threshold[node]
+                if has_missing:
+                    missing = np.isnan(x)
+                    go_right[missing] = ~self.missing_left[node[missing]]
+                node = self.children[2 * node + go_right]
+
+            done = self.leaf[node]
+            if done.any():
+                leaves[position[done]] = node[done]
+                pending = ~done
+                position, node, offset = position[pending], node[pending], offset[pending]
+        return leaves.reshape(n_rows, n_trees)
+
+    def predict_proba(self, X):
+        if self.fallback is not None and len(X) >= self.FALLBACK_MIN_ROWS:
+            return self.fallback.predict_proba(X)
+
+        X = self._validate(X)
+        proba = np.zeros((len(X), self.n_classes_))
+        for start in range(0, len(X), self.CHUNK_ROWS):
+            leaves = self.apply(X[start:start + self.CHUNK_ROWS])
+            # cumsum adds the trees one after the other, the same rounding as sklearn's accumulation
+            proba[start:start + len(leaves)] = np.cumsum(self.value[leaves], axis=1)[:, -1]
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+# writes the flat layout next to the pickle, the directory is replaced as a whole
+def save_compact_forest(model, path, model_path):
+    arrays, n_features = flatten_forest(model)
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name in FOREST_ARRAYS:
+        np.save(os.path.join(tmp_path, f'{name}.npy'), np.ascontiguousarray(arrays[name]), allow_pickle=False)
+    meta = {
+        'version': FOREST_FORMAT_VERSION,
+        'n_features': n_features,
+        'n_estimators': len(arrays['roots']),
+        'n_nodes': len(arrays['leaf']),
+        'model_sha256': file_sha256(model_path),
+        'model_stat': file_fingerprint(model_path),
+    }
+    with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return meta
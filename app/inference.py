@@ -0,0 +1,301 @@
+import hashlib
+import io
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+IMAGE_SIZE = (224, 224)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+TFLITE_QUANTIZATIONS = ('none', 'dynamic', 'int8')
+
+# PIL image -> contiguous (224, 224, 3) uint8 array, RGBA/grayscale/palette images are converted once
+def to_model_array(img):
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img = img.resize(IMAGE_SIZE)
+    return np.asarray(img, dtype=np.uint8)
+
+# returns the model input for one image, None if it can not be decoded
+def load_image_array(path):
+    try:
+        return to_model_array(Image.open(path))
+    except Exception:
+        return None
+
+"""
+decodes an upload straight from memory. for JPEG the decoder is put in draft
+mode so it scales down by 1/2, 1/4 or 1/8 while decoding, which is much cheaper
+than decoding the full resolution photo and resizing it afterwards
+"""
+def decode_image(data):
+    try:
+        img = Image.open(io.BytesIO(data))
+        if img.format == 'JPEG':
+            img.draft('RGB', IMAGE_SIZE)
+        return to_model_array(img)
+    except Exception:
+        return None
+
+# (path, class folder name) for every image under folder/<class>/
+def iter_image_folder(folder):
+    for class_name in sorted(os.listdir(folder)):
+        class_dir = os.path.join(folder, class_name)
+        if not os.path.isdir(class_dir):
+            continue
+        for name in sorted(os.listdir(class_dir)):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                yield os.path.join(class_dir, name), class_name
+
+"""
+every backend takes uint8 pixel batches (0-255) and does the /255 rescale
+itself, so the request path never materializes float64 images
+"""
+class KerasDiseaseModel:
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, batch, verbose=0):
+        return self.model.predict(np.asarray(batch, dtype=np.float32) / np.float32(255.0), verbose=verbose)
+
+    def warmup(self, batch_sizes=(1,)):
+        return self
+
+"""
+wraps the keras disease model in a traced tf.function with a fixed input
+signature. keras predict() builds a data adapter and runs callbacks on every
+call, which dominates the latency of small batches. the uint8 -> float32 cast
+and rescale run inside the graph
+"""
+class CompiledDiseaseModel:
+    def __init__(self, model, input_shape=IMAGE_SIZE + (3,)):
+        import tensorflow as tf
+
+        self.model = model
+        self.input_shape = tuple(input_shape)
+        self._tf = tf
+        spec = tf.TensorSpec(shape=(None,) + self.input_shape, dtype=tf.uint8)
+        self._forward = tf.function(self._call, input_signature=[spec])
+
+    def _call(self, batch):
+        return self.model(self._tf.cast(batch, self._tf.float32) / 255.0, training=False)
+
+    # same call shape as keras Model.predict so callers do not care which one they get
+    def predict(self, batch, verbose=0):
+        return self._forward(np.asarray(batch, dtype=np.uint8)).numpy()
+
+    # runs dummy batches so tracing and kernel selection happen before the first request
+    def warmup(self, batch_sizes=(1,)):
+        for size in sorted(set(batch_sizes)):
+            self.predict(np.zeros((size,) + self.input_shape, dtype=np.uint8))
+        return self
+
+# names, sizes and mtimes of the calibration images, a new or edited sample changes it
+def calibration_fingerprint(calibration_dir):
+    digest = hashlib.sha256(os.path.abspath(calibration_dir).encode())
+    for path, class_name in iter_image_folder(calibration_dir):
+        st = os.stat(path)
+        digest.update(f"{class_name}/{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:12]
+
+# int8 models depend on the calibration set too, each set gets its own cache file
+def tflite_cache_path(model_path, quantization, calibration_dir=None):
+    suffix = quantization
+    if quantization == 'int8' and calibration_dir:
+        suffix += f"-{calibration_fingerprint(calibration_dir)}"
+    return f"{os.path.splitext(model_path)[0]}.{suffix}.tflite"
+
+def convert_to_tflite(model, quantization='none', calibration_dir=None, calibration_limit=200):
+    import tensorflow as tf
+
+    if quantization not in TFLITE_QUANTIZATIONS:
+        raise ValueError(f"Unknown TFLite quantization '{quantization}', expected one of {TFLITE_QUANTIZATIONS}")
+
+    # the converted graph takes uint8 pixels and rescales them itself
+    inputs = tf.keras.Input(shape=tuple(model.input_shape[1:]), dtype='uint8')
+    outputs = model(tf.keras.layers.Rescaling(1.0 / 255.0)(inputs))
+    uint8_model = tf.keras.Model(inputs, outputs)
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(uint8_model)
+    if quantization in ('dynamic', 'int8'):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if quantization == 'int8':
+        if not calibration_dir:
+            raise ValueError("int8 quantization needs DISEASE_CALIBRATION_DIR with sample images")
+
+        # activation ranges are calibrated on real leaf photos
+        def representative_dataset():
+            paths = [path for path, _ in iter_image_folder(calibration_dir)][:calibration_limit]
+            for path in paths:
+                img_array = load_image_array(path)
+                if img_array is not None:
+                    yield [np.expand_dims(img_array, 0)]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    return converter.convert()
+
+def _make_interpreter(model_content, num_threads):
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter(model_content=model_content, num_threads=num_threads)
+
+"""
+runs a converted .tflite disease model through the TFLite interpreter. the
+interpreter is not thread safe, calls are serialized with a lock
+"""
+class TFLiteDiseaseModel:
+    def __init__(self, model_content, num_threads=None):
+        self._interpreter = _make_interpreter(model_content, num_threads)
+        input_details = self._interpreter.get_input_details()[0]
+        self._input_index = input_details['index']
+        # models converted before the uint8 input signature still take float32 in [0, 1]
+        self._float_input = input_details['dtype'] == np.float32
+        self._output_index = self._interpreter.get_output_details()[0]['index']
+        self._batch_size = None
+        self._lock = threading.Lock()
+
+    def predict(self, batch, verbose=0):
+        if self._float_input:
+            batch = np.asarray(batch, dtype=np.float32) / np.float32(255.0)
+        else:
+            batch = np.asarray(batch, dtype=np.uint8)
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self._interpreter.resize_tensor_input(self._input_index, batch.shape)
+                self._interpreter.allocate_tensors()
+                self._batch_size = batch.shape[0]
+            self._interpreter.set_tensor(self._input_index, batch)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output_index).copy()
+
+    def warmup(self, batch_sizes=(1,)):
+        input_shape = IMAGE_SIZE + (3,)
+        for size in sorted(set(batch_sizes)):
+            self.predict(np.zeros((size,) + input_shape, dtype=np.uint8))
+        return self
+
+"""
+the converted model is cached next to the .h5 and reused until the .h5 changes,
+the keras model is only loaded when a conversion is needed
+"""
+def load_tflite_model(model_path, quantization='none', num_threads=None, calibration_dir=None, keras_model=None):
+    cache_path = tflite_cache_path(model_path, quantization, calibration_dir)
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(model_path):
+        with open(cache_path, 'rb') as f:
+            model_content = f.read()
+    else:
+        if keras_model is None:
+            import tensorflow as tf
+            keras_model = tf.keras.models.load_model(model_path)
+        model_content = convert_to_tflite(keras_model, quantization, calibration_dir)
+
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(model_content)
+        os.replace(tmp_path, cache_path)
+        print(f"Disease model converted to TFLite ({quantization}): {cache_path}")
+
+    return TFLiteDiseaseModel(model_content, num_threads)
+
+def build_disease_backend(model, config, backend=None):
+    backend = backend or config.get('DISEASE_BACKEND', 'compiled')
+    warmup_sizes = config.get('DISEASE_WARMUP_BATCH_SIZES', (1,))
+    if backend == 'keras':
+        return KerasDiseaseModel(model)
+    if backend == 'compiled':
+        return CompiledDiseaseModel(model).warmup(warmup_sizes)
+    if backend == 'tflite':
+        return load_tflite_model(
+            config['DISEASE_MODEL_PATH'],
+            config.get('DISEASE_TFLITE_QUANTIZATION', 'none'),
+            config.get('DISEASE_TFLITE_THREADS'),
+            config.get('DISEASE_CALIBRATION_DIR'),
+            keras_model=model).warmup(warmup_sizes)
+    raise ValueError(f"Unknown disease backend '{backend}'")
+
+# identifies the weights and the backend that produced a prediction, used as part of cache keys
+def disease_model_version(config):
+    from app.features import file_sha256
+
+    backend = config.get('DISEASE_BACKEND', 'compiled')
+    version = f"{file_sha256(config['DISEASE_MODEL_PATH'])[:16]}:{backend}"
+    if backend == 'tflite':
+        quantization = config.get('DISEASE_TFLITE_QUANTIZATION', 'none')
+        version += f":{quantization}"
+        if quantization == 'int8' and config.get('DISEASE_CALIBRATION_DIR'):
+            version += f"-{calibration_fingerprint(config['DISEASE_CALIBRATION_DIR'])}"
+    return version
+
+def load_disease_backend(config):
+    model_path = config['DISEASE_MODEL_PATH']
+    if config.get('DISEASE_BACKEND') == 'tflite':
+        backend = build_disease_backend(None, config)
+    else:
+        import tensorflow as tf
+        backend = build_disease_backend(tf.keras.models.load_model(model_path), config)
+
+    backend.model_version = disease_model_version(config)
+    return backend
+
+"""
+accuracy parity on a held-out folder laid out as folder/<disease type name>/*.jpg:
+top-1 agreement between two backends, accuracy of each and time per image
+"""
+def compare_backends(reference, candidate, folder, class_names, batch_size=32):
+    class_index = {name: i for i, name in enumerate(class_names)}
+    stats = {'images': 0, 'labelled': 0, 'agree': 0, 'reference_correct': 0, 'candidate_correct': 0,
+             'max_abs_diff': 0.0, 'reference_seconds': 0.0, 'candidate_seconds': 0.0}
+
+    def run(batch, labels):
+        x = np.stack(batch)
+        start = time.perf_counter()
+        ref = np.asarray(reference.predict(x, verbose=0))
+        stats['reference_seconds'] += time.perf_counter() - start
+        start = time.perf_counter()
+        cand = np.asarray(candidate.predict(x, verbose=0))
+        stats['candidate_seconds'] += time.perf_counter() - start
+
+        ref_top, cand_top = ref.argmax(axis=1), cand.argmax(axis=1)
+        stats['images'] += len(batch)
+        stats['agree'] += int((ref_top == cand_top).sum())
+        stats['max_abs_diff'] = max(stats['max_abs_diff'], float(np.abs(ref - cand).max()))
+        for label, r, c in zip(labels, ref_top, cand_top):
+            if label is not None:
+                stats['labelled'] += 1
+                stats['reference_correct'] += int(r == label)
+                stats['candidate_correct'] += int(c == label)
+
+    batch, labels = [], []
+    for path, class_name in iter_image_folder(folder):
+        img_array = load_image_array(path)
+        if img_array is None or img_array.shape != IMAGE_SIZE + (3,):
+            continue
+        batch.append(img_array)
+        labels.append(class_index.get(class_name))
+        if len(batch) == batch_size:
+            run(batch, labels)
+            batch, labels = [], []
+    if batch:
+        run(batch, labels)
+
+    images = max(stats['images'], 1)
+    labelled = max(stats['labelled'], 1)
+    return {
+        'images': stats['images'],
+        'agreement': stats['agree'] / images,
+        'reference_accuracy': stats['reference_correct'] / labelled if stats['labelled'] else None,
+        'candidate_accuracy': stats['candidate_correct'] / labelled if stats['labelled'] else None,
+        'max_abs_diff': stats['max_abs_diff'],
+        'reference_ms_per_image': stats['reference_seconds'] * 1000 / images,
+        'candidate_ms_per_image': stats['candidate_seconds'] * 1000 / images,
+    }
@@ -0,0 +1,153 @@
+import csv
+import math
+import warnings
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app.extensions import db
+from app.models import GrowthLog, Plant
+
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y"]
+
+# rows per bulk insert and per transaction
+INGEST_CHUNK_SIZE = 10000
+
+# rejected rows reported back with their line numbers
+MAX_REPORTED_ERRORS = 50
+
+def parse_csv_date(date_str):
+    if not date_str:
+        return None
+
+    for fmt in DATE_FORMATS:
+        try:
+            dt = datetime.strptime(date_str, fmt)
+            if dt > datetime.now():
+                warnings.warn(f"Future date detected: {date_str}", UserWarning)
+            return dt
+        except ValueError:
+            continue
+
+    return None
+
+# csv header (api or training style names, any case) -> growth_log column
+COLUMN_ALIASES = {
+    'growth_milestone': 'predicted_milestone',
+    'milestone': 'predicted_milestone',
+}
+
+CSV_CATEGORIES = {'soil_type': 'Soil_Type', 'water_frequency': 'Water_Frequency', 'fertilizer_type': 'Fertilizer_Type'}
+CSV_FLOATS = ('sunlight_hours', 'temperature', 'humidity')
+
+class IngestError(Exception):
+    pass
+
+def normalize_header(name):
+    key = (name or '').strip().lower()
+    return COLUMN_ALIASES.get(key, key)
+
+# yields lists of (line number, row dict), only one chunk is held in memory
+def iter_csv_chunks(text_stream, chunk_size=None):
+    chunk_size = chunk_size or INGEST_CHUNK_SIZE
+    reader = csv.reader(text_stream)
+    header = [normalize_header(name) for name in next(reader, [])]
+    missing = {'plant_id', *CSV_CATEGORIES, *CSV_FLOATS} - set(header)
+    if missing:
+        raise IngestError(f"CSV is missing columns: {sorted(missing)}")
+
+    chunk = []
+    for values in reader:
+        if not any(values):
+            continue
+        chunk.append((reader.line_num, dict(zip(header, values))))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+"""
+csv row -> growth_log insert values. dates use the same formats as the rest of
+the app, categories must be part of the growth model vocabulary when it is known
+"""
+def validate_row(raw, plant_ids, vocabulary=None):
+    try:
+        plant_id = int(raw['plant_id'])
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid plant_id '{raw.get('plant_id')}'")
+    if plant_id not in plant_ids:
+        raise ValueError(f"plant {plant_id} not found")
+
+    row = {'plant_id': plant_id}
+    for name in CSV_FLOATS:
+        try:
+            row[name] = float(raw[name])
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid {name} '{raw.get(name)}'")
+
+    for name, feature in CSV_CATEGORIES.items():
+        value = (raw.get(name) or '').strip()
+        if not value:
+            raise ValueError(f"{name} is empty")
+        if vocabulary is not None and value not in vocabulary.get(feature, ()):
+            raise ValueError(f"unknown {name} '{value}'")
+        row[name] = value
+
+    date_str = (raw.get('date') or '').strip()
+    row['date'] = parse_csv_date(date_str) if date_str else datetime.utcnow()
+    if row['date'] is None:
+        raise ValueError(f"invalid date '{date_str}', expected one of {DATE_FORMATS}")
+
+    milestone = (raw.get('predicted_milestone') or '').strip()
+    try:
+        value = float(milestone) if milestone else None
+    except ValueError:
+        value = math.nan
+    # '2.0' from spreadsheet exports is fine, '2.7' is not truncated to 2
+    if value is not None and not value.is_integer():
+        raise ValueError(f"invalid predicted_milestone '{milestone}'")
+    row['predicted_milestone'] = None if value is None else int(value)
+    return row
+
+"""
+streams a growth log csv into the database: every chunk is validated, rows
+without a milestone are predicted in one model call (predict_fn) and the chunk
+is written with one executemany insert and one commit
+"""
+def ingest_growth_csv(text_stream, predict_fn=None, vocabulary=None, chunk_size=None):
+    report = {'rows': 0, 'inserted': 0, 'predicted': 0, 'rejected': 0, 'errors': []}
+    plant_ids = set(pid for (pid,) in db.session.query(Plant.id))
+
+    def reject(line, message):
+        report['rejected'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'line': line, 'message': message})
+
+    for chunk in iter_csv_chunks(text_stream, chunk_size):
+        report['rows'] += len(chunk)
+        rows, lines = [], []
+        for line, raw in chunk:
+            try:
+                rows.append(validate_row(raw, plant_ids, vocabulary))
+                lines.append(line)
+            except ValueError as e:
+                reject(line, str(e))
+
+        unlabelled = [r for r in rows if r['predicted_milestone'] is None]
+        if unlabelled and predict_fn is not None:
+            for r, milestone in zip(unlabelled, predict_fn(unlabelled)):
+                r['predicted_milestone'] = int(milestone)
+            report['predicted'] += len(unlabelled)
+        elif unlabelled:
+            for r, line in zip(rows, lines):
+                if r['predicted_milestone'] is None:
+                    reject(line, "predicted_milestone is empty and prediction is off")
+            rows = [r for r in rows if r['predicted_milestone'] is not None]
+
+        if rows:
+            db.session.execute(insert(GrowthLog), rows)
+            db.session.commit()
+            report['inserted'] += len(rows)
+
+    return report
@@ -0,0 +1,183 @@
+import threading
+import traceback
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, insert, literal, or_, select
+
+from app.extensions import db
+from app.models import DiseaseJob
+
+# the job can never succeed (unreadable image, deleted plant), it is failed without retries
+class JobFailed(Exception):
+    pass
+
+"""
+durable disease check queue: jobs are rows of the disease_job table, so queued
+work survives restarts. a bounded pool of worker threads claims the oldest
+queued job with a conditional UPDATE (safe with several processes on one
+database), runs the handler and stores the result in the same transaction as
+the job status. a job left 'running' by a killed worker is claimed again once
+its lease has expired (failed once it has used max_attempts), every claim gets a new token and a worker whose lease
+was taken over in the meantime cannot overwrite the newer result
+"""
+class DiseaseJobQueue:
+    def __init__(self, app, handler, workers=2, poll_seconds=1.0, lease_seconds=60,
+                 max_attempts=3, ready=None):
+        self.app = app
+        self.handler = handler
+        self.workers = max(0, int(workers))
+        self.poll_seconds = max(0.01, float(poll_seconds))
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max(1, int(max_attempts))
+        # workers do not claim jobs while this returns False (model still loading)
+        self.ready = ready or (lambda: True)
+
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+
+        self.jobs_run = 0
+        self.jobs_failed = 0
+
+    """
+    adds a job, the caller commits. with max_queued the count and the insert are
+    one INSERT ... SELECT statement, None is returned when the queue is full
+    """
+    def submit(self, plant_id, image_path, image_sha256=None, max_queued=None):
+        values = {'plant_id': plant_id, 'image_path': image_path, 'image_sha256': image_sha256,
+                  'status': 'queued', 'attempts': 0, 'created_at': datetime.utcnow()}
+        rows = select(*(literal(value, DiseaseJob.__table__.c[name].type).label(name) for name, value in values.items()))
+        if max_queued is not None:
+            queued = select(func.count()).select_from(DiseaseJob).where(DiseaseJob.status == 'queued').scalar_subquery()
+            rows = rows.where(queued < max_queued)
+
+        stmt = insert(DiseaseJob).from_select(list(values), rows).returning(DiseaseJob.id)
+        job_id = db.session.execute(stmt).scalar()
+        return None if job_id is None else db.session.get(DiseaseJob, job_id)
+
+    def queued_count(self):
+        return DiseaseJob.query.filter_by(status='queued').count()
+
+    # wakes an idle worker, starting the pool on first use
+    def notify(self):
+        self.start()
+        self._wake.set()
+
+    def start(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for i in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._run, name=f"disease-job-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+
+    def _expired(self, now):
+        return and_(DiseaseJob.status == 'running', DiseaseJob.started_at < now - self.lease)
+
+    # an expired job is claimed again only while it has attempts left
+    def _claimable(self, now):
+        return or_(DiseaseJob.status == 'queued',
+                   and_(self._expired(now), DiseaseJob.attempts < self.max_attempts))
+
+    # expired jobs whose last attempt also stopped its worker are failed instead of retried forever
+    def fail_exhausted(self, now):
+        failed = (DiseaseJob.query.filter(self._expired(now), DiseaseJob.attempts >= self.max_attempts)
+                  .update({'status': 'failed', 'finished_at': now, 'claim_token': None,
+                           'error': "the worker stopped during every attempt"}, synchronize_session=False))
+        db.session.commit()
+        self.jobs_failed += failed
+        return failed
+
+    """
+    marks the oldest claimable job as running and returns it, None when there is
+    nothing to do. the claim token is kept on the returned object (lease_token),
+    reloading the row would show the token of whoever claimed it last
+    """
+    def claim(self):
+        now = datetime.utcnow()
+        self.fail_exhausted(now)
+        candidates = [job_id for (job_id,) in db.session.query(DiseaseJob.id)
+                      .filter(self._claimable(now)).order_by(DiseaseJob.id).limit(self.workers + 1)]
+        for job_id in candidates:
+            token = uuid.uuid4().hex
+            # another worker may have claimed it in between, then no row is updated
+            claimed = (DiseaseJob.query.filter(DiseaseJob.id == job_id, self._claimable(now))
+                       .update({'status': 'running', 'started_at': now, 'attempts': DiseaseJob.attempts + 1,
+                                'claim_token': token}, synchronize_session=False))
+            db.session.commit()
+            if claimed:
+                job = db.session.get(DiseaseJob, job_id)
+                job.lease_token = token
+                return job
+        return None
+
+    # stores the outcome in the current transaction only while the claim is still ours
+    def _finish(self, job_id, token, values):
+        updated = (DiseaseJob.query.filter(DiseaseJob.id == job_id, DiseaseJob.status == 'running',
+                                           DiseaseJob.claim_token == token)
+                   .update(dict(values, claim_token=None), synchronize_session=False))
+        if not updated:
+            # the lease expired and the job was claimed again (or deleted), the newer claim owns the result
+            db.session.rollback()
+            print(f"Disease job {job_id} was claimed again, result discarded")
+            return False
+        db.session.commit()
+        return True
+
+    def run_job(self, job):
+        job_id, token, attempts = job.id, job.lease_token, job.attempts
+        try:
+            check = self.handler(job)
+            outcome = {'status': 'done', 'disease_check_id': check.id, 'error': None}
+        except Exception as e:
+            db.session.rollback()
+            # temporary errors go back to the queue until the attempts are used up
+            failed = isinstance(e, JobFailed) or attempts >= self.max_attempts
+            outcome = {'status': 'failed' if failed else 'queued', 'error': str(e) or type(e).__name__}
+            if not isinstance(e, JobFailed):
+                traceback.print_exc()
+        outcome['finished_at'] = datetime.utcnow() if outcome['status'] != 'queued' else None
+
+        if self._finish(job_id, token, outcome):
+            self.jobs_run += 1
+            if outcome['status'] == 'failed':
+                self.jobs_failed += 1
+
+    # processes jobs in the calling thread (inside an app context) until the queue is empty
+    def run_pending(self, limit=None):
+        processed = 0
+        while (limit is None or processed < limit) and self.ready():
+            job = self.claim()
+            if job is None:
+                break
+            self.run_job(job)
+            processed += 1
+        return processed
+
+    def _run(self):
+        with self.app.app_context():
+            while not self._closed:
+                processed = 0
+                try:
+                    processed = self.run_pending()
+                except Exception as e:
+                    print(f"Disease job worker error: {e}")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+                # polling also picks up jobs queued by other processes
+                if not processed and not self._closed:
+                    self._wake.wait(self.poll_seconds)
+                    self._wake.clear()
@@ -0,0 +1,21 @@
+from sqlalchemy import inspect
+
+from app.extensions import db
+
+"""
+db.create_all() only creates missing tables, indexes added to the models later
+never reach an existing plant_care.db. this creates every declared index that
+the database does not have yet (CREATE INDEX on the existing rows)
+"""
+def ensure_indexes(engine):
+    inspector = inspect(engine)
+    created = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
+                created.append(index.name)
+    return created
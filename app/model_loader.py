@@ -0,0 +1,223 @@
+import os
+import threading
+import time
+
+from app import extensions
+from app.features import columns_from_training_csv, file_sha256, get_feature_encoder, load_feature_schema, vocabulary_from_training_csv
+from app.inference import load_disease_backend
+
+"""
+models are loaded once per process, by default on background threads, so that
+app startup and the non-ML endpoints never wait for tensorflow/joblib imports
+"""
+MODEL_NAMES = ('growth', 'disease')
+
+_lock = threading.Lock()
+
+# state: idle, loading, ready, missing, error
+model_status = {name: {'state': 'idle', 'path': None, 'seconds': None, 'error': None} for name in MODEL_NAMES}
+
+def _set_status(name, **values):
+    with _lock:
+        model_status[name].update(values)
+
+def get_model_status():
+    with _lock:
+        return {name: dict(status) for name, status in model_status.items()}
+
+def models_ready():
+    return all(s['state'] in ('ready', 'missing') for s in get_model_status().values())
+
+"""
+the compact forest layout is memory-mapped read-only, so every worker on the
+node shares one physical copy of the node arrays. joblib.load gives each
+process a private copy (sklearn's Tree copies its node arrays on unpickling,
+joblib's mmap_mode cannot avoid that). the pickle is the fallback
+"""
+def load_growth_estimator(config):
+    model_path = config['GROWTH_MODEL_PATH']
+    forest_path = config.get('GROWTH_FOREST_PATH')
+    if forest_path and os.path.isdir(forest_path):
+        from app.forest import CompactForest, ForestFormatError
+
+        try:
+            model = CompactForest.load(forest_path, model_path, mmap_mode='r')
+            print(f"Plant growth model memory-mapped from {forest_path}.")
+            return model
+        except ForestFormatError as e:
+            print(f"{e} Loading {model_path} instead.")
+
+    import joblib
+
+    model = joblib.load(model_path)
+    if config.get('GROWTH_EVALUATOR') == 'compact':
+        from app.forest import CompactForest
+
+        return CompactForest.from_model(model)
+    return model
+
+def load_growth_model(config):
+    model_path = config['GROWTH_MODEL_PATH']
+    if not os.path.exists(model_path):
+        _set_status('growth', state='missing', path=model_path)
+        return
+
+    start = time.perf_counter()
+    _set_status('growth', state='loading', path=model_path, error=None)
+    try:
+        growth_model = load_growth_estimator(config)
+        print("Plant growth model loaded.")
+
+        schema_path = config['GROWTH_SCHEMA_PATH']
+        csv_path = config['GROWTH_DATA_PATH']
+        model_sha256 = None
+        vocabulary = None
+        if os.path.exists(schema_path):
+            schema = load_feature_schema(schema_path, model_path, growth_model)
+            model_columns = schema['columns']
+            model_sha256 = schema['model_sha256']
+            vocabulary = schema.get('vocabulary')
+        elif os.path.exists(csv_path):
+            print(f"Feature schema '{schema_path}' not found, rebuilding columns from {csv_path}. Run 'flask write-feature-schema' to speed up startup.")
+            model_columns = columns_from_training_csv(csv_path)
+            vocabulary = vocabulary_from_training_csv(csv_path)
+        else:
+            model_columns = None
+            print("Feature schema and Growth Data CSV not found. Prediction might fail.")
+
+        if model_columns:
+            extensions.model_columns = model_columns
+            # compile the one-hot encoder once instead of per request
+            get_feature_encoder(extensions.model_columns)
+        extensions.growth_vocabulary = vocabulary
+        extensions.growth_model = growth_model
+        extensions.growth_model_version = (model_sha256 or file_sha256(model_path))[:16]
+        # predictions of the previous model must not be served for the new one
+        if extensions.growth_prediction_cache is not None:
+            extensions.growth_prediction_cache.clear()
+
+        _set_status('growth', state='ready', seconds=round(time.perf_counter() - start, 3))
+    except Exception as e:
+        print(f"Model loading error: {e}")
+        _set_status('growth', state='error', error=str(e))
+
+def load_disease_model(config):
+    model_path = config['DISEASE_MODEL_PATH']
+    if not os.path.exists(model_path):
+        _set_status('disease', state='missing', path=model_path)
+        return
+
+    start = time.perf_counter()
+    _set_status('disease', state='loading', path=model_path, error=None)
+    try:
+        extensions.disease_model = load_disease_backend(config)
+        print(f"Plant disease model loaded ({config['DISEASE_BACKEND']} backend).")
+        _set_status('disease', state='ready', seconds=round(time.perf_counter() - start, 3))
+    except Exception as e:
+        print(f"Model loading error: {e}")
+        _set_status('disease', state='error', error=str(e))
+
+"""
+MODEL_SERVER_SOCKET set: the models live in the model server process
+(app.model_server), this process only loads the small feature schema it sends
+and keeps proxies that forward predict calls over the socket
+"""
+def connect_model_server(config):
+    from app.model_server import ModelServerClient, RemoteDiseaseModel, RemoteGrowthModel
+
+    socket_path = config['MODEL_SERVER_SOCKET']
+    start = time.perf_counter()
+    for name in MODEL_NAMES:
+        _set_status(name, state='loading', path=socket_path, error=None)
+
+    client = ModelServerClient(socket_path, timeout=config['MODEL_SERVER_TIMEOUT'])
+    # the server may still be starting next to this process
+    deadline = time.monotonic() + config['MODEL_SERVER_CONNECT_TIMEOUT']
+    while True:
+        try:
+            models = client.info()['models']
+            break
+        except Exception as e:
+            if time.monotonic() >= deadline:
+                print(f"Model server error: {e}")
+                for name in MODEL_NAMES:
+                    _set_status(name, state='error', error=str(e))
+                return
+            time.sleep(0.5)
+
+    seconds = round(time.perf_counter() - start, 3)
+    growth = models.get('growth')
+    if growth:
+        if growth['columns']:
+            extensions.model_columns = growth['columns']
+            get_feature_encoder(extensions.model_columns)
+        extensions.growth_vocabulary = growth['vocabulary']
+        extensions.growth_model = RemoteGrowthModel(client, growth.get('classes'))
+        extensions.growth_model_version = growth['version']
+        if extensions.growth_prediction_cache is not None:
+            extensions.growth_prediction_cache.clear()
+        _set_status('growth', state='ready', seconds=seconds)
+    else:
+        _set_status('growth', state='missing')
+
+    disease = models.get('disease')
+    if disease:
+        extensions.disease_model = RemoteDiseaseModel(client, disease['version'])
+        _set_status('disease', state='ready', seconds=seconds)
+    else:
+        _set_status('disease', state='missing')
+    print(f"Connected to model server at {socket_path}.")
+
+LOADERS = {'growth': load_growth_model, 'disease': load_disease_model}
+
+PATH_KEYS = {'growth': 'GROWTH_MODEL_PATH', 'disease': 'DISEASE_MODEL_PATH'}
+
+"""
+MODEL_LOADING=background starts one loader thread per model, eager loads them
+before returning and off skips loading. a model that is already loading or
+loaded from the same path is not loaded again
+"""
+def start_model_loading(app):
+    mode = app.config['MODEL_LOADING']
+    if mode == 'off':
+        return []
+
+    config = dict(app.config)
+    if config.get('MODEL_SERVER_SOCKET'):
+        return _start_model_server_connection(config, mode)
+
+    threads = []
+    for name in MODEL_NAMES:
+        path = config[PATH_KEYS[name]]
+        with _lock:
+            status = model_status[name]
+            if status['path'] == path and status['state'] in ('loading', 'ready'):
+                continue
+            if not os.path.exists(path):
+                status.update(state='missing', path=path, seconds=None, error=None)
+                continue
+            status.update(state='loading', path=path, seconds=None, error=None)
+
+        if mode == 'eager':
+            LOADERS[name](config)
+        else:
+            thread = threading.Thread(target=LOADERS[name], args=(config,), name=f"{name}-model-loader", daemon=True)
+            thread.start()
+            threads.append(thread)
+    return threads
+
+def _start_model_server_connection(config, mode):
+    socket_path = config['MODEL_SERVER_SOCKET']
+    with _lock:
+        if all(model_status[name]['path'] == socket_path and model_status[name]['state'] in ('loading', 'ready')
+               for name in MODEL_NAMES):
+            return []
+        for name in MODEL_NAMES:
+            model_status[name].update(state='loading', path=socket_path, seconds=None, error=None)
+
+    if mode == 'eager':
+        connect_model_server(config)
+        return []
+    thread = threading.Thread(target=connect_model_server, args=(config,), name="model-server-client", daemon=True)
+    thread.start()
+    return [thread]
@@ -0,0 +1,244 @@
+"""
+local model server: one process loads tensorflow and the growth model, web
+workers send it preprocessed tensors (uint8 images, encoded growth features)
+over a unix socket and get the prediction arrays back
+
+    python -m app.model_server --socket model-server.sock
+    MODEL_SERVER_SOCKET=model-server.sock python run.py
+
+messages are a fixed size prefix (header length, payload length), a json
+header and the raw array bytes, arrays are never pickled
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+
+import numpy as np
+
+from app import extensions
+
+_PREFIX = struct.Struct('!II')
+
+class ModelServerError(Exception):
+    pass
+
+def _recv_exact(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            raise ConnectionError("model server connection closed")
+        received += count
+    return buffer
+
+def send_message(sock, header, payload=b''):
+    head = json.dumps(header).encode()
+    sock.sendall(_PREFIX.pack(len(head), len(payload)) + head)
+    if len(payload):
+        sock.sendall(payload)
+
+# received: bytes of the message already read by the caller
+def recv_message(sock, received=b''):
+    head_size, payload_size = _PREFIX.unpack(bytes(received) + _recv_exact(sock, _PREFIX.size - len(received)))
+    header = json.loads(_recv_exact(sock, head_size))
+    return header, _recv_exact(sock, payload_size)
+
+def encode_array(array):
+    array = np.ascontiguousarray(array)
+    return {'dtype': array.dtype.str, 'shape': list(array.shape)}, array.data.cast('B')
+
+def decode_array(header, payload):
+    return np.frombuffer(payload, dtype=np.dtype(header['dtype'])).reshape(header['shape'])
+
+"""
+client side, one connection per thread (web workers serve requests on several
+threads). a connection found broken before any response byte arrived (server
+restarted, idle connection closed) is reopened once. a timeout is raised as is,
+resending would queue a second copy behind the one the server is still running
+"""
+class ModelServerClient:
+    def __init__(self, socket_path, timeout=30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def close(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def call(self, header, payload=b''):
+        for attempt in range(2):
+            sock = self._connection()
+            try:
+                send_message(sock, header, payload)
+                first = _recv_exact(sock, 1)
+                break
+            except ConnectionError:
+                # reset, broken pipe or closed before any reply byte: the request was not answered
+                self.close()
+                if attempt:
+                    raise
+            except OSError:
+                # timeouts included, the server may still be working on the request
+                self.close()
+                raise
+        try:
+            response, data = recv_message(sock, first)
+        except OSError:
+            self.close()
+            raise
+        if not response.get('ok'):
+            raise ModelServerError(response.get('error') or 'model server error')
+        return response, data
+
+    def info(self):
+        return self.call({'op': 'info'})[0]
+
+    def predict(self, model, batch, method='predict'):
+        meta, payload = encode_array(batch)
+        response, data = self.call({'op': 'predict', 'model': model, 'method': method, **meta}, payload)
+        return decode_array(response, data)
+
+# stand-ins for the loaded models in a web worker, the rest of the app uses them unchanged
+class RemoteDiseaseModel:
+    def __init__(self, client, model_version):
+        self.client = client
+        self.model_version = model_version
+
+    def predict(self, batch, verbose=0):
+        return self.client.predict('disease', np.asarray(batch))
+
+class RemoteGrowthModel:
+    def __init__(self, client, classes=None):
+        self.client = client
+        self.classes_ = None if classes is None else np.asarray(classes)
+
+    def predict(self, features):
+        return self.client.predict('growth', np.asarray(features, dtype=np.float64))
+
+    def predict_proba(self, features):
+        return self.client.predict('growth', np.asarray(features, dtype=np.float64), method='predict_proba')
+
+class _Handler(socketserver.BaseRequestHandler):
+    # one connection carries many requests, until the client closes it
+    def handle(self):
+        while True:
+            try:
+                header, payload = recv_message(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                response, data = self.server.dispatch(header, payload)
+            except Exception as e:
+                response, data = {'ok': False, 'error': str(e) or type(e).__name__}, b''
+            send_message(self.request, response, data)
+
+"""
+serves the given models (main() passes the ones loaded into app.extensions).
+one forward pass runs at a time per model, so tensorflow's intra-op threads are
+the only threads competing for the cores
+"""
+class ModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, disease_model=None, growth_model=None, growth_version=None,
+                 model_columns=None, growth_vocabulary=None):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.socket_path = socket_path
+        self.models = {'disease': disease_model, 'growth': growth_model}
+        classes = getattr(growth_model, 'classes_', None)
+        self.growth_info = {'version': growth_version, 'columns': list(model_columns or []), 'vocabulary': growth_vocabulary,
+                            'classes': None if classes is None else np.asarray(classes).tolist()}
+        self._locks = {'disease': threading.Lock(), 'growth': threading.Lock()}
+        super().__init__(socket_path, _Handler)
+
+    def info(self):
+        models = {'disease': None, 'growth': None}
+        if self.models['disease'] is not None:
+            version = getattr(self.models['disease'], 'model_version', None)
+            models['disease'] = {'version': version if isinstance(version, str) else None}
+        if self.models['growth'] is not None:
+            models['growth'] = self.growth_info
+        return {'ok': True, 'pid': os.getpid(), 'models': models}
+
+    def dispatch(self, header, payload):
+        op = header.get('op')
+        if op == 'info':
+            return self.info(), b''
+        if op != 'predict':
+            raise ModelServerError(f"unknown op '{op}'")
+
+        name = header.get('model')
+        model = self.models.get(name)
+        if model is None:
+            raise ModelServerError(f"model '{name}' is not loaded")
+
+        # the growth model also gives the class probabilities (what-if sweeps rank by them)
+        method = header.get('method', 'predict')
+        if method not in (('predict',) if name == 'disease' else ('predict', 'predict_proba')):
+            raise ModelServerError(f"model '{name}' has no method '{method}'")
+
+        batch = decode_array(header, payload)
+        with self._locks[name]:
+            output = model.predict(batch, verbose=0) if name == 'disease' else getattr(model, method)(batch)
+
+        meta, data = encode_array(np.asarray(output))
+        return {'ok': True, **meta}, data
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the disease and growth models over a unix socket.')
+    parser.add_argument('--socket', default=os.environ.get('MODEL_SERVER_SOCKET', 'model-server.sock'))
+    parser.add_argument('--config', default=os.environ.get('APP_CONFIG', 'dev'))
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.model_loader import load_disease_model, load_growth_model
+
+    # the models are loaded here, in this process, not through the socket
+    os.environ['MODEL_LOADING'] = 'off'
+    os.environ.pop('MODEL_SERVER_SOCKET', None)
+    app = create_app(args.config)
+    config = dict(app.config)
+    load_growth_model(config)
+    load_disease_model(config)
+
+    server = ModelServer(args.socket, extensions.disease_model, extensions.growth_model,
+                         extensions.growth_model_version, extensions.model_columns, extensions.growth_vocabulary)
+    loaded = [name for name, model in server.info()['models'].items() if model]
+    print(f"Model server on {args.socket} (pid {os.getpid()}), models: {loaded or 'none'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -17,6 +17,9 @@ class Plant(db.Model):
     species = db.Column(db.String(120))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), nullable=False)
 
+    # /users/<id>/plants
+    __table_args__ = (db.Index('ix_plant_user_id', 'user_id'),)
+
     growth_logs = db.relationship('GrowthLog', backref='plant', lazy=True, cascade="all, delete-orphan")
     disease_checks = db.relationship('DiseaseCheck', backref='plant', lazy=True, cascade="all, delete-orphan")
     cares = db.relationship('PlantCare', backref='plant', lazy=True, cascade="all, delete-orphan")
@@ -35,6 +38,13 @@ class GrowthLog(db.Model):
     humidity = db.Column(db.Float, nullable=False)
     predicted_milestone = db.Column(db.Integer, nullable=False)
 
+    # /plants/<id>/growth-logs pages by id inside one plant (sqlite index entries end with the rowid),
+    # date serves the since/until filters and exports
+    __table_args__ = (
+        db.Index('ix_growth_log_plant_id', 'plant_id'),
+        db.Index('ix_growth_log_date', 'date'),
+    )
+
 # plant diease folder 
 class DiseaseType(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -52,6 +62,33 @@ class DiseaseCheck(db.Model):
     confidence = db.Column(db.Float)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # /plants/<id>/disease-checks, newest first
+    __table_args__ = (db.Index('ix_disease_check_plant_id_created_at', 'plant_id', 'created_at'),)
+
+# queued /check-disease uploads, processed by the job worker pool
+class DiseaseJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    plant_id = db.Column(db.Integer, db.ForeignKey('plant.id', ondelete="CASCADE"), nullable=False)
+    image_path = db.Column(db.String(255), nullable=False)
+    image_sha256 = db.Column(db.String(64))
+
+    # queued, running, done, failed
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # new random token per claim, only the worker holding it may store the result
+    claim_token = db.Column(db.String(32))
+    error = db.Column(db.Text)
+    disease_check_id = db.Column(db.Integer, db.ForeignKey('disease_check.id', ondelete="SET NULL"), nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    # workers claim the oldest queued job
+    __table_args__ = (db.Index('ix_disease_job_status_id', 'status', 'id'),)
+
+    check = db.relationship('DiseaseCheck')
+
 # plant care table
 class PlantCare(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -61,6 +98,9 @@ class PlantCare(db.Model):
     applied_at = db.Column(db.DateTime, default=datetime.utcnow)
     notes = db.Column(db.Text)
 
+    # /plants/<id>/cares, newest first
+    __table_args__ = (db.Index('ix_plant_care_plant_id_applied_at', 'plant_id', 'applied_at'),)
+
     growth_log_id = db.Column(db.Integer, db.ForeignKey('growth_log.id'), nullable=True)
     disease_check_id = db.Column(db.Integer, db.ForeignKey('disease_check.id'), nullable=True)
 
@@ -0,0 +1,84 @@
+import base64
+import json
+from datetime import datetime, timezone
+
+from flask_restx import abort, inputs, reqparse
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+# every collection endpoint copies this parser and adds its own filters
+page_parser = reqparse.RequestParser()
+page_parser.add_argument('limit', type=inputs.int_range(1, MAX_PAGE_SIZE), location='args', default=DEFAULT_PAGE_SIZE,
+                         help=f'page size, 1-{MAX_PAGE_SIZE}')
+page_parser.add_argument('cursor', type=str, location='args',
+                         help=f'{NEXT_CURSOR_HEADER} header of the previous page')
+
+# since/until filters on the date column of time series tables
+date_range_parser = page_parser.copy()
+date_range_parser.add_argument('since', type=inputs.datetime_from_iso8601, location='args')
+date_range_parser.add_argument('until', type=inputs.datetime_from_iso8601, location='args')
+
+# date columns hold naive utc (datetime.utcnow), an offset in the query is converted, not dropped
+def to_naive_utc(value):
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def filter_date_range(query, column, args):
+    if args.get('since'):
+        query = query.filter(column >= to_naive_utc(args['since']))
+    if args.get('until'):
+        query = query.filter(column < to_naive_utc(args['until']))
+    return query
+
+# the cursor is the sort key of the last row of a page, url safe base64 json
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, columns):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError(cursor)
+        return [datetime.fromisoformat(v) if column.type.python_type is datetime else column.type.python_type(v)
+                for column, v in zip(columns, values)]
+    except (ValueError, TypeError):
+        abort(400, 'Invalid cursor.')
+
+"""
+keyset pagination: the next page starts after the sort key of the previous
+page's last row, so every page is one index range scan no matter how deep it
+is (OFFSET would read and throw away all earlier rows). the last column must
+be unique (the primary key) so rows with equal dates are not skipped
+"""
+def keyset_page(query, columns, limit, cursor=None, descending=False):
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        if len(columns) == 1:
+            key, after = columns[0], values[0]
+        else:
+            key, after = tuple_(*columns), tuple_(*values, types=[c.type for c in columns])
+        query = query.filter(key < after if descending else key > after)
+
+    query = query.order_by(*[c.desc() if descending else c.asc() for c in columns])
+    # one extra row tells whether there is a next page
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], c.key) for c in columns])
+    return rows, next_cursor
+
+# body stays a plain list, the next page is announced in a header
+def paged_response(rows, next_cursor):
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+    return rows, 200, headers
+
+def paginate(query, columns, args, descending=False):
+    return paged_response(*keyset_page(query, columns, args['limit'], args.get('cursor'), descending))
@@ -1,17 +1,22 @@
 import os
 import re
 import numpy as np
-from PIL import Image
-from flask_restx import Namespace, Resource, fields
-from flask import current_app
-import pandas as pd
-from datetime import datetime
-import warnings
+from flask_restx import Namespace, Resource, fields, inputs, marshal
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+from flask import current_app, request
+from concurrent.futures import ThreadPoolExecutor
 from app import extensions
 from werkzeug.utils import secure_filename
 from werkzeug.datastructures import FileStorage
 from app.extensions import db, disease_model
-from app.models import DiseaseCheck, DiseaseType, Plant
+from app.inference import decode_image
+from app.storage import content_hash, store_upload
+from app.jobs import JobFailed
+from app.model_loader import get_model_status
+from app.models import DiseaseCheck, DiseaseJob, DiseaseType, Plant
+from app.catalog import UNKNOWN_DISEASE, get_disease_catalog, invalidate_disease_catalog
+from app.pagination import NEXT_CURSOR_HEADER, date_range_parser, filter_date_range, paginate
 
 disease_ns = Namespace('disease', description='Plant disease check operations')
 
@@ -36,6 +41,48 @@ upload_parser = disease_ns.parser()
 upload_parser.add_argument('file', location='files', type=FileStorage, required=True)
 # form for other data sent along with the file
 upload_parser.add_argument('plant_id', location='form', type=int, required=True)
+# async: answer 202 with a job id right away, the check is made by the job workers
+upload_parser.add_argument('async', location='form', type=inputs.boolean, default=False)
+
+# batch upload parser: one plant_id for all files or one plant_id per file
+batch_upload_parser = disease_ns.parser()
+batch_upload_parser.add_argument('files', location='files', type=FileStorage, action='append', required=True)
+batch_upload_parser.add_argument('plant_id', location='form', type=int, action='append', required=True)
+
+disease_batch_item_model = disease_ns.model('DiseaseBatchItem', {
+    'filename': fields.String,
+    'plant_id': fields.Integer,
+    'status': fields.Integer,
+    'message': fields.String,
+    'check': fields.Nested(disease_check_model, allow_null=True)
+})
+
+disease_batch_model = disease_ns.model('DiseaseBatchResult', {
+    'created': fields.Integer,
+    'failed': fields.Integer,
+    'results': fields.List(fields.Nested(disease_batch_item_model))
+})
+
+disease_job_model = disease_ns.model('DiseaseJob', {
+    'id': fields.Integer(readonly=True),
+    'plant_id': fields.Integer,
+    'status': fields.String(description='queued, running, done or failed'),
+    'attempts': fields.Integer,
+    'error': fields.String,
+    'created_at': fields.DateTime,
+    'started_at': fields.DateTime,
+    'finished_at': fields.DateTime,
+    'disease_check_id': fields.Integer,
+    'check': fields.Nested(disease_check_model, allow_null=True)
+})
+
+# disease check list filters: plant, disease type and created_at range
+check_filter_parser = date_range_parser.copy()
+check_filter_parser.add_argument('plant_id', type=int, location='args')
+check_filter_parser.add_argument('disease_type_id', type=int, location='args')
+
+# shared pool for decoding batch uploads in parallel
+_decode_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="disease-decode")
 
 def format_disease_name(raw_name):
     if "___" in raw_name:
@@ -71,6 +118,8 @@ def normalize_name(name):
     return clean_name.strip().title()
 
 def seed_disease_types():
+    import pandas as pd
+
     if DiseaseType.query.first() is None:
         csv_path = 'disease_types.csv'
         if os.path.exists(csv_path):
@@ -80,28 +129,105 @@ def seed_disease_types():
                 for _, row in df.iterrows():
                     db.session.add(DiseaseType(name=row['name']))
                 db.session.commit()
+                invalidate_disease_catalog()
                 print("Database seeding completed.")
             except Exception as e:
                 print(f"CSV Error: {e}")
         else:
             print(f"Warning: '{csv_path}' not found.")
 
-def parse_csv_date(date_str):
-    if not date_str:
+# batch predict function used by the micro batcher
+def run_disease_model(batch):
+    return np.asarray(extensions.disease_model.predict(batch, verbose=0))
+
+"""
+a prediction is cached under (image sha256, model version). mocked or
+unversioned models have no version, then the cache is skipped
+"""
+def prediction_cache_key(digest):
+    version = getattr(extensions.disease_model, 'model_version', None)
+    if not isinstance(version, str) or extensions.disease_prediction_cache is None:
+        return None
+    return (digest, version)
+
+def get_cached_prediction(key):
+    if key is None:
         return None
-        
-    formats = ["%Y-%m-%d", "%d/%m/%Y"] 
-    
-    for fmt in formats:
-        try:
-            dt = datetime.strptime(date_str, fmt)
-            if dt > datetime.now():
-                warnings.warn(f"Future date detected: {date_str}", UserWarning)
-            return dt
-        except ValueError:
-            continue
-            
-    return None 
+    return extensions.disease_prediction_cache.get(key)
+
+def cache_prediction(key, row):
+    if key is not None:
+        extensions.disease_prediction_cache.put(key, np.array(row, copy=True))
+
+# disease_name is marshalled from disease_info, load it in the same SELECT instead of one query per row
+def with_disease_type(query):
+    return query.options(joinedload(DiseaseCheck.disease_info))
+
+def get_or_create_unknown():
+    unknown = DiseaseType.query.filter_by(name=UNKNOWN_DISEASE).first()
+    if not unknown:
+        unknown = DiseaseType(name=UNKNOWN_DISEASE)
+        db.session.add(unknown)
+        db.session.flush()
+        # dropped once the row is committed, a reload before that would cache a catalog without it
+        event.listen(db.session(), 'after_commit', lambda session: invalidate_disease_catalog(), once=True)
+    return unknown
+
+# prediction row -> (disease type id, confidence), low confidence and unmapped classes are Unknown
+def resolve_disease_type(catalog, row):
+    confidence = float(np.max(row))
+    type_id = catalog.type_id_for_class(np.argmax(row)) if confidence >= 0.50 else None
+    if type_id is None:
+        type_id = catalog.unknown_id or get_or_create_unknown().id
+    return type_id, confidence
+
+"""
+job handler run by the disease job workers: the stored upload is predicted like
+a synchronous check (prediction cache, micro batcher) and the DiseaseCheck is
+added to the session, the queue commits it together with the job status
+"""
+def run_disease_job(job):
+    plant = db.session.get(Plant, job.plant_id)
+    if plant is None:
+        raise JobFailed("plant not found")
+
+    try:
+        with open(job.image_path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        raise JobFailed("Uploaded image is missing.")
+
+    cache_key = prediction_cache_key(job.image_sha256 or content_hash(data))
+    predictions = get_cached_prediction(cache_key)
+    if predictions is None:
+        img_array = decode_image(data)
+        if img_array is None:
+            raise JobFailed("Invalid image file.")
+        predictions = extensions.disease_batcher.predict(img_array)
+        cache_prediction(cache_key, predictions)
+
+    disease_type_id, confidence = resolve_disease_type(get_disease_catalog(), predictions)
+    check = DiseaseCheck(
+        plant_id=job.plant_id,
+        image_path=job.image_path,
+        disease_type_id=disease_type_id,
+        confidence=confidence
+        )
+    db.session.add(check)
+    db.session.flush()
+    return check
+
+# built after flush and before commit, so marshalling neither refreshes the row nor lazy loads the disease type
+def check_response(check, catalog):
+    return {
+        'id': check.id,
+        'plant_id': check.plant_id,
+        'image_path': check.image_path,
+        'confidence': check.confidence,
+        'created_at': check.created_at,
+        'disease_type_id': check.disease_type_id,
+        'disease_info': {'name': catalog.names.get(check.disease_type_id, UNKNOWN_DISEASE)}
+    }
 
 # 4. Resource: Plant Disease Check
 """
@@ -109,21 +235,20 @@ the plant's disease is detected
 """
 @disease_ns.route('/check-disease')
 class DiseaseCheckCreate(Resource):
-    def get_or_create_unknown(self):
-        unknown = DiseaseType.query.filter_by(name="Unknown Disease").first()
-        if not unknown:
-            unknown = DiseaseType(name="Unknown Disease")
-            db.session.add(unknown)
-            db.session.commit()
-        return unknown
-    
     @disease_ns.expect(upload_parser)
-    @disease_ns.marshal_with(disease_check_model)
+    @disease_ns.response(201, 'disease checked', disease_check_model)
+    @disease_ns.response(202, 'check queued (async=true)', disease_job_model)
     # post: performs an AI prediction, and saves the result to a database
     def post(self):
-        if not extensions.disease_model: disease_ns.abort(503, 'Model not loaded')
-        
+        # queued checks are accepted while the model is still loading, not when it is missing or failed
+        queued = request.form.get('async', '').lower() in ('true', '1', 'on')
+        if not extensions.disease_model and not (queued and get_model_status()['disease']['state'] in ('loading', 'ready')):
+            disease_ns.abort(503, 'Model not loaded')
+
         args = upload_parser.parse_args()
+        if args['async']:
+            return self.enqueue(args)
+
         file = args['file']
         plant_id = args['plant_id']
 
@@ -133,52 +258,194 @@ class DiseaseCheckCreate(Resource):
         plant = Plant.query.get(plant_id)
         if not plant: disease_ns.abort(404, "plant not found")
 
-        all_diseases = DiseaseType.query.all()
-        supported_species = set([d.name.split('___')[0] for d in all_diseases])
-        if plant.species and plant.species.capitalize() not in supported_species:
+        catalog = get_disease_catalog()
+        if not catalog.supports(plant.species):
             return {
-                'message': f"Disease detection for '{plant.species}' is not supported yet. Supported types: {list(supported_species)}"
+                'message': f"Disease detection for '{plant.species}' is not supported yet. Supported types: {list(catalog.species)}"
             }, 400
         
-        filename = secure_filename(file.filename)
-        path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(path)
-        
-        # Prediction
-        try:
-            img = Image.open(path).resize((224, 224))
-        except Exception:
-            return {'message': 'Invalid image file.'}, 400
-
-        img_array = np.array(img) / 255.0
-        img_array = np.expand_dims(img_array, axis=0)
-        
-        predictions = extensions.disease_model.predict(img_array)
-        predicted_idx = np.argmax(predictions) 
-        confidence = float(np.max(predictions))
-        
-        if confidence < 0.50:
-            disease_type = self.get_or_create_unknown()
-        else:
-            disease_type = DiseaseType.query.get(int(predicted_idx)+1)
+        data = file.read()
+        digest = content_hash(data)
+        cache_key = prediction_cache_key(digest)
+
+        # a photo that was already checked is neither decoded nor predicted again
+        predictions = get_cached_prediction(cache_key)
+        if predictions is None:
+            # Prediction: decoded from memory, the file is written in the background
+            img_array = decode_image(data)
+            if img_array is None:
+                return {'message': 'Invalid image file.'}, 400
+
+            # concurrent requests are merged into one forward pass
+            predictions = extensions.disease_batcher.predict(img_array)
+            cache_prediction(cache_key, predictions)
+
+        _, path = store_upload(current_app.config['UPLOAD_FOLDER'], data, secure_filename(file.filename), digest)
+
+        disease_type_id, confidence = resolve_disease_type(catalog, predictions)
 
         check = DiseaseCheck(
             plant_id=plant_id, 
             image_path=path, 
-            disease_type_id=disease_type.id, 
+            disease_type_id=disease_type_id, 
             confidence=confidence
             )
         
         db.session.add(check)
+        db.session.flush()
+        response = check_response(check, catalog)
         db.session.commit()
-        return check, 201
+        return marshal(response, disease_check_model), 201
+
+    # the upload is validated and written to disk before the job row is committed, nothing is predicted here
+    def enqueue(self, args):
+        file = args['file']
+        plant_id = args['plant_id']
+
+        if not validate_image_format(file.filename):
+            disease_ns.abort(400, "Invalid file format.")
+
+        plant = Plant.query.get(plant_id)
+        if not plant: disease_ns.abort(404, "plant not found")
+
+        catalog = get_disease_catalog()
+        if not catalog.supports(plant.species):
+            disease_ns.abort(400, f"Disease detection for '{plant.species}' is not supported yet. Supported types: {list(catalog.species)}")
+
+        queue = extensions.disease_jobs
+        max_queued = current_app.config['DISEASE_JOB_MAX_QUEUED']
+        # cheap early refusal before the upload is written, submit makes the binding check
+        if queue.queued_count() >= max_queued:
+            disease_ns.abort(503, "Too many queued disease checks, try again later.")
+
+        data = file.read()
+        digest, path = store_upload(current_app.config['UPLOAD_FOLDER'], data, secure_filename(file.filename),
+                                    background=False)
+        job = queue.submit(plant_id, path, digest, max_queued=max_queued)
+        if job is None:
+            db.session.rollback()
+            disease_ns.abort(503, "Too many queued disease checks, try again later.")
+        db.session.commit()
+        queue.notify()
+
+        return marshal(job, disease_job_model), 202, {'Location': f"{request.script_root}/disease-jobs/{job.id}"}
+
+"""
+many leaf photos are checked in one request: decoded in parallel, predicted
+as one tensor batch and saved in a single transaction
+"""
+@disease_ns.route('/check-disease/batch')
+class DiseaseCheckBatch(Resource):
+    @disease_ns.expect(batch_upload_parser)
+    @disease_ns.marshal_with(disease_batch_model)
+    # post: performs one AI prediction for all images, and saves the results to a database
+    def post(self):
+        if not extensions.disease_model: disease_ns.abort(503, 'Model not loaded')
+
+        args = batch_upload_parser.parse_args()
+        files = args['files']
+        plant_ids = args['plant_id']
+
+        # every image is decoded and kept in memory until the request is saved, so their number is capped
+        limit = current_app.config['DISEASE_BATCH_MAX_FILES']
+        if len(files) > limit: disease_ns.abort(413, f"at most {limit} files per batch, got {len(files)}")
+
+        if len(plant_ids) == 1:
+            plant_ids = plant_ids * len(files)
+        elif len(plant_ids) != len(files):
+            disease_ns.abort(400, "plant_id must be given once or once per file.")
+
+        plants = {p.id: p for p in Plant.query.filter(Plant.id.in_(set(plant_ids))).all()}
+        catalog = get_disease_catalog()
+
+        results = []
+        pending = []
+        for file, plant_id in zip(files, plant_ids):
+            item = {'filename': file.filename, 'plant_id': plant_id, 'status': 201, 'message': None, 'check': None}
+            results.append(item)
+            plant = plants.get(plant_id)
+
+            if not validate_image_format(file.filename):
+                item.update(status=400, message="Invalid file format.")
+            elif not plant:
+                item.update(status=404, message="plant not found")
+            elif not catalog.supports(plant.species):
+                item.update(status=400, message=f"Disease detection for '{plant.species}' is not supported yet.")
+            else:
+                data = file.read()
+                digest = content_hash(data)
+                key = prediction_cache_key(digest)
+                pending.append({'item': item, 'filename': secure_filename(file.filename), 'data': data,
+                                'digest': digest, 'key': key, 'row': get_cached_prediction(key)})
+
+        # cached photos skip decoding and prediction, the rest is decoded from memory
+        to_decode = [p for p in pending if p['row'] is None]
+        for p, img_array in zip(to_decode, _decode_pool.map(decode_image, [p['data'] for p in to_decode])):
+            p['array'] = img_array
+
+        decoded = []
+        for p in pending:
+            if p['row'] is None and p['array'] is None:
+                p['item'].update(status=400, message="Invalid image file.")
+                continue
+            _, p['path'] = store_upload(current_app.config['UPLOAD_FOLDER'], p['data'], p['filename'], p['digest'])
+            decoded.append(p)
+
+        # Prediction: forward passes of at most DISEASE_BATCH_MAX_SIZE images for the ones that were not cached
+        uncached = [p for p in decoded if p['row'] is None]
+        chunk_size = max(1, current_app.config['DISEASE_BATCH_MAX_SIZE'])
+        for start in range(0, len(uncached), chunk_size):
+            chunk = uncached[start:start + chunk_size]
+            predictions = run_disease_model(np.stack([p.pop('array') for p in chunk]))
+            for p, row in zip(chunk, predictions):
+                p['row'] = row
+                cache_prediction(p['key'], row)
+
+        checks = []
+        if decoded:
+            for p in decoded:
+                item = p['item']
+                disease_type_id, confidence = resolve_disease_type(catalog, p['row'])
+
+                check = DiseaseCheck(
+                    plant_id=item['plant_id'],
+                    image_path=p['path'],
+                    disease_type_id=disease_type_id,
+                    confidence=confidence
+                    )
+                db.session.add(check)
+                checks.append((item, check))
+
+            db.session.flush()
+            for item, check in checks:
+                item['check'] = check_response(check, catalog)
+            db.session.commit()
+
+        created = len(checks)
+        return {'created': created, 'failed': len(results) - created, 'results': results}, (201 if created else 400)
+
+@disease_ns.route('/disease-jobs/<int:id>')
+@disease_ns.response(404, 'job not found')
+class DiseaseJobResource(Resource):
+    # get: status of an async disease check, the check itself once it is done
+    @disease_ns.marshal_with(disease_job_model)
+    def get(self, id):
+        query = DiseaseJob.query.options(joinedload(DiseaseJob.check).joinedload(DiseaseCheck.disease_info))
+        return query.filter_by(id=id).first_or_404()
 
 @disease_ns.route('/disease-checks')
 class DiseaseCheckList(Resource):
-    # get: it lists all disease in the system
+    # get: it lists the disease checks in the system page by page
+    @disease_ns.expect(check_filter_parser)
+    @disease_ns.header(NEXT_CURSOR_HEADER, 'cursor of the next page, missing on the last page')
     @disease_ns.marshal_list_with(disease_check_model)
     def get(self):
-        return DiseaseCheck.query.all()
+        args = check_filter_parser.parse_args()
+        query = filter_date_range(with_disease_type(DiseaseCheck.query), DiseaseCheck.created_at, args)
+        for name in ('plant_id', 'disease_type_id'):
+            if args.get(name) is not None:
+                query = query.filter(getattr(DiseaseCheck, name) == args[name])
+        return paginate(query, (DiseaseCheck.id,), args)
 
 @disease_ns.route('/disease-checks/<int:id>')
 @disease_ns.response(404, 'check not found')
@@ -195,8 +462,7 @@ class DiseaseCheckResource(Resource):
         check = DiseaseCheck.query.get_or_404(id)
         data = disease_ns.payload
         if 'disease_type_id' in data:
-            dtype = DiseaseType.query.get(data['disease_type_id'])
-            if dtype:
+            if data['disease_type_id'] in get_disease_catalog().names:
                 check.disease_type_id = data['disease_type_id']
                 db.session.commit()
             else:
@@ -214,16 +480,20 @@ class DiseaseCheckResource(Resource):
 @disease_ns.route('/plants/<int:plant_id>/disease-checks')
 class PlantDiseaseHistory(Resource):
     # get: it lists the disease history of a specific plant
+    @disease_ns.expect(date_range_parser)
+    @disease_ns.header(NEXT_CURSOR_HEADER, 'cursor of the next page, missing on the last page')
     @disease_ns.marshal_list_with(disease_check_model)
     def get(self, plant_id):
         plant = Plant.query.get_or_404(plant_id)
-        checks = DiseaseCheck.query.filter_by(plant_id=plant_id).order_by(DiseaseCheck.created_at.desc()).all()
-        
-        return checks  
+        args = date_range_parser.parse_args()
+        query = filter_date_range(with_disease_type(DiseaseCheck.query.filter_by(plant_id=plant_id)), DiseaseCheck.created_at, args)
+
+        # newest checks first, keyset on (created_at, id)
+        return paginate(query, (DiseaseCheck.created_at, DiseaseCheck.id), args, descending=True)
 
 @disease_ns.route('/disease-type')
 class DiseaseTypeList(Resource):
     # get: it lists all the types of diseases recognized by the system
     @disease_ns.marshal_list_with(disease_type_model)
     def get(self):
-        return DiseaseType.query.all()
+        return get_disease_catalog().rows()
@@ -0,0 +1,196 @@
+import csv
+import io
+import json
+from datetime import datetime
+from flask import Response, stream_with_context
+from flask_restx import Namespace, Resource, inputs
+from sqlalchemy import DateTime, Float, Integer, select
+from app.extensions import db
+from app.models import DiseaseCheck, DiseaseType, GrowthLog, PlantCare
+from app.pagination import to_naive_utc
+
+export_ns = Namespace('export', description='Streaming bulk exports for analytics')
+
+EXPORT_FORMATS = ('ndjson', 'csv', 'arrow', 'parquet')
+
+# rows fetched from the database per round trip, also the size of one arrow batch / parquet row group
+EXPORT_CHUNK_SIZE = 5000
+
+MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+export_parser = export_ns.parser()
+export_parser.add_argument('format', type=str, choices=EXPORT_FORMATS, default='ndjson', location='args')
+export_parser.add_argument('since', type=inputs.datetime_from_iso8601, location='args',
+                           help='only rows at or after this time, for incremental pulls')
+export_parser.add_argument('plant_id', type=int, location='args')
+
+# table name -> (selected columns, model, date column used by since)
+EXPORTS = {
+    'growth-logs': (
+        [GrowthLog.id, GrowthLog.plant_id, GrowthLog.date, GrowthLog.soil_type, GrowthLog.sunlight_hours,
+         GrowthLog.water_frequency, GrowthLog.fertilizer_type, GrowthLog.temperature, GrowthLog.humidity,
+         GrowthLog.predicted_milestone],
+        GrowthLog, GrowthLog.date),
+    'disease-checks': (
+        [DiseaseCheck.id, DiseaseCheck.plant_id, DiseaseCheck.disease_type_id, DiseaseType.name.label('disease_name'),
+         DiseaseCheck.image_path, DiseaseCheck.confidence, DiseaseCheck.created_at],
+        DiseaseCheck, DiseaseCheck.created_at),
+    'plant-cares': (
+        [PlantCare.id, PlantCare.plant_id, PlantCare.medicine_name, PlantCare.applied_at, PlantCare.notes,
+         PlantCare.growth_log_id, PlantCare.disease_check_id],
+        PlantCare, PlantCare.applied_at),
+}
+
+def build_export_query(table, since=None, plant_id=None):
+    columns, model, date_column = EXPORTS[table]
+    stmt = select(*columns).select_from(model)
+    if model is DiseaseCheck:
+        stmt = stmt.outerjoin(DiseaseType, DiseaseCheck.disease_type_id == DiseaseType.id)
+    if since is not None:
+        stmt = stmt.where(date_column >= to_naive_utc(since))
+    if plant_id is not None:
+        stmt = stmt.where(model.plant_id == plant_id)
+    return stmt.order_by(model.id)
+
+"""
+plain column tuples (no ORM objects) are fetched EXPORT_CHUNK_SIZE rows at a
+time with yield_per, so memory stays flat no matter how big the table is
+"""
+def iter_chunks(stmt, chunk_size=None):
+    result = db.session.execute(stmt.execution_options(yield_per=chunk_size or EXPORT_CHUNK_SIZE))
+    for rows in result.partitions():
+        yield rows
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def stream_ndjson(names, chunks):
+    for rows in chunks:
+        yield ''.join(json.dumps(dict(zip(names, row)), default=_json_default) + '\n' for row in rows)
+
+def stream_csv(names, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # header only when there are no rows
+    yield buffer.getvalue()
+
+# file-like sink for pyarrow writers, whatever was written is handed out after every chunk
+class _ChunkSink(io.RawIOBase):
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+def arrow_schema(columns):
+    import pyarrow as pa
+
+    types = []
+    for column in columns:
+        if isinstance(column.type, Integer):
+            types.append(pa.int64())
+        elif isinstance(column.type, Float):
+            types.append(pa.float64())
+        elif isinstance(column.type, DateTime):
+            types.append(pa.timestamp('us'))
+        else:
+            types.append(pa.string())
+    return pa.schema([(column.key, t) for column, t in zip(columns, types)])
+
+def _record_batch(schema, rows):
+    import pyarrow as pa
+
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    return pa.RecordBatch.from_arrays([pa.array(c, type=f.type) for c, f in zip(columns, schema)], schema=schema)
+
+# arrow IPC stream, one record batch per chunk
+def stream_arrow(schema, chunks):
+    import pyarrow as pa
+
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for rows in chunks:
+            writer.write_batch(_record_batch(schema, rows))
+            yield sink.drain()
+    yield sink.drain()
+
+# parquet file, one row group per chunk, the footer is written at the end
+def stream_parquet(schema, chunks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for rows in chunks:
+            writer.write_table(pa.Table.from_batches([_record_batch(schema, rows)]))
+            yield sink.drain()
+    yield sink.drain()
+
+def pyarrow_available():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        return False
+    return True
+
+def export_response(table, args):
+    fmt = args['format']
+    if fmt in ('arrow', 'parquet') and not pyarrow_available():
+        export_ns.abort(400, f"'{fmt}' export needs the pyarrow package, use ndjson or csv.")
+
+    columns = EXPORTS[table][0]
+    names = [c.key for c in columns]
+    chunks = iter_chunks(build_export_query(table, args.get('since'), args.get('plant_id')))
+
+    if fmt == 'ndjson':
+        body = stream_ndjson(names, chunks)
+    elif fmt == 'csv':
+        body = stream_csv(names, chunks)
+    elif fmt == 'arrow':
+        body = stream_arrow(arrow_schema(columns), chunks)
+    else:
+        body = stream_parquet(arrow_schema(columns), chunks)
+
+    extension = 'arrows' if fmt == 'arrow' else fmt
+    return Response(stream_with_context(body), mimetype=MIMETYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={table}.{extension}'})
+
+# 7. Resource: Export
+"""
+full or incremental dumps of the log tables, streamed while they are read
+"""
+@export_ns.route('/export/<any("growth-logs", "disease-checks", "plant-cares"):table>')
+class Export(Resource):
+    # get: streams the table as ndjson, csv, arrow stream or parquet
+    @export_ns.expect(export_parser)
+    def get(self, table):
+        return export_response(table, export_parser.parse_args())
@@ -1,10 +1,15 @@
-import pandas as pd
-from datetime import datetime
-import warnings
-from flask_restx import Namespace, Resource, fields
+import io
+from flask import current_app
+from flask_restx import Namespace, Resource, fields, inputs
+from werkzeug.datastructures import FileStorage
+from sqlalchemy import insert
 from app import extensions
 from app.extensions import db, growth_model, model_columns
+from app.features import get_feature_encoder
+from app.ingest import IngestError, ingest_growth_csv, parse_csv_date
 from app.models import GrowthLog, Plant
+from app.sweep import SweepError, build_sweep_axes, rank_configurations, score_grid, sweep_target
+from app.pagination import NEXT_CURSOR_HEADER, date_range_parser, filter_date_range, paginate
 
 growth_ns = Namespace('growth', description='Plant growth log operations')
 
@@ -31,28 +36,115 @@ growth_input_model = growth_ns.model('GrowthInput',{
     'humidity': fields.Float(required=True)
 })
 
-def prepare_prediction_dataframe(input_data, model_columns):
-    input_df = pd.DataFrame([input_data])
-    input_df = pd.get_dummies(input_df, columns=['Soil_Type', 'Water_Frequency', 'Fertilizer_Type']) # Dummy eklendi
-    input_df = input_df.reindex(columns=model_columns, fill_value=0)
-    return input_df
+growth_batch_input_model = growth_ns.model('GrowthBatchInput', {
+    'records': fields.List(fields.Nested(growth_input_model), required=True, min_items=1,
+                           description='at most GROWTH_BATCH_MAX_RECORDS records')
+})
+
+# what-if sweep: every input field is fixed or swept. grid values are a list, a
+# {start, stop, step} range for the numeric fields or '*' for every known category
+growth_sweep_input_model = growth_ns.model('GrowthSweepInput', {
+    'fixed': fields.Raw(description='input fields held constant, e.g. {"soil_type": "Loam", "temperature": 25}'),
+    'grid': fields.Raw(required=True, description='swept input fields, e.g. {"sunlight_hours": {"start": 4, "stop": 10, "step": 0.5}, "fertilizer_type": "*"}'),
+    'top_k': fields.Integer(default=10, min=1, max=100),
+    'target_milestone': fields.Integer(description='milestone whose probability is maximized, the highest one by default')
+})
+
+growth_sweep_model = growth_ns.model('GrowthSweep', {
+    'evaluated': fields.Integer(description='configurations scored'),
+    'target_milestone': fields.Integer,
+    'results': fields.List(fields.Nested(growth_ns.model('GrowthSweepResult', {
+        'rank': fields.Integer,
+        'soil_type': fields.String,
+        'sunlight_hours': fields.Float,
+        'water_frequency': fields.String,
+        'fertilizer_type': fields.String,
+        'temperature': fields.Float,
+        'humidity': fields.Float,
+        'predicted_milestone': fields.Integer,
+        'probability': fields.Float
+    })))
+})
+
+# historical sensor csv upload, predict fills in rows without a milestone
+import_parser = growth_ns.parser()
+import_parser.add_argument('file', location='files', type=FileStorage, required=True)
+import_parser.add_argument('predict', location='form', type=inputs.boolean, default=False)
+
+import_report_model = growth_ns.model('GrowthImportReport', {
+    'rows': fields.Integer,
+    'inserted': fields.Integer,
+    'predicted': fields.Integer,
+    'rejected': fields.Integer,
+    'errors': fields.List(fields.Nested(growth_ns.model('GrowthImportError', {
+        'line': fields.Integer,
+        'message': fields.String
+    })))
+})
+
+# growth log list filters: plant, date range and categories
+growth_filter_parser = date_range_parser.copy()
+growth_filter_parser.add_argument('plant_id', type=int, location='args')
+growth_filter_parser.add_argument('soil_type', type=str, location='args')
+growth_filter_parser.add_argument('predicted_milestone', type=int, location='args')
+
+# api payload -> training column names
+def to_model_input(data):
+    return {
+        'Soil_Type': data['soil_type'],
+        'Sunlight_Hours': data['sunlight_hours'],
+        'Water_Frequency': data['water_frequency'],
+        'Fertilizer_Type': data['fertilizer_type'],
+        'Temperature': data['temperature'],
+        'Humidity': data['humidity']
+    }
+
+# encodes many records into one feature matrix
+def prepare_prediction_batch(records, model_columns):
+    return get_feature_encoder(model_columns).encode_many(to_model_input(r) for r in records)
 
-def parse_csv_date(date_str):
-    if not date_str:
+# a reading as a hashable tuple, gateways round the floats so repeats are exact
+def canonical_input(data):
+    return (
+        data['soil_type'],
+        float(data['sunlight_hours']),
+        data['water_frequency'],
+        data['fertilizer_type'],
+        float(data['temperature']),
+        float(data['humidity'])
+    )
+
+# no cache key while the model version is unknown (model not loaded from disk)
+def growth_cache_key(data):
+    version = extensions.growth_model_version
+    if not isinstance(version, str) or extensions.growth_prediction_cache is None:
         return None
-        
-    formats = ["%Y-%m-%d", "%d/%m/%Y"] 
-    
-    for fmt in formats:
-        try:
-            dt = datetime.strptime(date_str, fmt)
-            if dt > datetime.now():
-                warnings.warn(f"Future date detected: {date_str}", UserWarning)
-            return dt
-        except ValueError:
-            continue
-            
-    return None 
+    return (version, canonical_input(data))
+
+"""
+predicted milestones for many records, only the records that are not in the
+cache are encoded and passed to the model, in one predict call
+"""
+def predict_milestones(records):
+    cache = extensions.growth_prediction_cache
+    keys = [growth_cache_key(r) for r in records]
+    milestones = [None if key is None else cache.get(key) for key in keys]
+
+    misses = [i for i, milestone in enumerate(milestones) if milestone is None]
+    if misses:
+        features = prepare_prediction_batch([records[i] for i in misses], extensions.model_columns)
+        predictions = extensions.growth_model.predict(features)
+        for i, prediction in zip(misses, predictions):
+            milestones[i] = int(prediction)
+            if keys[i] is not None:
+                cache.put(keys[i], milestones[i])
+    return milestones
+
+def prepare_prediction_dataframe(input_data, model_columns):
+    import pandas as pd
+
+    row = get_feature_encoder(model_columns).encode(input_data)
+    return pd.DataFrame([row], columns=model_columns)
 
 # 3. Resource: Plant Growth Prediction
 """
@@ -71,23 +163,9 @@ class GrowthPredictionResource(Resource):
         plant = Plant.query.get(data['plant_id'])
         if not plant: growth_ns.abort(404, f"plant with id {data['plant_id']} not found")
 
-        input_data = {
-            'Soil_Type': data['soil_type'],
-            'Sunlight_Hours': data['sunlight_hours'],
-            'Water_Frequency': data['water_frequency'],
-            'Fertilizer_Type': data['fertilizer_type'],
-            'Temperature': data['temperature'],
-            'Humidity': data['humidity']
-        }
-
         try:
-            input_df = pd.DataFrame([input_data])
-            # One-Hot Encoding
-            input_df = pd.get_dummies(input_df, columns=['Soil_Type', 'Water_Frequency', 'Fertilizer_Type'])
-            input_df = input_df.reindex(columns=extensions.model_columns, fill_value=0)
-
-            prediction = extensions.growth_model.predict(input_df)[0]
-            prediction_val = int(prediction)
+            # One-Hot Encoding + prediction, repeated readings come from the cache
+            prediction_val = predict_milestones([data])[0]
 
             new_log = GrowthLog(
                 plant_id = data['plant_id'],
@@ -107,12 +185,126 @@ class GrowthPredictionResource(Resource):
             db.session.rollback()
             growth_ns.abort(500, str(e))
 
+"""
+many sensor readings are predicted with one model call and saved with one bulk insert
+"""
+@growth_ns.route('/predict-growth/batch')
+class GrowthBatchPredictionResource(Resource):
+    # post: the model is run once for all records and they are saved to the database
+    @growth_ns.expect(growth_batch_input_model, validate=True)
+    @growth_ns.marshal_list_with(growth_log_model, code=201)
+    def post(self):
+        if not extensions.growth_model: growth_ns.abort(503, 'Growth model not loaded')
+        if not extensions.model_columns: growth_ns.abort(500, "Reference columns not loaded")
+
+        records = growth_ns.payload['records']
+        # one request is one transaction, its size is capped
+        limit = current_app.config['GROWTH_BATCH_MAX_RECORDS']
+        if len(records) > limit: growth_ns.abort(413, f"at most {limit} records per batch, got {len(records)}")
+
+        plant_ids = set(r['plant_id'] for r in records)
+        found = set(pid for (pid,) in db.session.query(Plant.id).filter(Plant.id.in_(plant_ids)))
+        missing = sorted(plant_ids - found)
+        if missing: growth_ns.abort(404, f"plants with ids {missing} not found")
+
+        try:
+            predictions = predict_milestones(records)
+
+            rows = [{
+                'plant_id': r['plant_id'],
+                'soil_type': r['soil_type'],
+                'sunlight_hours': r['sunlight_hours'],
+                'water_frequency': r['water_frequency'],
+                'fertilizer_type': r['fertilizer_type'],
+                'temperature': r['temperature'],
+                'humidity': r['humidity'],
+                'predicted_milestone': int(p)
+            } for r, p in zip(records, predictions)]
+
+            stmt = insert(GrowthLog).returning(GrowthLog.id, GrowthLog.date, sort_by_parameter_order=True)
+            inserted = db.session.execute(stmt, rows).all()
+            db.session.commit()
+
+            logs = [dict(row, id=log_id, date=date) for row, (log_id, date) in zip(rows, inserted)]
+
+        except Exception as e:
+            db.session.rollback()
+            growth_ns.abort(500, str(e))
+
+        return logs, 201
+
+"""
+read-only what-if search: the grid of conditions is encoded straight into
+feature matrices and scored with predict_proba in fixed-size chunks (one call
+for grids up to GROWTH_SWEEP_CHUNK_ROWS), nothing is saved
+"""
+@growth_ns.route('/predict-growth/sweep')
+class GrowthSweepResource(Resource):
+    # post: returns the best top_k configurations of the grid
+    @growth_ns.expect(growth_sweep_input_model, validate=True)
+    @growth_ns.marshal_with(growth_sweep_model)
+    def post(self):
+        if not extensions.growth_model: growth_ns.abort(503, 'Growth model not loaded')
+        if not extensions.model_columns: growth_ns.abort(500, "Reference columns not loaded")
+
+        model = extensions.growth_model
+        classes = getattr(model, 'classes_', None)
+        if classes is None: growth_ns.abort(501, 'Growth model does not give milestone probabilities')
+
+        data = growth_ns.payload
+        try:
+            axes = build_sweep_axes(data.get('fixed'), data['grid'], extensions.growth_vocabulary,
+                                    current_app.config['GROWTH_SWEEP_MAX_CONFIGS'])
+            target = sweep_target(classes, data.get('target_milestone'))
+        except SweepError as e:
+            growth_ns.abort(400, str(e))
+
+        encoder = get_feature_encoder(extensions.model_columns)
+        proba = score_grid(encoder, axes, model, current_app.config['GROWTH_SWEEP_CHUNK_ROWS'])
+        results = rank_configurations(axes, proba, classes, target, data.get('top_k') or 10)
+
+        return {'evaluated': len(proba), 'target_milestone': target, 'results': results}
+
+"""
+backfills historical growth logs from a csv upload, streamed in chunks with
+one bulk insert and one commit per chunk
+"""
+@growth_ns.route('/growth-logs/import')
+class GrowthLogImport(Resource):
+    # post: imports the csv rows, invalid rows are skipped and reported with their line numbers
+    @growth_ns.expect(import_parser)
+    @growth_ns.marshal_with(import_report_model)
+    def post(self):
+        args = import_parser.parse_args()
+
+        predict_fn = None
+        if args['predict']:
+            if not extensions.growth_model: growth_ns.abort(503, 'Growth model not loaded')
+            if not extensions.model_columns: growth_ns.abort(500, "Reference columns not loaded")
+            predict_fn = predict_milestones
+
+        stream = io.TextIOWrapper(args['file'].stream, encoding='utf-8-sig', newline='')
+        try:
+            report = ingest_growth_csv(stream, predict_fn, extensions.growth_vocabulary)
+        except (IngestError, UnicodeDecodeError) as e:
+            db.session.rollback()
+            growth_ns.abort(400, str(e))
+
+        return report, (201 if report['inserted'] else 400)
+
 @growth_ns.route('/growth-logs')
 class GrowthLogList(Resource):
-    # get: retrieves the all prediction record
+    # get: retrieves the prediction records page by page
+    @growth_ns.expect(growth_filter_parser)
+    @growth_ns.header(NEXT_CURSOR_HEADER, 'cursor of the next page, missing on the last page')
     @growth_ns.marshal_list_with(growth_log_model)
     def get(self):
-        return GrowthLog.query.all()
+        args = growth_filter_parser.parse_args()
+        query = filter_date_range(GrowthLog.query, GrowthLog.date, args)
+        for name in ('plant_id', 'soil_type', 'predicted_milestone'):
+            if args.get(name) is not None:
+                query = query.filter(getattr(GrowthLog, name) == args[name])
+        return paginate(query, (GrowthLog.id,), args)
 
 @growth_ns.route('/growth-logs/<int:id>')
 @growth_ns.response(404,'growth log not found')
@@ -144,7 +336,11 @@ class GrowthLogResource(Resource):
 @growth_ns.route('/plants/<int:plant_id>/growth-logs')
 class PlantGrowthHistory(Resource):
     # get: lists all predictions for a specific plant
+    @growth_ns.expect(date_range_parser)
+    @growth_ns.header(NEXT_CURSOR_HEADER, 'cursor of the next page, missing on the last page')
     @growth_ns.marshal_list_with(growth_log_model)
     def get(self, plant_id):
         plant = Plant.query.get_or_404(plant_id)
-        return plant.growth_logs
\ No newline at end of file
+        args = date_range_parser.parse_args()
+        query = filter_date_range(GrowthLog.query.filter_by(plant_id=plant_id), GrowthLog.date, args)
+        return paginate(query, (GrowthLog.id,), args)
\ No newline at end of file
@@ -0,0 +1,60 @@
+from flask_restx import Namespace, Resource, fields
+from app import extensions
+from app.model_loader import get_model_status, models_ready
+
+health_ns = Namespace('health', description='Service health and model readiness')
+
+model_status_model = health_ns.model('ModelStatus', {
+    'state': fields.String(description='idle, loading, ready, missing or error'),
+    'path': fields.String,
+    'seconds': fields.Float(description='load time'),
+    'error': fields.String
+})
+
+readiness_model = health_ns.model('Readiness', {
+    'ready': fields.Boolean,
+    'models': fields.Nested(health_ns.model('Models', {
+        'growth': fields.Nested(model_status_model),
+        'disease': fields.Nested(model_status_model)
+    }))
+})
+
+cache_stats_model = health_ns.model('CacheStats', {
+    'size': fields.Integer,
+    'maxsize': fields.Integer,
+    'hits': fields.Integer,
+    'misses': fields.Integer
+})
+
+caches_model = health_ns.model('Caches', {
+    'growth_predictions': fields.Nested(cache_stats_model, allow_null=True),
+    'disease_predictions': fields.Nested(cache_stats_model, allow_null=True)
+})
+
+# 6. Resource: Health
+"""
+liveness answers as soon as the app is up, readiness waits for the models
+"""
+@health_ns.route('/health')
+class Health(Resource):
+    def get(self):
+        return {'status': 'ok'}
+
+@health_ns.route('/health/ready')
+class Readiness(Resource):
+    # get: 200 when every model file that exists is loaded, 503 while they are loading
+    @health_ns.marshal_with(readiness_model)
+    def get(self):
+        ready = models_ready()
+        return {'ready': ready, 'models': get_model_status()}, (200 if ready else 503)
+
+@health_ns.route('/health/caches')
+class CacheStats(Resource):
+    # get: size and hit/miss counters of the prediction caches
+    @health_ns.marshal_with(caches_model)
+    def get(self):
+        caches = {
+            'growth_predictions': extensions.growth_prediction_cache,
+            'disease_predictions': extensions.disease_prediction_cache
+        }
+        return {name: cache.stats() if cache is not None else None for name, cache in caches.items()}
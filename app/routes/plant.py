@@ -1,6 +1,7 @@
 from flask_restx import Namespace, Resource, fields
 from app.extensions import db
 from app.models import Plant, User
+from app.pagination import NEXT_CURSOR_HEADER, page_parser, paginate
 
 plant_ns = Namespace('plants', description='Plant operations')
 
@@ -12,9 +13,17 @@ plant_model = plant_ns.model('Plant', {
 })
 
 # plant filter parser
-plant_filter_parser = plant_ns.parser()
+plant_filter_parser = page_parser.copy()
 plant_filter_parser.add_argument('species', type=str, required=False)
 
+plant_list_parser = plant_filter_parser.copy()
+plant_list_parser.add_argument('user_id', type=int, required=False)
+
+def filter_species(query, species):
+    if species:
+        query = query.filter(Plant.species.ilike(f"%{species}%"))
+    return query
+
 def validate_plant(plant_id):
     return Plant.query.get(plant_id) is not None
 
@@ -24,10 +33,16 @@ the user's plant list (name and species) is recorded in the plants resource
 """
 @plant_ns.route('/plants')
 class PlantList(Resource):
-    # get: list all plants
+    # get: list plants page by page, optionally filtered by user and species
+    @plant_ns.expect(plant_list_parser)
+    @plant_ns.header(NEXT_CURSOR_HEADER, 'cursor of the next page, missing on the last page')
     @plant_ns.marshal_list_with(plant_model)
     def get(self): 
-        return Plant.query.all() # select*from plant
+        args = plant_list_parser.parse_args()
+        query = filter_species(Plant.query, args.get('species'))
+        if args.get('user_id') is not None:
+            query = query.filter(Plant.user_id == args['user_id'])
+        return paginate(query, (Plant.id,), args) # select*from plant
     
     # post: add new plant
     @plant_ns.expect(plant_model)
@@ -81,13 +96,11 @@ Lists the plants of a specific user. Filters by type.
 @plant_ns.response(404,'user not found')
 class UserPlantList(Resource):
     @plant_ns.expect(plant_filter_parser)
+    @plant_ns.header(NEXT_CURSOR_HEADER, 'cursor of the next page, missing on the last page')
     @plant_ns.marshal_list_with(plant_model)
     def get(self, user_id):
         user = User.query.get_or_404(user_id)
         args = plant_filter_parser.parse_args()
-        species_filter = args.get('species')
-        query = Plant.query.filter_by(user_id=user_id)
-        if species_filter:
-            query = query.filter(Plant.species.ilike(f"%{species_filter}%"))
+        query = filter_species(Plant.query.filter_by(user_id=user_id), args.get('species'))
 
-        return query.all()
+        return paginate(query, (Plant.id,), args)
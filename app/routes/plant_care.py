@@ -1,8 +1,7 @@
 from flask_restx import Namespace, Resource, fields
 from app.extensions import db
 from app.models import Plant, PlantCare
-from datetime import datetime
-import warnings
+from app.pagination import NEXT_CURSOR_HEADER, date_range_parser, filter_date_range, paginate
 
 care_ns = Namespace('care', description='Plant care operations')
 
@@ -24,22 +23,9 @@ care_output_model = care_ns.model('PlantCare', {
     'related_disease_check': fields.Integer(attribute='disease_check_id')
 })
 
-def parse_csv_date(date_str):
-    if not date_str:
-        return None
-        
-    formats = ["%Y-%m-%d", "%d/%m/%Y"] 
-    
-    for fmt in formats:
-        try:
-            dt = datetime.strptime(date_str, fmt)
-            if dt > datetime.now():
-                warnings.warn(f"Future date detected: {date_str}", UserWarning)
-            return dt
-        except ValueError:
-            continue
-            
-    return None 
+# care list filters: plant and applied_at range
+care_filter_parser = date_range_parser.copy()
+care_filter_parser.add_argument('plant_id', type=int, location='args')
 
 # 5. Resource: Plant Care
 """
@@ -47,10 +33,16 @@ it is a source that tracks plant growth or treatment methods used against diseas
 """
 @care_ns.route('/plant-cares')
 class PlantCareList(Resource):
-    # get: list all care history
+    # get: list care history page by page
+    @care_ns.expect(care_filter_parser)
+    @care_ns.header(NEXT_CURSOR_HEADER, 'cursor of the next page, missing on the last page')
     @care_ns.marshal_list_with(care_output_model)
     def get(self):
-        return PlantCare.query.all()
+        args = care_filter_parser.parse_args()
+        query = filter_date_range(PlantCare.query, PlantCare.applied_at, args)
+        if args.get('plant_id') is not None:
+            query = query.filter(PlantCare.plant_id == args['plant_id'])
+        return paginate(query, (PlantCare.id,), args)
     
     # post: add plant care
     @care_ns.expect(care_input_model)
@@ -102,9 +94,13 @@ class PlantCareResource(Resource):
 
 @care_ns.route('/plants/<int:plant_id>/cares')
 class PlantCareHistory(Resource):
+    # get: newest cares first, keyset on (applied_at, id)
+    @care_ns.expect(date_range_parser)
+    @care_ns.header(NEXT_CURSOR_HEADER, 'cursor of the next page, missing on the last page')
     @care_ns.marshal_list_with(care_output_model)
     def get(self, plant_id):
         plant = Plant.query.get_or_404(plant_id)
-        cares= PlantCare.query.filter_by(plant_id=plant_id).order_by(PlantCare.applied_at.desc()).all()
+        args = date_range_parser.parse_args()
+        query = filter_date_range(PlantCare.query.filter_by(plant_id=plant_id), PlantCare.applied_at, args)
 
-        return cares
\ No newline at end of file
+        return paginate(query, (PlantCare.applied_at, PlantCare.id), args, descending=True)
\ No newline at end of file
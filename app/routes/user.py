@@ -2,6 +2,7 @@ import re
 from flask_restx import Namespace, Resource, fields
 from app.extensions import db
 from app.models import User
+from app.pagination import NEXT_CURSOR_HEADER, page_parser, paginate
 from sqlalchemy.exc import IntegrityError
 
 user_ns = Namespace('users', description='User operations')
@@ -41,10 +42,13 @@ def validate_password_strength(password):
 # 1. Resource: Users
 @user_ns.route('/users')
 class UserList(Resource):
-    # get: retrieves the entire user list
+    # get: retrieves the user list page by page
+    @user_ns.expect(page_parser)
+    @user_ns.header(NEXT_CURSOR_HEADER, 'cursor of the next page, missing on the last page')
     @user_ns.marshal_list_with(user_output_model) # all user json list
     def get(self): 
-        return User.query.all() # select*from users
+        args = page_parser.parse_args()
+        return paginate(User.query, (User.id,), args) # select*from users where id > cursor
     
     # post: creates new resource
     @user_ns.expect(user_input_model)
@@ -0,0 +1,70 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+"""
+uploads are written to disk on a small background pool so the request thread
+only decodes and predicts from memory
+"""
+_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="upload-writer")
+_pending = set()
+_pending_lock = threading.Lock()
+
+def write_file(path, data):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # write to a temp file first so readers never see a half written upload
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _write_logged(path, data):
+    try:
+        write_file(path, data)
+    except OSError as e:
+        print(f"Upload write error for {path}: {e}")
+        raise
+
+def _forget(future):
+    with _pending_lock:
+        _pending.discard(future)
+
+def persist_upload(path, data):
+    future = _writer.submit(_write_logged, path, data)
+    with _pending_lock:
+        _pending.add(future)
+    future.add_done_callback(_forget)
+    return future
+
+# blocks until every queued upload is on disk (tests, shutdown)
+def wait_for_pending_writes(timeout=None):
+    with _pending_lock:
+        futures = list(_pending)
+    wait(futures, timeout=timeout)
+
+"""
+uploads are stored by the sha256 of their content in two levels of shard
+folders (ab/cd/abcd....jpg), so equal photos share one file and different
+photos with the same filename never overwrite each other
+"""
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+def content_path(upload_folder, digest, filename=''):
+    ext = os.path.splitext(filename)[1].lower()
+    return os.path.join(upload_folder, digest[:2], digest[2:4], digest + ext)
+
+# returns (digest, path), the file is only written if it is not stored yet.
+# background=False writes before returning (the path is handed to another process or a queued job)
+def store_upload(upload_folder, data, filename='', digest=None, background=True):
+    digest = digest or content_hash(data)
+    path = content_path(upload_folder, digest, filename)
+    if not os.path.exists(path):
+        if background:
+            persist_upload(path, data)
+        else:
+            write_file(path, data)
+    return digest, path
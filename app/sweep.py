@@ -0,0 +1,162 @@
+import math
+
+import numpy as np
+
+# api field -> training column, the grid is expanded in this order
+SWEEP_FIELDS = {
+    'soil_type': 'Soil_Type',
+    'sunlight_hours': 'Sunlight_Hours',
+    'water_frequency': 'Water_Frequency',
+    'fertilizer_type': 'Fertilizer_Type',
+    'temperature': 'Temperature',
+    'humidity': 'Humidity'
+}
+
+CATEGORICAL_FIELDS = ('soil_type', 'water_frequency', 'fertilizer_type')
+
+# grid value of a categorical field meaning every category the model knows
+ALL_CATEGORIES = '*'
+
+class SweepError(Exception):
+    pass
+
+def _number(name, value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise SweepError(f"{name} value '{value}' is not a number")
+    return float(value)
+
+# {start, stop, step} -> the values from start to stop, stop included when the steps land on it
+def expand_range(name, spec, max_values):
+    unknown = set(spec) - {'start', 'stop', 'step'}
+    if unknown or not {'start', 'stop'} <= set(spec):
+        raise SweepError(f"{name} range needs start, stop and an optional step")
+    start, stop = _number(name, spec['start']), _number(name, spec['stop'])
+    step = _number(name, spec.get('step', 1))
+    if step <= 0 or stop < start:
+        raise SweepError(f"{name} range needs start <= stop and step > 0")
+
+    count = int(math.floor((stop - start) / step + 1e-9)) + 1
+    if count > max_values:
+        raise SweepError(f"{name} range has {count} values, at most {max_values} configurations are allowed")
+    # rounded so 0.1 steps come back as 0.3 and not 0.30000000000000004
+    return np.round(start + step * np.arange(count), 10).tolist()
+
+def _categories(name, values, vocabulary):
+    known = vocabulary.get(SWEEP_FIELDS[name]) if vocabulary is not None else None
+    if values == ALL_CATEGORIES:
+        if not known:
+            raise SweepError(f"the categories of {name} are not known, list them")
+        return list(known)
+
+    for value in values:
+        if not isinstance(value, str) or not value:
+            raise SweepError(f"{name} value '{value}' is not a category")
+        if known is not None and value not in known:
+            raise SweepError(f"unknown {name} '{value}'")
+    return list(values)
+
+def sweep_values(name, spec, vocabulary, max_values):
+    if name in CATEGORICAL_FIELDS:
+        if isinstance(spec, str) and spec != ALL_CATEGORIES:
+            spec = [spec]
+        values = _categories(name, spec, vocabulary) if isinstance(spec, (str, list)) else None
+    elif isinstance(spec, dict):
+        values = expand_range(name, spec, max_values)
+    elif isinstance(spec, list):
+        values = [_number(name, value) for value in spec]
+    else:
+        values = [_number(name, spec)]
+
+    if values is None:
+        raise SweepError(f"{name} must be a category, a list of categories or '{ALL_CATEGORIES}'")
+    if not values:
+        raise SweepError(f"{name} has no values")
+    # repeated values would only repeat configurations
+    return list(dict.fromkeys(values))
+
+"""
+fixed conditions and grid variables -> (field, values) per input field, in
+SWEEP_FIELDS order. every field is either fixed or swept, categories must be
+part of the growth model vocabulary when it is known
+"""
+def build_sweep_axes(fixed, grid, vocabulary=None, max_configs=None):
+    fixed, grid = fixed or {}, grid or {}
+    for part, values in (('fixed', fixed), ('grid', grid)):
+        if not isinstance(values, dict):
+            raise SweepError(f"{part} must be an object of input fields")
+        unknown = sorted(set(values) - set(SWEEP_FIELDS))
+        if unknown:
+            raise SweepError(f"unknown {part} fields {unknown}")
+
+    both = sorted(set(fixed) & set(grid))
+    if both:
+        raise SweepError(f"fields {both} are both fixed and swept")
+    missing = [name for name in SWEEP_FIELDS if name not in fixed and name not in grid]
+    if missing:
+        raise SweepError(f"fields {missing} need a fixed value or a grid")
+
+    max_values = max_configs or math.inf
+    axes = []
+    total = 1
+    for name in SWEEP_FIELDS:
+        if name in fixed:
+            if isinstance(fixed[name], (list, dict)) or fixed[name] == ALL_CATEGORIES:
+                raise SweepError(f"fixed {name} must be a single value, sweep it in grid instead")
+            values = sweep_values(name, fixed[name], vocabulary, max_values)
+        else:
+            values = sweep_values(name, grid[name], vocabulary, max_values)
+        total *= len(values)
+        if total > max_values:
+            raise SweepError(f"the grid has more than {max_configs} configurations, narrow the ranges")
+        axes.append((name, values))
+    return axes
+
+def grid_size(axes):
+    return math.prod(len(values) for _, values in axes)
+
+"""
+class probabilities of every configuration of the grid, encoded and passed to
+the model chunk_rows rows at a time so neither the feature matrix nor the
+model's per-call working memory grows with the grid
+"""
+def score_grid(encoder, axes, model, chunk_rows):
+    feature_axes = [(SWEEP_FIELDS[name], values) for name, values in axes]
+    total = grid_size(axes)
+    proba = None
+    for start in range(0, total, chunk_rows):
+        chunk = np.asarray(model.predict_proba(encoder.encode_grid(feature_axes, start, start + chunk_rows)))
+        if proba is None:
+            proba = np.empty((total, chunk.shape[1]), dtype=np.float64)
+        proba[start:start + len(chunk)] = chunk
+    return proba
+
+# the milestone a sweep maximizes, the highest one the model predicts by default
+def sweep_target(classes, target=None):
+    classes = [int(c) for c in classes]
+    if target is None:
+        return max(classes)
+    if target not in classes:
+        raise SweepError(f"milestone {target} is not predicted by the model, expected one of {classes}")
+    return target
+
+"""
+the top_k configurations by the probability of reaching the target milestone,
+ties keep the grid order
+"""
+def rank_configurations(axes, proba, classes, target, top_k):
+    classes = [int(c) for c in classes]
+    proba = np.asarray(proba)
+    score = proba[:, classes.index(target)]
+    top = np.argsort(-score, kind='stable')[:top_k]
+
+    shape = tuple(len(values) for _, values in axes)
+    results = []
+    for rank, (row, position) in enumerate(zip(top, zip(*np.unravel_index(top, shape))), start=1):
+        config = {name: values[i] for (name, values), i in zip(axes, position)}
+        config.update({
+            'rank': rank,
+            'predicted_milestone': classes[int(np.argmax(proba[row]))],
+            'probability': float(score[row])
+        })
+        results.append(config)
+    return results
@@ -0,0 +1,65 @@
+"""
+per-call latency of the disease model backends
+
+    python benchmarks/bench_disease_inference.py --model plant_disease.h5 --batch-sizes 1 8 16 --tflite none dynamic --threads 4
+
+without --model an untrained MobileNetV2 with 38 classes is used, which has
+the same architecture and cost as the served model
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.inference import CompiledDiseaseModel, KerasDiseaseModel, TFLiteDiseaseModel, convert_to_tflite
+
+def load_model(path):
+    import tensorflow as tf
+
+    if path:
+        return tf.keras.models.load_model(path)
+    return tf.keras.applications.MobileNetV2(input_shape=(224, 224, 3), weights=None, classes=38)
+
+def time_calls(predict, batch, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(batch)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return statistics.median(times), times[min(len(times) - 1, int(len(times) * 0.99))]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default=None)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 16])
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--tflite', nargs='*', default=['dynamic'], help='TFLite quantizations to include (none, dynamic)')
+    parser.add_argument('--threads', type=int, default=None, help='TFLite interpreter threads')
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    backends = {
+        'keras predict': KerasDiseaseModel(model).predict,
+        'compiled': CompiledDiseaseModel(model).warmup(args.batch_sizes).predict,
+    }
+    for quantization in args.tflite:
+        tflite = TFLiteDiseaseModel(convert_to_tflite(model, quantization), num_threads=args.threads)
+        backends[f'tflite {quantization}'] = tflite.predict
+
+    print(f"{'backend':<16}{'batch':>6}{'p50 ms':>10}{'p99 ms':>10}{'img/s':>10}")
+    for size in args.batch_sizes:
+        # backends take uint8 pixels, the same arrays decode_image produces
+        batch = np.random.randint(0, 256, (size, 224, 224, 3), dtype=np.uint8)
+        for name, predict in backends.items():
+            predict(batch)
+            p50, p99 = time_calls(predict, batch, args.repeats)
+            print(f"{name:<16}{size:>6}{p50:>10.1f}{p99:>10.1f}{size / p50 * 1000:>10.0f}")
+
+if __name__ == '__main__':
+    main()
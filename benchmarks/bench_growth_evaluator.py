@@ -0,0 +1,69 @@
+"""
+growth model predict latency, sklearn versus the compact vectorized evaluator
+
+    python benchmarks/bench_growth_evaluator.py --batch-sizes 1 10 100 1000 10000
+    python benchmarks/bench_growth_evaluator.py --synthetic 100
+
+without --synthetic the configured tabular_data/plant_growth.pkl is used, rows
+are random feature vectors. "vectorized" always walks the flat arrays,
+"compact" is what GROWTH_EVALUATOR=compact runs (sklearn from
+CompactForest.FALLBACK_MIN_ROWS rows on). predictions are checked to be identical
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.forest import CompactForest, flatten_forest
+
+def synthetic_model(trees):
+    from sklearn.ensemble import RandomForestClassifier
+
+    rng = np.random.default_rng(0)
+    X = rng.random((2000, 30))
+    y = (X[:, 0] * 4).astype(int) + rng.integers(0, 2, len(X))
+    return RandomForestClassifier(n_estimators=trees, random_state=0).fit(X, y)
+
+def timed(fn, X, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 1000, 10000])
+    parser.add_argument('--synthetic', type=int, default=None, metavar='TREES', help='benchmark a random forest with this many trees')
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        model = synthetic_model(args.synthetic)
+    else:
+        import joblib
+        model = joblib.load(os.path.join('tabular_data', 'plant_growth.pkl'))
+    compact = CompactForest.from_model(model)
+    vectorized = CompactForest(*flatten_forest(model))
+    print(f"{compact.n_estimators} trees, {len(compact.leaf)} nodes, {compact.n_features_in_} features")
+
+    rng = np.random.default_rng(1)
+    print(f"{'batch':>7}{'sklearn ms':>13}{'vectorized ms':>15}{'compact ms':>13}{'speedup':>10}")
+    for size in args.batch_sizes:
+        X = rng.random((size, compact.n_features_in_))
+        assert np.array_equal(model.predict_proba(X), vectorized.predict_proba(X))
+        assert np.array_equal(model.predict(X), vectorized.predict(X))
+        repeats = max(3, args.repeats if size <= 1000 else args.repeats // 4)
+        reference = timed(model.predict, X, repeats)
+        walked = timed(vectorized.predict, X, repeats)
+        candidate = timed(compact.predict, X, repeats)
+        print(f"{size:>7}{reference:>13.3f}{walked:>15.3f}{candidate:>13.3f}{reference / candidate:>9.1f}x")
+
+if __name__ == '__main__':
+    main()
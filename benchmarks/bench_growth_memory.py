@@ -0,0 +1,95 @@
+"""
+per-worker memory of the growth model: joblib.load of the pickle versus the
+memory-mapped compact forest layout, with N workers alive at the same time
+
+    python benchmarks/bench_growth_memory.py --workers 4
+    python benchmarks/bench_growth_memory.py --workers 4 --synthetic 300
+
+without --synthetic the configured tabular_data/plant_growth.pkl is used (the
+forest layout is written next to it in a temp folder). rss counts shared pages
+in every process, uss is private memory, pss splits shared pages between the
+processes that map them (sum of pss ~ physical memory used)
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import psutil
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+WORKER = """
+import sys
+import numpy as np
+mode, model_path, forest_path = sys.argv[1:4]
+if mode == 'pickle':
+    import joblib
+    model = joblib.load(model_path)
+else:
+    from app.forest import CompactForest
+    model = CompactForest.load(forest_path, mmap_mode='r')
+# every tree is walked so the node pages are really touched
+model.predict(np.random.default_rng(0).random((2000, model.n_features_in_)))
+print('ready', flush=True)
+sys.stdin.read()
+"""
+
+def synthetic_model(path, trees):
+    import joblib
+    import numpy as np
+    from sklearn.ensemble import RandomForestClassifier
+
+    rng = np.random.default_rng(0)
+    X = rng.random((20000, 30))
+    y = rng.integers(0, 4, len(X))
+    joblib.dump(RandomForestClassifier(n_estimators=trees, random_state=0).fit(X, y), path)
+
+def measure(mode, workers, model_path, forest_path):
+    procs = [subprocess.Popen([sys.executable, '-c', WORKER, mode, model_path, forest_path], cwd=ROOT,
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True) for _ in range(workers)]
+    try:
+        for p in procs:
+            assert p.stdout.readline().strip() == 'ready'
+        infos = [psutil.Process(p.pid).memory_full_info() for p in procs]
+    finally:
+        for p in procs:
+            p.stdin.close()
+            p.wait()
+    mb = 2 ** 20
+    return {
+        'rss': sum(i.rss for i in infos) / workers / mb,
+        'uss': sum(i.uss for i in infos) / workers / mb,
+        'pss_total': sum(i.pss for i in infos) / mb,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--synthetic', type=int, default=None, metavar='TREES', help='benchmark a random forest with this many trees')
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    import joblib
+    from app.forest import save_compact_forest
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(ROOT, 'tabular_data', 'plant_growth.pkl')
+        if args.synthetic:
+            model_path = os.path.join(tmp, 'synthetic.pkl')
+            synthetic_model(model_path, args.synthetic)
+        forest_path = os.path.join(tmp, 'model.forest')
+        start = time.perf_counter()
+        meta = save_compact_forest(joblib.load(model_path), forest_path, model_path)
+        print(f"{meta['n_estimators']} trees, {meta['n_nodes']} nodes, layout written in {time.perf_counter() - start:.1f} s, "
+              f"pickle {os.path.getsize(model_path) / 2**20:.1f} MB")
+
+        print(f"{'load':<10}{'rss/worker MB':>15}{'uss/worker MB':>15}{'pss total MB':>14}")
+        for mode in ('pickle', 'mmap'):
+            result = measure(mode, args.workers, model_path, forest_path)
+            print(f"{mode:<10}{result['rss']:>15.1f}{result['uss']:>15.1f}{result['pss_total']:>14.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+per-plant / per-user history query latency as the tables grow, with and without
+the model indexes
+
+    python benchmarks/bench_history_queries.py --rows 10000 100000 1000000 --plants 2000
+
+every size is filled into a fresh sqlite file, the queries are the first page
+of each history endpoint for a random plant
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, text
+
+from app.extensions import db
+from app.migrations import ensure_indexes
+from app.pagination import DEFAULT_PAGE_SIZE
+
+QUERIES = {
+    'growth history': "SELECT * FROM growth_log WHERE plant_id = :plant_id ORDER BY id LIMIT :limit",
+    'disease history': "SELECT * FROM disease_check WHERE plant_id = :plant_id ORDER BY created_at DESC, id DESC LIMIT :limit",
+    'care history': "SELECT * FROM plant_care WHERE plant_id = :plant_id ORDER BY applied_at DESC, id DESC LIMIT :limit",
+    'user plants': "SELECT * FROM plant WHERE user_id = :user_id ORDER BY id LIMIT :limit",
+}
+
+def fill(engine, rows, plants, users=100, chunk=50000):
+    start = datetime(2020, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO user (id, username, email, password) VALUES (:id, :u, :e, 'x')"),
+                     [{'id': i, 'u': f'user{i}', 'e': f'user{i}@example.com'} for i in range(1, users + 1)])
+        conn.execute(text("INSERT INTO plant (id, name, species, user_id) VALUES (:id, :name, 'Apple', :user_id)"),
+                     [{'id': i, 'name': f'plant{i}', 'user_id': i % users + 1} for i in range(1, plants + 1)])
+        conn.execute(text("INSERT INTO disease_type (id, name) VALUES (1, 'Apple___healthy')"))
+
+        rng = random.Random(0)
+        for offset in range(0, rows, chunk):
+            batch = []
+            for i in range(offset, min(rows, offset + chunk)):
+                batch.append({'plant_id': rng.randint(1, plants), 'at': start + timedelta(minutes=i)})
+            conn.execute(text(
+                "INSERT INTO growth_log (plant_id, date, soil_type, sunlight_hours, water_frequency, fertilizer_type, "
+                "temperature, humidity, predicted_milestone) VALUES (:plant_id, :at, 'Loam', 6, 'Daily', 'None', 25, 60, 1)"), batch)
+            conn.execute(text(
+                "INSERT INTO disease_check (plant_id, disease_type_id, confidence, created_at) VALUES (:plant_id, 1, 0.9, :at)"), batch)
+            conn.execute(text(
+                "INSERT INTO plant_care (plant_id, medicine_name, applied_at) VALUES (:plant_id, 'spray', :at)"), batch)
+
+def time_queries(engine, plants, users=100, repeats=50):
+    rng = random.Random(1)
+    results = {}
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            times = []
+            for _ in range(repeats):
+                params = {'plant_id': rng.randint(1, plants), 'user_id': rng.randint(1, users), 'limit': DEFAULT_PAGE_SIZE}
+                start = time.perf_counter()
+                conn.execute(text(sql), params).all()
+                times.append((time.perf_counter() - start) * 1000)
+            results[name] = statistics.median(times)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000], help='rows per log table')
+    parser.add_argument('--plants', type=int, default=2000)
+    parser.add_argument('--repeats', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9}  {'query':<16}{'no index ms':>13}{'indexed ms':>12}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            # the schema as it was before the indexes were declared
+            db.metadata.create_all(engine)
+            with engine.begin() as conn:
+                for table in db.metadata.sorted_tables:
+                    for index in table.indexes:
+                        conn.execute(text(f"DROP INDEX {index.name}"))
+
+            fill(engine, rows, args.plants)
+            before = time_queries(engine, args.plants, repeats=args.repeats)
+            ensure_indexes(engine)
+            after = time_queries(engine, args.plants, repeats=args.repeats)
+            engine.dispose()
+
+        for name in QUERIES:
+            print(f"{rows:>9}  {name:<16}{before[name]:>13.2f}{after[name]:>12.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+web worker memory and disease prediction latency with the models loaded in
+the worker versus served by the model server process
+
+    python benchmarks/bench_model_server.py --workers 4 --requests 200
+
+needs the model files (plant_disease.h5, tabular_data/plant_growth.pkl), every
+worker is a fresh interpreter that loads the app the way run.py does
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import psutil
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+WORKER = """
+import json, time
+import numpy as np
+import psutil
+from app import create_app, extensions
+from app.routes.disease_check import run_disease_model
+
+create_app()
+image = np.random.default_rng(0).integers(0, 256, (1, 224, 224, 3), dtype=np.uint8)
+run_disease_model(image)
+times = []
+for _ in range(%d):
+    start = time.perf_counter()
+    run_disease_model(image)
+    times.append((time.perf_counter() - start) * 1000)
+times.sort()
+print(json.dumps({'rss_mb': psutil.Process().memory_info().rss / 2**20, 'p50_ms': times[len(times) // 2],
+                  'p95_ms': times[int(len(times) * 0.95)]}))
+"""
+
+def run_workers(count, requests, env):
+    procs = [subprocess.Popen([sys.executable, '-c', WORKER % requests], cwd=ROOT, env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True) for _ in range(count)]
+    return [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procs]
+
+def report(name, results, extra_mb=0.0):
+    total = sum(r['rss_mb'] for r in results) + extra_mb
+    p50 = max(r['p50_ms'] for r in results)
+    p95 = max(r['p95_ms'] for r in results)
+    worker = results[0]['rss_mb']
+    print(f"{name:<14}{worker:>12.0f}{total:>12.0f}{p50:>10.2f}{p95:>10.2f}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    env = dict(os.environ, MODEL_LOADING='eager')
+    env.pop('MODEL_SERVER_SOCKET', None)
+
+    print(f"{'mode':<14}{'worker MB':>12}{'total MB':>12}{'p50 ms':>10}{'p95 ms':>10}")
+    report('in-process', run_workers(args.workers, args.requests, env))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, 'models.sock')
+        server = subprocess.Popen([sys.executable, '-m', 'app.model_server', '--socket', socket_path], cwd=ROOT,
+                                  env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            while not os.path.exists(socket_path):
+                if server.poll() is not None:
+                    sys.exit("model server exited before listening")
+                time.sleep(0.2)
+            results = run_workers(args.workers, args.requests, dict(env, MODEL_SERVER_SOCKET=socket_path))
+            report('model server', results, psutil.Process(server.pid).memory_info().rss / 2**20)
+        finally:
+            server.terminate()
+            server.wait()
+
+if __name__ == '__main__':
+    main()
@@ -1,33 +1,23 @@
 from app import create_app
+from app import extensions
 from app.extensions import db
 from app.routes.disease_check import seed_disease_types
-from datetime import datetime
+from app.migrations import ensure_indexes
 import pandas as pd
 import os
-import warnings
 
-app = create_app()
-
-def parse_csv_date(date_str):
-    if not date_str:
-        return None
-        
-    formats = ["%Y-%m-%d", "%d/%m/%Y"] 
-    
-    for fmt in formats:
-        try:
-            dt = datetime.strptime(date_str, fmt)
-            if dt > datetime.now():
-                warnings.warn(f"Future date detected: {date_str}", UserWarning)
-            return dt
-        except ValueError:
-            continue
-            
-    return None 
+# APP_CONFIG=prod selects the tuned database profile
+app = create_app(os.environ.get('APP_CONFIG', 'dev'))
 
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        # indexes added after plant_care.db was first created
+        ensure_indexes(db.engine)
         seed_disease_types()
+    # async disease checks queued before the last shutdown are picked up again
+    # (in the reloader child, the process that serves requests)
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        extensions.disease_jobs.start()
     app.run(debug=True)
 
@@ -0,0 +1,207 @@
+"""
+production entry point: a master process builds the app and loads the growth
+model and feature schema once, then forks N workers that share those pages
+copy-on-write and serve from one listening socket
+
+    python serve.py --workers 4 --bind 0.0.0.0:8000 --tf-intra-op-threads 2 --blas-threads 1
+
+the tensorflow runtime is not fork-safe (a model loaded before fork hangs in the
+children), so the master only imports tensorflow and every worker loads the
+disease model after the fork. --model-server runs the disease and growth models
+once in a model server process instead (app.model_server), the workers then
+load no model at all
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+BLAS_THREAD_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+# a worker that exits sooner than this after its start counts as a failed start
+FAST_EXIT_SECONDS = 10.0
+RESPAWN_BACKOFF_MAX = 30.0
+
+# seconds before a slot is started again, doubling with every failed start in a row
+def respawn_delay(fast_failures):
+    if not fast_failures:
+        return 0.0
+    return min(RESPAWN_BACKOFF_MAX, 0.5 * 2 ** (fast_failures - 1))
+
+def parse_args(argv=None):
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description='Run the API with preloaded models and forked workers.')
+    parser.add_argument('--bind', default=os.environ.get('SERVE_BIND', '127.0.0.1:8000'), help='host:port')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('SERVE_WORKERS', cpus)))
+    parser.add_argument('--config', default=os.environ.get('APP_CONFIG', 'prod'))
+    # default: the cores are split between the workers
+    parser.add_argument('--tf-intra-op-threads', type=int, default=os.environ.get('SERVE_TF_INTRA_OP_THREADS'))
+    parser.add_argument('--tf-inter-op-threads', type=int, default=int(os.environ.get('SERVE_TF_INTER_OP_THREADS', 1)))
+    parser.add_argument('--blas-threads', type=int, default=os.environ.get('SERVE_BLAS_THREADS'))
+    parser.add_argument('--model-server', action='store_true', default=os.environ.get('SERVE_MODEL_SERVER') == '1',
+                        help='serve the models from one model server process instead of the workers')
+    args = parser.parse_args(argv)
+
+    args.workers = max(1, args.workers)
+    share = max(1, cpus // args.workers)
+    args.tf_intra_op_threads = int(args.tf_intra_op_threads or share)
+    args.blas_threads = int(args.blas_threads or share)
+    host, _, port = args.bind.rpartition(':')
+    args.host, args.port = host or '127.0.0.1', int(port)
+    return args
+
+# thread pools read these when numpy/tensorflow initialize, so they are set before any import
+def thread_environ(args):
+    env = {name: str(args.blas_threads) for name in BLAS_THREAD_VARS}
+    env['TF_NUM_INTRAOP_THREADS'] = str(args.tf_intra_op_threads)
+    env['TF_NUM_INTEROP_THREADS'] = str(args.tf_inter_op_threads)
+    env['DISEASE_TFLITE_THREADS'] = os.environ.get('DISEASE_TFLITE_THREADS', str(args.tf_intra_op_threads))
+    return env
+
+def start_model_server(args, config_name):
+    socket_path = os.path.abspath(os.environ.get('MODEL_SERVER_SOCKET', 'model-server.sock'))
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = subprocess.Popen([sys.executable, '-m', 'app.model_server', '--socket', socket_path, '--config', config_name])
+    while not os.path.exists(socket_path):
+        if server.poll() is not None:
+            sys.exit("model server exited before listening")
+        time.sleep(0.2)
+    return server, socket_path
+
+# runs in the forked child, never returns
+def worker_main(app, listener, args):
+    from werkzeug.serving import make_server
+    from app import extensions
+    from app.extensions import db
+    from app.model_loader import connect_model_server, load_disease_model
+
+    code = 0
+    try:
+        # the master's handlers would signal the other workers
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        # sqlite connections opened by the master are not shared with the children
+        with app.app_context():
+            db.engine.dispose(close=False)
+
+        config = dict(app.config)
+        loader = connect_model_server if config.get('MODEL_SERVER_SOCKET') else load_disease_model
+        threading.Thread(target=loader, args=(config,), name="model-loader", daemon=True).start()
+        extensions.disease_jobs.start()
+
+        server = make_server(args.host, args.port, app, threaded=True, fd=listener.fileno())
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+        server.serve_forever()
+        extensions.disease_jobs.close()
+    except Exception as e:
+        print(f"Worker {os.getpid()} error: {e}", file=sys.stderr)
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ.update(thread_environ(args))
+    # models are loaded explicitly below, before the fork and never on background threads
+    os.environ['MODEL_LOADING'] = 'off'
+
+    model_server = None
+    if args.model_server:
+        model_server, socket_path = start_model_server(args, args.config)
+        os.environ['MODEL_SERVER_SOCKET'] = socket_path
+
+    from app import create_app
+    from app.extensions import db
+    from app.migrations import ensure_indexes
+    from app.model_loader import load_growth_model
+    from app.routes.disease_check import seed_disease_types
+
+    app = create_app(args.config)
+    with app.app_context():
+        db.create_all()
+        ensure_indexes(db.engine)
+        seed_disease_types()
+
+    config = dict(app.config)
+    if not config.get('MODEL_SERVER_SOCKET'):
+        load_growth_model(config)
+        if os.path.exists(config['DISEASE_MODEL_PATH']):
+            # library pages are shared, the runtime itself starts in the workers
+            import tensorflow
+
+    listener = socket.create_server((args.host, args.port), backlog=2048)
+    listener.set_inheritable(True)
+    print(f"Listening on http://{args.host}:{listener.getsockname()[1]} with {args.workers} workers "
+          f"(tf intra-op {args.tf_intra_op_threads}, blas {args.blas_threads}, master pid {os.getpid()})", flush=True)
+
+    # pid -> slot, per slot: start time and failed starts in a row, slot -> time of a delayed respawn
+    workers = {}
+    slots = {slot: {'started': 0.0, 'failures': 0} for slot in range(args.workers)}
+    pending = {}
+    stopping = False
+
+    def spawn(slot):
+        slots[slot]['started'] = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            worker_main(app, listener, args)
+        workers[pid] = slot
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+        pending.clear()
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for slot in slots:
+        spawn(slot)
+
+    # a worker that dies is replaced until the master is told to stop, a worker that
+    # keeps dying right after its start (bad model file, failed init) is retried with backoff
+    while workers or pending:
+        now = time.monotonic()
+        for slot, due in list(pending.items()):
+            if due <= now:
+                del pending[slot]
+                spawn(slot)
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG if pending else 0)
+        except ChildProcessError:
+            pid = 0
+            if not pending:
+                break
+        if pid == 0:
+            time.sleep(min(0.5, max(0.0, min(pending.values(), default=now) - time.monotonic())))
+            continue
+        if pid not in workers:
+            continue
+
+        slot = workers.pop(pid)
+        if stopping:
+            continue
+        state = slots[slot]
+        state['failures'] = state['failures'] + 1 if time.monotonic() - state['started'] < FAST_EXIT_SECONDS else 0
+        delay = respawn_delay(state['failures'])
+        print(f"Worker {pid} exited ({status}), starting a new one in {delay:.1f} s", file=sys.stderr, flush=True)
+        pending[slot] = time.monotonic() + delay
+
+    listener.close()
+    if model_server is not None:
+        model_server.terminate()
+        model_server.wait()
+
+if __name__ == '__main__':
+    main()
@@ -8,10 +8,11 @@ from app.extensions import db
 from app.routes.disease_check import seed_disease_types
 
 @pytest.fixture
-def app():
+def app(tmp_path):
     app = create_app()
     app.config['TESTING'] = True
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / 'uploads')
 
     with app.app_context():
         db.create_all()
@@ -2,11 +2,14 @@ import pytest
 import io
 import pandas as pd 
 import time
+import numpy as np
+from PIL import Image
 
 from app.extensions import db
 from unittest.mock import patch
 from app.routes.disease_check import seed_disease_types
-from app.models import GrowthLog, DiseaseType
+from app.storage import wait_for_pending_writes
+from app.models import GrowthLog, DiseaseType, DiseaseCheck
 
 user_name = "gizem"
 user_email = "gizem@example.com"
@@ -402,3 +405,561 @@ def test_plant_care_http(client):
 
     res = client.get(f"/plant-cares/{care_id}")
     assert res.status_code == 404
+
+def make_image_file(name, color=(40, 160, 60), size=(320, 240), fmt="JPEG"):
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, format=fmt)
+    buf.seek(0)
+    return (buf, name)
+
+# 15. Integration Test: coklu resim yuklendiginde tek batch tahmin yapilip her resim icin sonuc donuyor mu?
+def test_check_disease_batch(client, app, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    client.post('/users', json={'username': user_name, 'email': user_email, 'password': user_password})
+    client.post("/plants", json={"name": "elma", "species": "apple", "user_id": 1})
+
+    def fake_predict(batch, **kwargs):
+        preds = np.zeros((batch.shape[0], 38))
+        preds[:, 1] = 0.9
+        return preds
+
+    with patch("app.extensions.disease_model") as mock_model:
+        mock_model.predict.side_effect = fake_predict
+        res = client.post('/check-disease/batch', data={
+            'plant_id': 1,
+            'files': [make_image_file("a.jpg"), make_image_file("b.png", fmt="PNG"), make_image_file("c.gif", fmt="GIF")]
+        }, content_type='multipart/form-data')
+
+    assert res.status_code == 201
+    assert res.json["created"] == 2
+    assert res.json["failed"] == 1
+    assert mock_model.predict.call_count == 1
+
+    statuses = [r["status"] for r in res.json["results"]]
+    assert statuses == [201, 201, 400]
+    assert res.json["results"][0]["check"]["disease_type_id"] == 2
+    assert DiseaseCheck.query.count() == 2
+
+    # buyuk istekler DISEASE_BATCH_MAX_SIZE'lik parcalarla tahmin edilir, dosya siniri asilinca 413
+    app.config['DISEASE_BATCH_MAX_SIZE'] = 2
+    with patch("app.extensions.disease_model") as mock_model:
+        mock_model.predict.side_effect = fake_predict
+        chunked = client.post('/check-disease/batch', data={
+            'plant_id': 1, 'files': [make_image_file(f"{i}.jpg") for i in range(5)]
+        }, content_type='multipart/form-data')
+        app.config['DISEASE_BATCH_MAX_FILES'] = 4
+        too_many = client.post('/check-disease/batch', data={
+            'plant_id': 1, 'files': [make_image_file(f"{i}.jpg") for i in range(5)]
+        }, content_type='multipart/form-data')
+
+    assert chunked.json["created"] == 5
+    assert [len(call.args[0]) for call in mock_model.predict.call_args_list] == [2, 2, 1]
+    assert too_many.status_code == 413
+    assert DiseaseCheck.query.count() == 7
+
+# 16. Integration Test: toplu buyume tahmininde model tek sefer cagrilip tum kayitlar ekleniyor mu?
+def test_predict_growth_batch(client):
+    client.post('/users', json={'username': user_name, 'email': user_email, 'password': user_password})
+    client.post("/plants", json={"name": "kasimpati", "user_id": 1})
+
+    records = [{
+        "plant_id": 1,
+        "soil_type": soil,
+        "sunlight_hours": 6.0 + i,
+        "water_frequency": "Daily",
+        "fertilizer_type": "None",
+        "temperature": 25.0,
+        "humidity": 60.0
+    } for i, soil in enumerate(["Clay", "Loam", "Sandy"])]
+
+    with patch("app.extensions.growth_model") as mock_model:
+        mock_model.predict.return_value = [1, 0, 1]
+        with patch("app.extensions.model_columns", ["Soil_Type_Loam", "Soil_Type_Sandy", "Sunlight_Hours"]):
+            res = client.post("/predict-growth/batch", json={"records": records})
+            missing = client.post("/predict-growth/batch", json={"records": [dict(records[0], plant_id=99)]})
+            client.application.config["GROWTH_BATCH_MAX_RECORDS"] = 2
+            too_many = client.post("/predict-growth/batch", json={"records": records})
+
+    assert res.status_code == 201
+    assert [log["predicted_milestone"] for log in res.json] == [1, 0, 1]
+    assert mock_model.predict.call_count == 1
+
+    matrix = mock_model.predict.call_args[0][0]
+    assert matrix.shape == (3, 3)
+
+    assert missing.status_code == 404
+    assert too_many.status_code == 413
+    assert GrowthLog.query.count() == 3
+
+# 17. Integration Test: readiness endpoint model durumlarini raporluyor mu?
+def test_readiness_reports_models(client):
+    with patch.dict("app.model_loader.model_status", {
+            "growth": {"state": "ready", "path": "plant_growth.pkl", "seconds": 0.2, "error": None},
+            "disease": {"state": "loading", "path": "plant_disease.h5", "seconds": None, "error": None}}):
+        loading = client.get("/health/ready")
+        # ML gerektirmeyen endpoint'ler model yuklenirken de calisir
+        users = client.get("/users")
+
+    assert loading.status_code == 503
+    assert loading.json["ready"] is False
+    assert loading.json["models"]["disease"]["state"] == "loading"
+    assert users.status_code == 200
+
+    assert client.get("/health").status_code == 200
+    ready = client.get("/health/ready")
+    assert ready.status_code == 200
+    assert ready.json["models"]["disease"]["state"] == "missing"
+
+# 18. Integration Test: yuklenen resim diske yazilmadan bellekten okunup tahmin ediliyor, dosya arka planda kaydediliyor mu?
+def test_check_disease_decodes_in_memory(client, app):
+    client.post('/users', json={'username': user_name, 'email': user_email, 'password': user_password})
+    client.post("/plants", json={"name": "elma", "species": "apple", "user_id": 1})
+
+    with patch("app.extensions.disease_model") as mock_model:
+        mock_model.predict.side_effect = lambda batch, **kwargs: np.full((batch.shape[0], 1), 0.9)
+        with patch('werkzeug.datastructures.FileStorage.save', side_effect=AssertionError("disk round-trip")):
+            res = client.post('/check-disease', data={
+                'plant_id': 1,
+                'file': make_image_file("leaf.jpg", size=(1600, 1200))
+            })
+
+    assert res.status_code == 201
+    batch = mock_model.predict.call_args[0][0]
+    assert batch.shape == (1, 224, 224, 3)
+
+    wait_for_pending_writes(timeout=5)
+    saved = res.json["image_path"]
+    with open(saved, "rb") as f:
+        assert Image.open(f).size == (1600, 1200)
+
+class VersionedModel:
+    model_version = "test-model:keras"
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, batch, **kwargs):
+        self.calls += 1
+        preds = np.zeros((batch.shape[0], 38))
+        preds[:, 1] = 0.9
+        return preds
+
+# 19. Integration Test: ayni fotograf tekrar yuklenince model calismadan sonuc donuyor, ayni isimli farkli dosyalar ayri saklaniyor mu?
+def test_check_disease_prediction_cache(client):
+    client.post('/users', json={'username': user_name, 'email': user_email, 'password': user_password})
+    client.post("/plants", json={"name": "elma", "species": "apple", "user_id": 1})
+
+    model = VersionedModel()
+    with patch("app.extensions.disease_model", model):
+        first = client.post('/check-disease', data={'plant_id': 1, 'file': make_image_file("leaf.jpg")})
+        again = client.post('/check-disease', data={'plant_id': 1, 'file': make_image_file("retry.jpg")})
+        other = client.post('/check-disease', data={'plant_id': 1, 'file': make_image_file("leaf.jpg", color=(200, 30, 30))})
+        batch = client.post('/check-disease/batch', data={
+            'plant_id': 1,
+            'files': [make_image_file("a.jpg"), make_image_file("b.jpg", color=(200, 30, 30))]
+        }, content_type='multipart/form-data')
+
+    assert first.status_code == again.status_code == other.status_code == 201
+    assert batch.status_code == 201
+    assert model.calls == 2
+    assert again.json["image_path"] == first.json["image_path"]
+    assert other.json["image_path"] != first.json["image_path"]
+    assert again.json["disease_type_id"] == first.json["disease_type_id"] == 2
+    assert DiseaseCheck.query.count() == 5
+
+# 20. Integration Test: ayni sensor okumasi tekrar gelince buyume modeli cagrilmadan cache'ten donuyor mu?
+def test_predict_growth_cache(client):
+    client.post('/users', json={'username': user_name, 'email': user_email, 'password': user_password})
+    client.post("/plants", json={"name": "kasimpati", "user_id": 1})
+
+    reading = {
+        "plant_id": 1,
+        "soil_type": "Loam",
+        "sunlight_hours": 6.5,
+        "water_frequency": "Daily",
+        "fertilizer_type": "None",
+        "temperature": 25.0,
+        "humidity": 60.0
+    }
+
+    with patch("app.extensions.growth_model") as mock_model, \
+            patch("app.extensions.growth_model_version", "v1"), \
+            patch("app.extensions.model_columns", ["Soil_Type_Loam", "Sunlight_Hours"]):
+        mock_model.predict.side_effect = lambda features: np.ones(len(features))
+        client.post("/predict-growth", json=reading)
+        client.post("/predict-growth", json=dict(reading, temperature=25))
+        res = client.post("/predict-growth/batch", json={"records": [reading, dict(reading, humidity=70.0)]})
+
+    assert res.status_code == 201
+    assert [log["predicted_milestone"] for log in res.json] == [1, 1]
+    assert mock_model.predict.call_count == 2
+    assert mock_model.predict.call_args[0][0].shape == (1, 2)
+    assert GrowthLog.query.count() == 4
+
+    stats = client.get("/health/caches").json["growth_predictions"]
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+    assert stats["size"] == 2
+
+# 21. Integration Test: liste endpoint'leri limit/cursor ile sayfalaniyor, filtreler ve gecersiz cursor calisiyor mu?
+def test_list_keyset_pagination(client):
+    from datetime import datetime
+    from app.models import Plant
+
+    client.post('/users', json={'username': user_name, 'email': user_email, 'password': user_password})
+    for i in range(5):
+        client.post("/plants", json={"name": f"bitki{i}", "species": "apple" if i % 2 else "tomato", "user_id": 1})
+
+    ids, cursor, pages = [], None, 0
+    while True:
+        res = client.get("/plants", query_string={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        assert res.status_code == 200
+        ids += [p["id"] for p in res.json]
+        pages += 1
+        cursor = res.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert ids == [1, 2, 3, 4, 5]
+    assert pages == 3
+
+    apples = client.get("/plants", query_string={"species": "apple"})
+    assert [p["name"] for p in apples.json] == ["bitki1", "bitki3"]
+    assert "X-Next-Cursor" not in apples.headers
+
+    # ayni zamanli kayitlar (created_at esit) iki sayfaya bolununce kaybolmamali
+    same_time = datetime(2024, 5, 1, 12, 0, 0)
+    for i in range(3):
+        db.session.add(DiseaseCheck(plant_id=1, disease_type_id=1, confidence=0.9, created_at=same_time))
+    db.session.add(DiseaseCheck(plant_id=1, disease_type_id=1, confidence=0.9, created_at=datetime(2024, 6, 1)))
+    db.session.commit()
+
+    first = client.get("/plants/1/disease-checks", query_string={"limit": 2})
+    second = client.get("/plants/1/disease-checks", query_string={"limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+    assert [c["id"] for c in first.json] == [4, 3]
+    assert [c["id"] for c in second.json] == [2, 1]
+    assert "X-Next-Cursor" not in second.headers
+
+    since = client.get("/disease-checks", query_string={"since": "2024-05-15T00:00:00"})
+    assert [c["id"] for c in since.json] == [4]
+    # +03:00 saat dilimi UTC'ye cevrilir: 2024-06-01T02:00+03:00 = 2024-05-31T23:00 UTC
+    offset = client.get("/disease-checks", query_string={"since": "2024-06-01T02:00:00+03:00"})
+    until = client.get("/disease-checks", query_string={"until": "2024-06-01T02:00:00+03:00"})
+    assert [c["id"] for c in offset.json] == [4]
+    assert [c["id"] for c in until.json] == [1, 2, 3]
+
+    assert client.get("/growth-logs", query_string={"cursor": "bozuk"}).status_code == 400
+    assert client.get("/users", query_string={"limit": 0}).status_code == 400
+
+# 22. Integration Test: growth log ve hastalik kayitlari ndjson, csv ve parquet olarak filtreli stream ediliyor mu?
+def test_export_streams_formats(client):
+    import csv
+    import json
+    from datetime import datetime
+
+    client.post('/users', json={'username': user_name, 'email': user_email, 'password': user_password})
+    client.post("/plants", json={"name": "kasimpati", "user_id": 1})
+    client.post("/plants", json={"name": "elma", "user_id": 1})
+    for i in range(6):
+        db.session.add(GrowthLog(plant_id=1 + i % 2, date=datetime(2024, 1, 1 + i), soil_type="Loam", sunlight_hours=6.0,
+                                 water_frequency="Daily", fertilizer_type="None", temperature=25.0, humidity=60.0,
+                                 predicted_milestone=i % 2))
+    db.session.add(DiseaseCheck(plant_id=1, disease_type_id=2, confidence=0.9, created_at=datetime(2024, 2, 1)))
+    db.session.commit()
+
+    res = client.get("/export/growth-logs", query_string={"plant_id": 1, "since": "2024-01-02T00:00:00"})
+    assert res.status_code == 200
+    assert res.is_streamed
+    assert res.mimetype == "application/x-ndjson"
+    rows = [json.loads(line) for line in res.get_data(as_text=True).splitlines()]
+    assert [r["id"] for r in rows] == [3, 5]
+    assert rows[0]["date"] == "2024-01-03T00:00:00"
+
+    # 2024-01-03T01:00+02:00 = 2024-01-02T23:00 UTC, 3 Ocak kaydi da dahil
+    res = client.get("/export/growth-logs", query_string={"plant_id": 1, "since": "2024-01-03T01:00:00+02:00"})
+    assert [json.loads(line)["id"] for line in res.get_data(as_text=True).splitlines()] == [3, 5]
+
+    res = client.get("/export/disease-checks", query_string={"format": "csv"})
+    table = list(csv.reader(io.StringIO(res.get_data(as_text=True))))
+    assert table[0] == ["id", "plant_id", "disease_type_id", "disease_name", "image_path", "confidence", "created_at"]
+    assert table[1][3] == DiseaseType.query.get(2).name
+
+    empty = client.get("/export/plant-cares", query_string={"format": "csv"})
+    assert empty.get_data(as_text=True).strip() == "id,plant_id,medicine_name,applied_at,notes,growth_log_id,disease_check_id"
+
+    pq = pytest.importorskip("pyarrow.parquet")
+    with patch("app.routes.export.EXPORT_CHUNK_SIZE", 4):
+        res = client.get("/export/growth-logs", query_string={"format": "parquet"})
+    parquet = pq.read_table(io.BytesIO(res.get_data()))
+    assert parquet.num_rows == 6
+    assert pq.ParquetFile(io.BytesIO(res.get_data())).num_row_groups == 2
+    assert parquet.column("predicted_milestone").to_pylist() == [0, 1, 0, 1, 0, 1]
+
+    import pyarrow as pa
+    arrow = pa.ipc.open_stream(client.get("/export/growth-logs", query_string={"format": "arrow"}).get_data()).read_all()
+    assert arrow.num_rows == 6
+    assert client.get("/export/growth-logs", query_string={"format": "xml"}).status_code == 400
+
+# 23. Integration Test: hastalik kontrol listeleri kayit sayisindan bagimsiz sabit sayida SQL sorgusu calistiriyor mu?
+def test_disease_check_lists_constant_queries(client, app):
+    from sqlalchemy import event
+
+    client.post('/users', json={'username': user_name, 'email': user_email, 'password': user_password})
+    client.post("/plants", json={"name": "elma", "species": "apple", "user_id": 1})
+
+    def count_queries(url):
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            res = client.get(url)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+        assert res.status_code == 200
+        return len(res.json), len(statements)
+
+    def add_checks(n):
+        for i in range(n):
+            db.session.add(DiseaseCheck(plant_id=1, disease_type_id=1 + i, confidence=0.9))
+        db.session.commit()
+        db.session.expunge_all()
+
+    add_checks(2)
+    few = [count_queries("/disease-checks"), count_queries("/plants/1/disease-checks")]
+    add_checks(8)
+    many = [count_queries("/disease-checks"), count_queries("/plants/1/disease-checks")]
+
+    assert [rows for rows, _ in few] == [2, 2]
+    assert [rows for rows, _ in many] == [10, 10]
+    assert [queries for _, queries in many] == [queries for _, queries in few]
+    assert all(r["disease_name"] for r in client.get("/disease-checks").json)
+
+# 24. Integration Test: hastalik tespiti sirasinda disease_type tablosuna hic sorgu atilmiyor mu?
+def test_check_disease_uses_catalog_cache(client):
+    from sqlalchemy import event
+
+    client.post('/users', json={'username': user_name, 'email': user_email, 'password': user_password})
+    client.post("/plants", json={"name": "elma", "species": "apple", "user_id": 1})
+    client.get("/disease-type")
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        with patch("app.extensions.disease_model", VersionedModel()):
+            single = client.post('/check-disease', data={'plant_id': 1, 'file': make_image_file("leaf.jpg")})
+            batch = client.post('/check-disease/batch', data={
+                'plant_id': 1, 'files': [make_image_file("a.jpg", color=(1, 2, 3)), make_image_file("b.jpg", color=(4, 5, 6))]
+            }, content_type='multipart/form-data')
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+
+    assert single.status_code == 201
+    assert batch.status_code == 201
+    assert single.json["disease_name"] == DiseaseType.query.get(2).name
+    assert batch.json["results"][1]["check"]["disease_name"] == single.json["disease_name"]
+    assert any("INSERT INTO disease_check" in s for s in statements)
+    assert [s for s in statements if "disease_type" in s and "INSERT INTO disease_check" not in s] == []
+
+# 25. Integration Test: gecmis sensor CSV'si parca parca iceri aktariliyor, hatali satirlar raporlaniyor mu?
+def test_import_growth_logs_csv(client):
+    client.post('/users', json={'username': user_name, 'email': user_email, 'password': user_password})
+    client.post("/plants", json={"name": "kasimpati", "user_id": 1})
+
+    csv_text = "\n".join([
+        "Plant_ID,Date,Soil_Type,Sunlight_Hours,Water_Frequency,Fertilizer_Type,Temperature,Humidity,Growth_Milestone",
+        "1,2023-03-01,loam,6.5,daily,none,24.0,55.0,1",
+        "1,15/03/2023,sandy,7.0,weekly,organic,25.0,60.0,",
+        "1,2023.04.01,loam,6.0,daily,none,22.0,50.0,0",
+        "2,2023-04-02,loam,6.0,daily,none,22.0,50.0,0",
+        "1,2023-04-03,rocky,6.0,daily,none,22.0,50.0,0",
+        "1,2023-04-04,clay,abc,daily,none,22.0,50.0,0",
+        "1,,clay,5.0,bi-weekly,chemical,21.0,45.0,",
+    ])
+    vocabulary = {"Soil_Type": ["clay", "loam", "sandy"], "Water_Frequency": ["bi-weekly", "daily", "weekly"],
+                  "Fertilizer_Type": ["chemical", "none", "organic"]}
+
+    with patch("app.extensions.growth_model") as mock_model, \
+            patch("app.extensions.model_columns", ["Soil_Type_loam", "Sunlight_Hours"]), \
+            patch("app.extensions.growth_vocabulary", vocabulary), \
+            patch("app.ingest.INGEST_CHUNK_SIZE", 4):
+        mock_model.predict.side_effect = lambda features: np.ones(len(features))
+        res = client.post("/growth-logs/import", data={
+            "file": (io.BytesIO(csv_text.encode("utf-8")), "history.csv"),
+            "predict": "true"
+        }, content_type="multipart/form-data")
+
+    assert res.status_code == 201
+    assert res.json["rows"] == 7
+    assert res.json["inserted"] == 3
+    assert res.json["predicted"] == 2
+    assert res.json["rejected"] == 4
+    assert [e["line"] for e in res.json["errors"]] == [4, 5, 6, 7]
+    assert "invalid date" in res.json["errors"][0]["message"]
+    assert "unknown soil_type" in res.json["errors"][2]["message"]
+    assert mock_model.predict.call_count == 2
+
+    logs = GrowthLog.query.order_by(GrowthLog.id).all()
+    assert [log.predicted_milestone for log in logs] == [1, 1, 1]
+    assert logs[1].date.day == 15
+
+    missing = client.post("/growth-logs/import", data={
+        "file": (io.BytesIO(b"plant_id,date\n1,2023-01-01\n"), "bad.csv")
+    }, content_type="multipart/form-data")
+    assert missing.status_code == 400
+
+# 26. Integration Test: async hastalik kontrolu 202 ile is numarasi donup, sonuc is durumu endpoint'inden aliniyor mu?
+def test_check_disease_async_job(client):
+    client.post('/users', json={'username': user_name, 'email': user_email, 'password': user_password})
+    client.post("/plants", json={"name": "elma", "species": "apple", "user_id": 1})
+
+    model = VersionedModel()
+    with patch("app.extensions.disease_model", model):
+        res = client.post('/check-disease', data={'plant_id': 1, 'async': 'true', 'file': make_image_file("leaf.jpg")})
+        assert res.status_code == 202
+        job_id = res.json["id"]
+        assert res.json["check"] is None
+        assert res.headers["Location"].endswith(f"/disease-jobs/{job_id}")
+
+        job = res.json
+        deadline = time.time() + 10
+        while job["status"] in ("queued", "running") and time.time() < deadline:
+            time.sleep(0.05)
+            job = client.get(f"/disease-jobs/{job_id}").json
+
+        invalid = client.post('/check-disease', data={'plant_id': 1, 'async': 'true', 'file': make_image_file("leaf.gif", fmt="GIF")})
+        missing = client.post('/check-disease', data={'plant_id': 99, 'async': 'true', 'file': make_image_file("leaf.jpg")})
+
+    assert job["status"] == "done"
+    assert job["attempts"] == 1
+    assert job["check"]["disease_type_id"] == 2
+    assert job["check"]["disease_name"] == "Apple___Black_rot"
+    assert model.calls == 1
+    assert invalid.status_code == 400
+    assert missing.status_code == 404
+    assert client.get("/disease-jobs/999").status_code == 404
+    assert DiseaseCheck.query.count() == 1
+
+# 27. Integration Test: growth sweep tum izgarayi tek predict_proba cagrisiyla puanlayip kayit yazmadan en iyileri donuyor mu?
+def test_predict_growth_sweep(client):
+    import itertools
+    from app.routes.growth_log import prepare_prediction_batch
+
+    columns = ["Soil_Type_sandy", "Sunlight_Hours", "Water_Frequency_weekly", "Fertilizer_Type_organic", "Temperature", "Humidity"]
+    vocabulary = {"Soil_Type": ["loam", "sandy"], "Water_Frequency": ["daily", "weekly"],
+                  "Fertilizer_Type": ["chemical", "none", "organic"]}
+
+    # more sunlight and organic fertilizer give a higher chance of milestone 1
+    def proba(features):
+        high = features[:, 1] / 10 * np.where(features[:, 3] == 1, 0.9, 0.5)
+        return np.stack([1 - high, high], axis=1)
+
+    payload = {
+        "fixed": {"soil_type": "loam", "temperature": 24.0, "humidity": 55.0},
+        "grid": {"sunlight_hours": {"start": 4, "stop": 10, "step": 2}, "water_frequency": ["daily", "weekly"],
+                 "fertilizer_type": "*"},
+        "top_k": 3
+    }
+
+    with patch("app.extensions.growth_model") as mock_model, \
+            patch("app.extensions.model_columns", columns), \
+            patch("app.extensions.growth_vocabulary", vocabulary):
+        mock_model.classes_ = np.array([0, 1])
+        mock_model.predict_proba.side_effect = proba
+        res = client.post("/predict-growth/sweep", json=payload)
+
+        unknown = client.post("/predict-growth/sweep", json=dict(payload, fixed={**payload["fixed"], "soil_type": "rocky"}))
+        missing = client.post("/predict-growth/sweep", json=dict(payload, fixed={"soil_type": "loam"}))
+        target = client.post("/predict-growth/sweep", json=dict(payload, target_milestone=5))
+        client.application.config["GROWTH_SWEEP_MAX_CONFIGS"] = 10
+        too_large = client.post("/predict-growth/sweep", json=payload)
+
+    assert res.status_code == 200
+    assert res.json["evaluated"] == 24
+    assert res.json["target_milestone"] == 1
+    assert mock_model.predict_proba.call_count == 1
+
+    features = mock_model.predict_proba.call_args_list[0].args[0]
+    records = [dict(payload["fixed"], sunlight_hours=s, water_frequency=w, fertilizer_type=f)
+               for s, w, f in itertools.product([4.0, 6.0, 8.0, 10.0], ["daily", "weekly"], vocabulary["Fertilizer_Type"])]
+    assert np.array_equal(features, prepare_prediction_batch(records, columns))
+
+    results = res.json["results"]
+    assert [r["rank"] for r in results] == [1, 2, 3]
+    assert [(r["sunlight_hours"], r["water_frequency"], r["fertilizer_type"]) for r in results] == \
+        [(10.0, "daily", "organic"), (10.0, "weekly", "organic"), (8.0, "daily", "organic")]
+    assert results[0]["probability"] == pytest.approx(0.9)
+    assert results[0]["predicted_milestone"] == 1
+    assert results[0]["soil_type"] == "loam" and results[0]["humidity"] == 55.0
+
+    assert unknown.status_code == 400 and "unknown soil_type" in unknown.json["message"]
+    assert missing.status_code == 400
+    assert target.status_code == 400
+    assert too_large.status_code == 400
+    assert GrowthLog.query.count() == 0
+
+# 28. Integration Test: memory-map ile yuklenen kompakt ormanla tarama parca parca puanlanip sklearn ile ayni siralamayi veriyor mu?
+def test_predict_growth_sweep_compact_forest(client, tmp_path):
+    import itertools
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier
+    from app.forest import CompactForest, save_compact_forest
+    from app.routes.growth_log import prepare_prediction_batch
+
+    columns = ["Soil_Type_sandy", "Sunlight_Hours", "Water_Frequency_weekly", "Fertilizer_Type_organic", "Temperature", "Humidity"]
+    rng = np.random.default_rng(0)
+    X = np.column_stack([rng.integers(0, 2, 400), rng.uniform(2, 12, 400), rng.integers(0, 2, 400),
+                         rng.integers(0, 2, 400), rng.uniform(15, 35, 400), rng.uniform(30, 80, 400)])
+    y = (X[:, 1] / 12 + X[:, 3] * 0.4 + rng.normal(0, 0.2, 400) > 0.8).astype(int)
+    model = RandomForestClassifier(n_estimators=15, random_state=0).fit(X, y)
+    model_path = str(tmp_path / "plant_growth.pkl")
+    joblib.dump(model, model_path)
+    save_compact_forest(model, str(tmp_path / "plant_growth.forest"), model_path)
+    forest = CompactForest.load(str(tmp_path / "plant_growth.forest"), model_path)
+
+    sunlight = [2.0 + 0.5 * i for i in range(21)]
+    payload = {
+        "fixed": {"soil_type": "loam", "water_frequency": "daily", "humidity": 55.0},
+        "grid": {"sunlight_hours": {"start": 2, "stop": 12, "step": 0.5}, "fertilizer_type": ["none", "organic"],
+                 "temperature": [18.0, 24.0, 30.0]},
+        "top_k": 5
+    }
+    client.application.config["GROWTH_SWEEP_CHUNK_ROWS"] = 16
+
+    with patch("app.extensions.growth_model", forest), \
+            patch("app.extensions.model_columns", columns), \
+            patch("app.extensions.growth_vocabulary", None), \
+            patch.object(CompactForest, "predict_proba", autospec=True, side_effect=CompactForest.predict_proba) as proba:
+        res = client.post("/predict-growth/sweep", json=payload)
+
+    assert res.status_code == 200
+    assert res.json["evaluated"] == 21 * 2 * 3
+    assert [len(call.args[1]) for call in proba.call_args_list] == [16] * 7 + [14]
+
+    configs = list(itertools.product(sunlight, ["none", "organic"], [18.0, 24.0, 30.0]))
+    records = [dict(payload["fixed"], soil_type="loam", sunlight_hours=s, fertilizer_type=f, temperature=t)
+               for s, f, t in configs]
+    expected = model.predict_proba(prepare_prediction_batch(records, columns))[:, 1]
+    top = np.argsort(-expected, kind="stable")[:5]
+    assert [(r["sunlight_hours"], r["fertilizer_type"], r["temperature"]) for r in res.json["results"]] == [configs[i] for i in top]
+    assert [r["probability"] for r in res.json["results"]] == expected[top].tolist()
+    assert GrowthLog.query.count() == 0
+
+# 29. Integration Test: model yuklenmiyorsa (dosya yok, hata) async istek kuyruga alinmayip 503 donuyor mu?
+def test_check_disease_async_without_model(client):
+    from app.models import DiseaseJob
+
+    client.post('/users', json={'username': user_name, 'email': user_email, 'password': user_password})
+    client.post("/plants", json={"name": "elma", "species": "apple", "user_id": 1})
+
+    responses = {}
+    for state in ("missing", "error", "idle", "loading"):
+        with patch.dict("app.model_loader.model_status", {
+                "disease": {"state": state, "path": "plant_disease.h5", "seconds": None, "error": None}}):
+            responses[state] = client.post('/check-disease', data={'plant_id': 1, 'async': 'true', 'file': make_image_file("leaf.jpg")})
+
+    for state in ("missing", "error", "idle"):
+        assert responses[state].status_code == 503
+        assert responses[state].json["message"] == "Model not loaded"
+    # while the model is loading the check waits in the queue
+    assert responses["loading"].status_code == 202
+    assert DiseaseJob.query.count() == 1
@@ -1,6 +1,11 @@
 import pytest 
 import io
+import os
+import subprocess
+import sys
+import time
 import pandas as pd 
+import numpy as np
 
 from app.extensions import db
 from unittest.mock import patch
@@ -12,6 +17,8 @@ from app.routes.user import validate_email_format, validate_password_strength
 from app.routes.disease_check import format_disease_name, predict_disease, validate_image_format, seed_disease_types, normalize_name
 from app.routes.growth_log import prepare_prediction_dataframe, parse_csv_date
 from app.routes.plant import validate_plant
+from app.batching import MicroBatcher
+from app.features import FeatureEncoder, FeatureSchemaError, save_feature_schema, load_feature_schema
 
 user_name = "gizem"
 user_email = "gizem@example.com"
@@ -224,3 +231,664 @@ def test_validation_plant(client):
 
     assert validate_plant(1) is True
     assert validate_plant(9) is False
+
+# 16. Unit Test: eszamanli istekler tek bir batch halinde modele gidiyor ve her istek kendi satirini aliyor mu?
+def test_micro_batcher_merges_requests():
+    calls = []
+
+    def fake_predict(batch):
+        calls.append(batch.shape[0])
+        return batch.sum(axis=1)
+
+    batcher = MicroBatcher(fake_predict, max_batch_size=8, max_wait_ms=200)
+    futures = [batcher.submit(np.full(3, i, dtype=np.float32)) for i in range(8)]
+    results = [f.result(timeout=5) for f in futures]
+    batcher.close()
+
+    assert results == [i * 3 for i in range(8)]
+    assert calls == [8]
+
+# 17. Unit Test: numpy encoder pandas get_dummies + reindex ile birebir ayni matrisi uretiyor mu?
+def test_feature_encoder_matches_pandas():
+    train = pd.DataFrame({
+        "Soil_Type": ["clay", "loam", "sandy"],
+        "Sunlight_Hours": [5.0, 6.5, 8.0],
+        "Water_Frequency": ["daily", "weekly", "bi-weekly"],
+        "Fertilizer_Type": ["chemical", "organic", "none"],
+        "Temperature": [20.0, 25.0, 30.0],
+        "Humidity": [40.0, 55.0, 70.0]
+    })
+    cat_cols = ["Soil_Type", "Water_Frequency", "Fertilizer_Type"]
+    model_columns = pd.get_dummies(train, columns=cat_cols, drop_first=True).columns.tolist()
+
+    records = [{
+        "Soil_Type": soil,
+        "Sunlight_Hours": 4.25 + i,
+        "Water_Frequency": water,
+        "Fertilizer_Type": fert,
+        "Temperature": 18.5 + i,
+        "Humidity": 61.0
+    } for i, (soil, water, fert) in enumerate([
+        ("clay", "daily", "chemical"),
+        ("loam", "weekly", "organic"),
+        ("sandy", "bi-weekly", "none"),
+        ("peat", "monthly", "compost")
+    ])]
+
+    expected = pd.get_dummies(pd.DataFrame(records), columns=cat_cols)
+    expected = expected.reindex(columns=model_columns, fill_value=0).to_numpy(dtype=np.float64)
+
+    encoded = FeatureEncoder(model_columns).encode_many(records)
+
+    assert encoded.dtype == np.float64
+    assert np.array_equal(encoded, expected)
+
+# 18. Unit Test: feature schema kaydedilip okunabiliyor mu, model degisince hata veriyor mu?
+def test_feature_schema_roundtrip(tmp_path):
+    model_path = tmp_path / "plant_growth.pkl"
+    schema_path = tmp_path / "plant_growth.schema.json"
+    model_path.write_bytes(b"model-v1")
+    columns = ["Sunlight_Hours", "Temperature", "Soil_Type_loam", "Soil_Type_sandy", "Fertilizer_Type_none"]
+
+    save_feature_schema(schema_path, columns, model_path)
+    schema = load_feature_schema(schema_path, model_path)
+
+    assert schema["columns"] == columns
+    assert schema["categories"]["Soil_Type"] == ["loam", "sandy"]
+
+    model_path.write_bytes(b"model-v2")
+    with pytest.raises(FeatureSchemaError, match="does not match"):
+        load_feature_schema(schema_path, model_path)
+
+# 19. Unit Test: uygulama import edilirken tensorflow/pandas gibi agir kutuphaneler yukleniyor mu?
+def test_app_import_skips_heavy_modules():
+    probe = (
+        "import sys, app; app.create_app(); "
+        "print('heavy:' + ','.join(m for m in ('tensorflow', 'keras', 'pandas', 'joblib', 'sklearn') if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True,
+                         env={**os.environ, "MODEL_LOADING": "off"})
+
+    assert out.stdout.strip().splitlines()[-1] == "heavy:"
+
+# 20. Unit Test: derlenmis (tf.function) disease modeli keras predict ile ayni sonucu veriyor mu?
+def test_compiled_disease_model_matches_keras():
+    tf = pytest.importorskip("tensorflow")
+    from app.inference import CompiledDiseaseModel
+
+    tf.random.set_seed(0)
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(8, 8, 3)),
+        tf.keras.layers.Conv2D(4, 3, activation="relu"),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(5, activation="softmax")
+    ])
+    batch = np.random.default_rng(0).integers(0, 256, (3, 8, 8, 3), dtype=np.uint8)
+
+    compiled = CompiledDiseaseModel(model, input_shape=(8, 8, 3)).warmup([1, 3])
+
+    # uint8 girdi, /255 normalizasyonu graph icinde yapiliyor
+    assert np.allclose(compiled.predict(batch), model.predict(batch / 255.0, verbose=0), atol=1e-6)
+    assert compiled.predict(batch[:1]).shape == (1, 5)
+
+# 21. Unit Test: TFLite backend diske cache'leniyor ve keras ile ayni siniflari tahmin ediyor mu?
+def test_tflite_backend_parity(tmp_path):
+    tf = pytest.importorskip("tensorflow")
+    from app.inference import load_tflite_model, tflite_cache_path, compare_backends, KerasDiseaseModel, IMAGE_SIZE
+
+    tf.random.set_seed(0)
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=IMAGE_SIZE + (3,)),
+        tf.keras.layers.AveragePooling2D(pool_size=16),
+        tf.keras.layers.Flatten(),
+        tf.keras.layers.Dense(4, activation="softmax")
+    ])
+    model_path = tmp_path / "plant_disease.h5"
+    model_path.write_bytes(b"h5")
+
+    tflite = load_tflite_model(str(model_path), "dynamic", num_threads=1, keras_model=model)
+    assert (tmp_path / "plant_disease.dynamic.tflite").exists()
+    assert tflite_cache_path(str(model_path), "dynamic").endswith("plant_disease.dynamic.tflite")
+
+    # held-out klasor: <folder>/<class>/*.png
+    for i, class_name in enumerate(["Apple___Black_rot", "Apple___healthy"]):
+        class_dir = tmp_path / "heldout" / class_name
+        class_dir.mkdir(parents=True)
+        for j in range(3):
+            Image.new("RGB", (256, 256), (60 * i + 20 * j, 120, 40)).save(class_dir / f"{j}.png")
+
+    report = compare_backends(KerasDiseaseModel(model), tflite, str(tmp_path / "heldout"), ["Apple___Black_rot", "Apple___healthy"], batch_size=4)
+
+    assert report["images"] == 6
+    assert report["agreement"] == 1.0
+    assert report["max_abs_diff"] < 0.05
+
+# 22. Unit Test: RGBA ve grayscale PNG'ler tek seferde RGB uint8 diziye donusturuluyor mu?
+def test_decode_image_uint8_rgb():
+    from app.inference import decode_image
+
+    for mode, color in [("RGBA", (10, 200, 30, 128)), ("L", 90), ("P", 3), ("RGB", (1, 2, 3))]:
+        buf = io.BytesIO()
+        Image.new(mode, (300, 200), color).save(buf, format="PNG")
+        arr = decode_image(buf.getvalue())
+
+        assert arr.dtype == np.uint8
+        assert arr.shape == (224, 224, 3)
+        assert arr.flags["C_CONTIGUOUS"]
+
+    assert decode_image(b"not an image") is None
+
+# 23. Unit Test: LRU cache en eski kaydi atiyor mu, ayni icerik ayni shard yoluna tek sefer yaziliyor mu?
+def test_lru_cache_and_content_store(tmp_path):
+    from app.cache import LRUCache
+    from app.storage import content_hash, store_upload, wait_for_pending_writes
+
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert cache.get("b") is None
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 1, "misses": 1}
+
+    digest, path = store_upload(str(tmp_path), b"leaf-1", "leaf.JPG")
+    wait_for_pending_writes(timeout=5)
+    assert digest == content_hash(b"leaf-1")
+    assert path == os.path.join(str(tmp_path), digest[:2], digest[2:4], digest + ".jpg")
+
+    with patch("app.storage.persist_upload") as mock_persist:
+        assert store_upload(str(tmp_path), b"leaf-1", "other.jpg")[1] == path
+        other = store_upload(str(tmp_path), b"leaf-2", "leaf.jpg")[1]
+    assert other != path
+    assert mock_persist.call_count == 1
+
+# 24. Unit Test: buyume modeli yeniden yuklenince tahmin cache'i temizleniyor ve model surumu guncelleniyor mu?
+def test_growth_model_reload_clears_cache(tmp_path):
+    import joblib
+    from sklearn.tree import DecisionTreeClassifier
+    from app import extensions
+    from app.cache import LRUCache
+    from app.model_loader import load_growth_model
+
+    model_path = tmp_path / "plant_growth.pkl"
+    joblib.dump(DecisionTreeClassifier().fit([[0, 1], [1, 0]], [0, 1]), model_path)
+    save_feature_schema(tmp_path / "plant_growth.schema.json", ["Soil_Type_Loam", "Sunlight_Hours"], model_path)
+    config = {
+        "GROWTH_MODEL_PATH": str(model_path),
+        "GROWTH_SCHEMA_PATH": str(tmp_path / "plant_growth.schema.json"),
+        "GROWTH_DATA_PATH": str(tmp_path / "missing.csv"),
+    }
+
+    with patch("app.extensions.growth_prediction_cache", LRUCache(8)), \
+            patch("app.extensions.growth_model"), patch("app.extensions.growth_model_version"), \
+            patch("app.extensions.model_columns"), patch.dict("app.model_loader.model_status", {}):
+        extensions.growth_prediction_cache.put(("old", ("Loam",)), 1)
+        load_growth_model(config)
+
+        assert len(extensions.growth_prediction_cache) == 0
+        assert extensions.growth_model_version == load_feature_schema(config["GROWTH_SCHEMA_PATH"], str(model_path))["model_sha256"][:16]
+
+# 25. Unit Test: disease catalog bir kez yukleniyor, tablo degisince invalidate ediliyor mu?
+def test_disease_catalog_invalidation(client, app):
+    from app.catalog import get_disease_catalog
+    from app.routes.disease_check import get_or_create_unknown
+
+    catalog = get_disease_catalog()
+    assert get_disease_catalog() is catalog
+    assert catalog.type_id_for_class(0) == 1
+    assert catalog.type_id_for_class(len(catalog.names)) is None
+    assert catalog.supports("apple") and catalog.supports(None)
+    assert not catalog.supports("Kaktus")
+    assert catalog.unknown_id is None
+
+    # the new row is only dropped into the catalog once it is committed
+    unknown = get_or_create_unknown()
+    assert get_disease_catalog() is catalog
+    db.session.commit()
+    assert get_disease_catalog() is not catalog
+    assert get_disease_catalog().unknown_id == unknown.id
+
+    db.session.query(DiseaseType).delete()
+    db.session.commit()
+    seed_disease_types()
+    assert get_disease_catalog().unknown_id is None
+
+# 26. Unit Test: eski veritabanina eksik indexler ekleniyor mu, gecmis sorgulari indexi kullaniyor mu?
+def test_ensure_indexes_on_existing_database(tmp_path):
+    from sqlalchemy import create_engine, inspect, text
+    from app.migrations import ensure_indexes
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'plant_care.db'}")
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(text(f"DROP INDEX {index.name}"))
+
+    created = ensure_indexes(engine)
+    assert "ix_disease_check_plant_id_created_at" in created
+    assert "ix_growth_log_plant_id" in created
+    assert "ix_plant_user_id" in created
+    assert ensure_indexes(engine) == []
+    assert {ix["name"] for ix in inspect(engine).get_indexes("plant_care")} == {"ix_plant_care_plant_id_applied_at"}
+
+    with engine.connect() as conn:
+        plan = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM disease_check WHERE plant_id = 1 "
+            "ORDER BY created_at DESC, id DESC LIMIT 100")).all()
+    plan = " ".join(row[-1] for row in plan)
+    assert "ix_disease_check_plant_id_created_at" in plan
+    assert "TEMP B-TREE" not in plan
+
+# 27. Unit Test: prod profilinde sqlite baglantilari WAL ve pragma ayarlariyla aciliyor mu?
+def test_prod_profile_sqlite_pragmas(tmp_path, monkeypatch):
+    from sqlalchemy import text
+    from app import create_app
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'prod.db'}")
+    monkeypatch.setenv("MODEL_LOADING", "off")
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT_MS", "7000")
+    app = create_app('prod')
+
+    assert app.config["SQLALCHEMY_ENGINE_OPTIONS"]["pool_pre_ping"] is True
+    with app.app_context():
+        with db.engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 7000
+            assert conn.execute(text("PRAGMA cache_size")).scalar() == -64000
+        db.engine.dispose()
+
+# 28. Unit Test: import-growth-logs komutu tahminsiz modda milestone'u olmayan satirlari reddediyor mu?
+def test_import_growth_logs_command(client, app, tmp_path):
+    from app.ingest import parse_csv_date as shared_parse_csv_date
+
+    assert parse_csv_date is shared_parse_csv_date
+
+    client.post('/users', json={'username': user_name, 'email': user_email, 'password': user_password})
+    client.post('/plants', json={'name': 'P', 'species': 'Apple', 'user_id': 1})
+    csv_path = tmp_path / "history.csv"
+    csv_path.write_text(
+        "plant_id,date,soil_type,sunlight_hours,water_frequency,fertilizer_type,temperature,humidity,predicted_milestone\n"
+        "1,2023-01-01,Loam,6,Daily,None,25,60,1\n"
+        "1,2023-01-02,Loam,6,Daily,None,25,60,\n")
+
+    result = app.test_cli_runner().invoke(args=["import-growth-logs", str(csv_path)])
+
+    assert result.exit_code == 0
+    assert "1 of 2 rows imported" in result.output
+    assert "line 3: predicted_milestone is empty" in result.output
+    assert GrowthLog.query.count() == 1
+
+# 29. Unit Test: kuyruktaki hastalik isleri yeniden baslatmadan sonra kaybolmadan isleniyor, kalici hatalar tekrar denenmiyor mu?
+def test_disease_job_queue_survives_restart(client, app):
+    from app.jobs import DiseaseJobQueue, JobFailed
+    from app.models import DiseaseCheck, DiseaseJob
+
+    client.post('/users', json={'username': user_name, 'email': user_email, 'password': user_password})
+    client.post("/plants", json={"name": "elma", "species": "apple", "user_id": 1})
+
+    def handler(job):
+        if job.image_path == "bad.jpg":
+            raise JobFailed("Invalid image file.")
+        if job.image_path == "flaky.jpg" and job.attempts == 1:
+            raise RuntimeError("model busy")
+        check = DiseaseCheck(plant_id=job.plant_id, image_path=job.image_path, disease_type_id=1, confidence=0.9)
+        db.session.add(check)
+        db.session.flush()
+        return check
+
+    first = DiseaseJobQueue(app, handler, workers=0)
+    for path in ("a.jpg", "bad.jpg", "flaky.jpg"):
+        first.submit(1, path)
+    db.session.commit()
+    # the process is killed while a.jpg is running
+    assert first.claim().image_path == "a.jpg"
+    first.close()
+
+    restarted = DiseaseJobQueue(app, handler, workers=0, lease_seconds=60)
+    assert restarted.run_pending() == 3
+    jobs = {job.image_path: job for job in DiseaseJob.query.all()}
+    assert jobs["a.jpg"].status == "running"
+    assert (jobs["bad.jpg"].status, jobs["bad.jpg"].attempts, jobs["bad.jpg"].error) == ("failed", 1, "Invalid image file.")
+    assert (jobs["flaky.jpg"].status, jobs["flaky.jpg"].attempts) == ("done", 2)
+
+    # once its lease has expired the interrupted job is claimed again
+    expired = DiseaseJobQueue(app, handler, workers=0, lease_seconds=0)
+    assert expired.run_pending() == 1
+    job = DiseaseJob.query.filter_by(image_path="a.jpg").one()
+    assert (job.status, job.attempts) == ("done", 2)
+    assert job.check.image_path == "a.jpg"
+    assert DiseaseCheck.query.count() == 2
+
+# 30. Unit Test: model sunucusu uint8 goruntu ve buyume ozelliklerini unix socket uzerinden tahmin edip web surecindeki modellerin yerine geciyor mu?
+def test_model_server_round_trip(tmp_path):
+    import threading
+    from app import extensions
+    from app.model_loader import MODEL_NAMES, connect_model_server, get_model_status
+    from app.model_server import ModelServer, ModelServerError, RemoteDiseaseModel
+
+    class FakeDiseaseModel:
+        model_version = "abc123:compiled"
+
+        def predict(self, batch, verbose=0):
+            assert batch.dtype == np.uint8
+            preds = np.zeros((len(batch), 38), dtype=np.float32)
+            preds[:, 2] = batch.reshape(len(batch), -1).mean(axis=1) / 255
+            return preds
+
+    class FakeGrowthModel:
+        classes_ = np.array([0, 1])
+
+        def predict(self, features):
+            return (features.sum(axis=1) > 1).astype(np.int64)
+
+        def predict_proba(self, features):
+            high = (features.sum(axis=1) > 1).astype(np.float64)
+            return np.stack([1 - high, high], axis=1)
+
+    socket_path = str(tmp_path / "models.sock")
+    server = ModelServer(socket_path, FakeDiseaseModel(), FakeGrowthModel(), "growth-v1",
+                         ["Soil_Type_Loam", "Sunlight_Hours"], {"Soil_Type": ["Loam"]})
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    config = {"MODEL_SERVER_SOCKET": socket_path, "MODEL_SERVER_TIMEOUT": 5, "MODEL_SERVER_CONNECT_TIMEOUT": 5}
+    idle = {name: {'state': 'idle', 'path': None, 'seconds': None, 'error': None} for name in MODEL_NAMES}
+
+    try:
+        with patch("app.extensions.disease_model"), patch("app.extensions.growth_model"), \
+                patch("app.extensions.growth_model_version"), patch("app.extensions.model_columns"), \
+                patch("app.extensions.growth_vocabulary"), patch("app.extensions.growth_prediction_cache", None), \
+                patch.dict("app.model_loader.model_status", idle):
+            connect_model_server(config)
+
+            assert [s['state'] for s in get_model_status().values()] == ['ready', 'ready']
+            assert isinstance(extensions.disease_model, RemoteDiseaseModel)
+            assert extensions.disease_model.model_version == "abc123:compiled"
+            assert extensions.growth_model_version == "growth-v1"
+            assert extensions.model_columns == ["Soil_Type_Loam", "Sunlight_Hours"]
+
+            preds = extensions.disease_model.predict(np.full((3, 224, 224, 3), 51, dtype=np.uint8))
+            assert preds.shape == (3, 38) and preds.dtype == np.float32
+            assert np.allclose(preds[:, 2], 0.2)
+            assert list(extensions.growth_model.predict(np.array([[1.0, 5.0], [0.0, 0.5]]))) == [1, 0]
+            assert list(extensions.growth_model.classes_) == [0, 1]
+            assert extensions.growth_model.predict_proba(np.array([[1.0, 5.0]])).tolist() == [[0.0, 1.0]]
+
+            with pytest.raises(ModelServerError):
+                extensions.disease_model.client.predict("unknown", np.zeros((1, 2)))
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert not os.path.exists(socket_path)
+
+# 31. Unit Test: serve.py modelleri ana surecte yukleyip istenen sayida worker fork'luyor, thread ayarlari ortam degiskenlerine yaziliyor mu?
+def test_serve_forks_workers(tmp_path):
+    import psutil
+    import signal
+    import urllib.request
+
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    sys.path.insert(0, root)
+    from serve import parse_args, thread_environ
+
+    args = parse_args(["--workers", "4", "--tf-intra-op-threads", "2", "--blas-threads", "1", "--bind", "0.0.0.0:9000"])
+    assert (args.host, args.port, args.workers) == ("0.0.0.0", 9000, 4)
+    env = thread_environ(args)
+    assert env["TF_NUM_INTRAOP_THREADS"] == "2" and env["OMP_NUM_THREADS"] == env["OPENBLAS_NUM_THREADS"] == "1"
+
+    proc = subprocess.Popen([sys.executable, os.path.join(root, "serve.py"), "--workers", "2", "--bind", "127.0.0.1:0",
+                             "--config", "test"], cwd=str(tmp_path), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        line = proc.stdout.readline()
+        while line and not line.startswith("Listening"):
+            line = proc.stdout.readline()
+        assert "with 2 workers" in line
+        port = int(line.split("127.0.0.1:")[1].split()[0])
+
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=10) as res:
+            assert res.status == 200
+        assert len(psutil.Process(proc.pid).children()) == 2
+
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(timeout=10) == 0
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+# 32. Unit Test: buyume modeli duz node dizileri olarak kaydedilip memory-map ile yukleniyor, tahminler sklearn ile birebir ayni mi?
+def test_growth_forest_memory_mapped(tmp_path):
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier
+    from app.forest import CompactForest, ForestFormatError, save_compact_forest
+    from app.model_loader import load_growth_estimator
+
+    rng = np.random.default_rng(0)
+    X = rng.random((500, 6))
+    X[rng.random(X.shape) < 0.05] = np.nan
+    model = RandomForestClassifier(n_estimators=12, random_state=0).fit(X, rng.integers(1, 5, len(X)))
+    model_path = str(tmp_path / "plant_growth.pkl")
+    forest_path = str(tmp_path / "plant_growth.forest")
+    joblib.dump(model, model_path)
+    save_compact_forest(model, forest_path, model_path)
+
+    config = {"GROWTH_MODEL_PATH": model_path, "GROWTH_FOREST_PATH": forest_path}
+    forest = load_growth_estimator(config)
+    assert isinstance(forest, CompactForest)
+    assert isinstance(forest.value, np.memmap) and not forest.value.flags.writeable
+
+    X_test = rng.random((300, 6))
+    X_test[rng.random(X_test.shape) < 0.05] = np.nan
+    assert np.array_equal(forest.predict_proba(X_test), model.predict_proba(X_test))
+    assert np.array_equal(forest.predict(X_test), model.predict(X_test))
+
+    # no sklearn fallback: large batches are walked in bounded chunks
+    X_large = rng.random((2 * CompactForest.CHUNK_ROWS + 10, 6))
+    with patch.object(CompactForest, "apply", autospec=True, side_effect=CompactForest.apply) as apply:
+        assert np.array_equal(forest.predict_proba(X_large), model.predict_proba(X_large))
+    assert [len(call.args[1]) for call in apply.call_args_list] == [CompactForest.CHUNK_ROWS] * 2 + [10]
+
+    # a layout written for another pickle is not used
+    joblib.dump(RandomForestClassifier(n_estimators=2).fit(np.nan_to_num(X_test), [1, 2] * 150), model_path)
+    with pytest.raises(ForestFormatError):
+        CompactForest.load(forest_path, model_path)
+    assert not isinstance(load_growth_estimator(config), CompactForest)
+
+# 33. Unit Test: vektorize orman degerlendiricisi tum batch boyutlarinda sklearn ile ayni yapraklari ve tahminleri veriyor mu?
+def test_compact_forest_matches_sklearn(tmp_path):
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.tree import DecisionTreeClassifier
+    from app.forest import CompactForest, flatten_forest
+    from app.model_loader import load_growth_estimator
+
+    rng = np.random.default_rng(3)
+    X = rng.random((800, 8))
+    y = (X[:, 0] * 3).astype(int) + rng.integers(0, 2, len(X))
+    forest = RandomForestClassifier(n_estimators=25, random_state=0).fit(X, y)
+    model_path = str(tmp_path / "plant_growth.pkl")
+    joblib.dump(forest, model_path)
+
+    compact = load_growth_estimator({"GROWTH_MODEL_PATH": model_path, "GROWTH_EVALUATOR": "compact"})
+    assert isinstance(compact, CompactForest)
+    vectorized = CompactForest(*flatten_forest(forest))
+
+    for size in (1, 7, 300, CompactForest.FALLBACK_MIN_ROWS + 1):
+        X_test = rng.random((size, 8))
+        assert np.array_equal(vectorized.apply(X_test) - vectorized.roots, forest.apply(X_test))
+        assert np.array_equal(vectorized.predict_proba(X_test), forest.predict_proba(X_test))
+        assert np.array_equal(compact.predict(X_test), forest.predict(X_test))
+
+    tree = DecisionTreeClassifier(random_state=0).fit(X, y)
+    single = CompactForest.from_model(tree)
+    assert np.array_equal(single.predict_proba(X[:50]), tree.predict_proba(X[:50]))
+    assert single.predict_proba(np.empty((0, 8))).shape == (0, len(tree.classes_))
+
+# 34. Unit Test: feature schema okunurken model dosyasi degismediyse sha256 tekrar hesaplanmiyor mu?
+def test_feature_schema_skips_hash_for_unchanged_model(tmp_path):
+    model_path = tmp_path / "plant_growth.pkl"
+    schema_path = tmp_path / "plant_growth.schema.json"
+    model_path.write_bytes(b"model-v1")
+    old = time.time() - 60
+    os.utime(model_path, (old, old))
+    save_feature_schema(schema_path, ["Sunlight_Hours", "Soil_Type_loam"], model_path)
+
+    with patch("app.features.file_sha256") as mock_hash:
+        schema = load_feature_schema(schema_path, model_path)
+    assert mock_hash.call_count == 0
+    assert schema["columns"] == ["Sunlight_Hours", "Soil_Type_loam"]
+
+    # same mtime, different content size: the stat no longer matches and the file is hashed again
+    model_path.write_bytes(b"model-v22")
+    os.utime(model_path, (old, old))
+    with pytest.raises(FeatureSchemaError, match="does not match"):
+        load_feature_schema(schema_path, model_path)
+
+# 35. Unit Test: int8 TFLite cache dosyasi kalibrasyon seti degisince yenileniyor mu, varsayilanlar config ile ayni mi?
+def test_tflite_cache_key_follows_calibration_set(app, tmp_path):
+    import inspect
+    from app.inference import convert_to_tflite, load_tflite_model, tflite_cache_path
+
+    model_path = str(tmp_path / "plant_disease.h5")
+    calibration_dir = tmp_path / "calibration" / "Apple___healthy"
+    calibration_dir.mkdir(parents=True)
+    Image.new("RGB", (32, 32), (10, 120, 40)).save(calibration_dir / "0.png")
+
+    first = tflite_cache_path(model_path, "int8", str(tmp_path / "calibration"))
+    assert first == tflite_cache_path(model_path, "int8", str(tmp_path / "calibration"))
+    Image.new("RGB", (32, 32), (90, 20, 40)).save(calibration_dir / "1.png")
+    assert tflite_cache_path(model_path, "int8", str(tmp_path / "calibration")) != first
+    assert tflite_cache_path(model_path, "dynamic", str(tmp_path / "calibration")).endswith("plant_disease.dynamic.tflite")
+
+    default = app.config["DISEASE_TFLITE_QUANTIZATION"]
+    for fn in (convert_to_tflite, load_tflite_model):
+        assert inspect.signature(fn).parameters["quantization"].default == default
+
+# 36. Unit Test: CSV satirindaki tam sayi olmayan milestone kirpilmadan reddediliyor mu?
+def test_validate_row_rejects_fractional_milestone():
+    from app.ingest import validate_row
+
+    raw = {"plant_id": "1", "soil_type": "loam", "sunlight_hours": "6", "water_frequency": "daily",
+           "fertilizer_type": "none", "temperature": "24", "humidity": "55", "date": "2024-01-01"}
+
+    assert validate_row(dict(raw, predicted_milestone="2.0"), {1})["predicted_milestone"] == 2
+    assert validate_row(dict(raw, predicted_milestone=""), {1})["predicted_milestone"] is None
+    for bad in ("2.7", "abc", "nan"):
+        with pytest.raises(ValueError, match="invalid predicted_milestone"):
+            validate_row(dict(raw, predicted_milestone=bad), {1})
+
+# 37. Unit Test: suresi dolup baska worker'a gecen is eski worker tarafindan ezilmiyor mu, kuyruk siniri ekleme ile ayni sorguda mi?
+def test_disease_job_lease_is_checked_on_finish(client, app):
+    from app.jobs import DiseaseJobQueue
+    from app.models import DiseaseCheck, DiseaseJob
+
+    client.post('/users', json={'username': user_name, 'email': user_email, 'password': user_password})
+    client.post("/plants", json={"name": "elma", "species": "apple", "user_id": 1})
+
+    def handler(job):
+        check = DiseaseCheck(plant_id=job.plant_id, image_path=job.image_path, disease_type_id=1, confidence=0.9)
+        db.session.add(check)
+        db.session.flush()
+        return check
+
+    queue = DiseaseJobQueue(app, handler, workers=0, lease_seconds=0)
+    assert queue.submit(1, "a.jpg", max_queued=1) is not None
+    db.session.commit()
+    assert queue.submit(1, "b.jpg", max_queued=1) is None
+    db.session.rollback()
+
+    slow = queue.claim()
+    # the lease runs out while the slow worker is still busy, another worker claims the job
+    DiseaseJob.query.filter_by(id=slow.id).update({'claim_token': 'other-worker'}, synchronize_session=False)
+    db.session.commit()
+
+    queue.run_job(slow)
+    job = DiseaseJob.query.one()
+    assert (job.status, job.claim_token, job.disease_check_id) == ("running", "other-worker", None)
+    assert DiseaseCheck.query.count() == 0
+    assert queue.jobs_run == 0
+
+    assert queue.run_pending() == 1
+    job = DiseaseJob.query.one()
+    assert (job.status, job.attempts, job.claim_token) == ("done", 2, None)
+    assert DiseaseCheck.query.count() == 1
+
+# 38. Unit Test: model sunucusu istemcisi kopan baglantida bir kez tekrar deniyor, zaman asiminda istegi tekrar gondermiyor mu?
+def test_model_server_client_retries_only_broken_connections(tmp_path):
+    import socket
+    import threading
+    from app.model_server import ModelServerClient, recv_message, send_message
+
+    socket_path = str(tmp_path / "models.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen()
+    requests = []
+
+    hanging = []
+
+    # first connection: closed without a reply, second: answered, later ones: never answered
+    def serve():
+        for behaviour in ("close", "answer", "hang", "hang"):
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            requests.append(recv_message(conn)[0]["op"])
+            if behaviour == "close":
+                conn.close()
+            elif behaviour == "answer":
+                send_message(conn, {"ok": True, "models": {}})
+                hanging.append(conn)
+            else:
+                hanging.append(conn)
+
+    threading.Thread(target=serve, daemon=True).start()
+    client = ModelServerClient(socket_path, timeout=0.3)
+    try:
+        assert client.info() == {"ok": True, "models": {}}
+        assert requests == ["info", "info"]
+
+        # fresh connection, the server takes longer than the timeout: the request is sent once
+        client.close()
+        with pytest.raises(OSError) as error:
+            client.info()
+        assert not isinstance(error.value, ConnectionError)
+        time.sleep(0.5)
+        assert requests == ["info", "info", "info"]
+    finally:
+        client.close()
+        listener.close()
+        for conn in hanging:
+            conn.close()
+
+# 39. Unit Test: surekli hemen cokup yeniden baslatilan worker icin bekleme suresi katlanarak artiyor mu?
+def test_serve_respawn_backoff():
+    import serve
+
+    delays = [serve.respawn_delay(failures) for failures in range(8)]
+    assert delays[:4] == [0.0, 0.5, 1.0, 2.0]
+    assert delays == sorted(delays)
+    assert max(delays) == serve.RESPAWN_BACKOFF_MAX
+
+# 40. Unit Test: worker'i her denemede durduran is deneme hakki bitince failed oluyor mu?
+def test_disease_job_expired_lease_is_not_retried_forever(client, app):
+    from app.jobs import DiseaseJobQueue
+    from app.models import DiseaseJob
+
+    client.post('/users', json={'username': user_name, 'email': user_email, 'password': user_password})
+    client.post("/plants", json={"name": "elma", "species": "apple", "user_id": 1})
+
+    queue = DiseaseJobQueue(app, lambda job: None, workers=0, lease_seconds=0, max_attempts=2)
+    queue.submit(1, "crash.jpg")
+    db.session.commit()
+    # the worker dies during both attempts, the lease expires each time
+    assert queue.claim().attempts == 1
+    assert queue.claim().attempts == 2
+
+    assert queue.claim() is None
+    job = DiseaseJob.query.filter_by(image_path="crash.jpg").one()
+    assert (job.status, job.attempts, job.claim_token) == ("failed", 2, None)
+    assert job.error and job.finished_at is not None
+    assert queue.jobs_failed == 1